@@ -0,0 +1,108 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BlockingIO:
+    """基于有界线程池的阻塞操作执行器
+
+    文件读写、目录扫描、PIL 处理等阻塞调用通过 run 投递到专用线程池，
+    不占用机器人的事件循环，也不与其他插件争用默认执行器。
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="meme-io"
+        )
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """在线程池中执行阻塞函数并等待结果"""
+        loop = asyncio.get_running_loop()
+        if kwargs:
+            func = partial(func, *args, **kwargs)
+            args = ()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class LoopBlockMonitor:
+    """事件循环阻塞检测（调试用）
+
+    事件循环上的心跳任务定期刷新时间戳，独立的看门狗线程发现心跳超过
+    阈值未刷新时，抓取事件循环线程当前的调用栈并记录警告，从而定位是
+    哪个处理函数阻塞了事件循环。
+    """
+
+    def __init__(self, threshold_ms: float = 100.0):
+        """
+        Args:
+            threshold_ms: 阻塞超过该时长（毫秒）时报告
+        """
+        self.threshold = threshold_ms / 1000
+        self.interval = max(self.threshold / 4, 0.005)
+        self._beat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> bool:
+        """在当前运行的事件循环上启动检测，没有运行中的事件循环时返回 False"""
+        if self.running:
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = loop.create_task(self._heartbeat())
+        threading.Thread(
+            target=self._watchdog, name="meme-loop-watchdog", daemon=True
+        ).start()
+        logger.info(f"事件循环阻塞检测已启用，阈值 {self.threshold * 1000:.0f} ms")
+        return True
+
+    async def _heartbeat(self) -> None:
+        try:
+            while True:
+                self._beat = time.monotonic()
+                await asyncio.sleep(self.interval)
+        finally:
+            self._stop.set()
+
+    def _watchdog(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            blocked = time.monotonic() - beat
+            if blocked < self.threshold + self.interval or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<无法获取调用栈>"
+            logger.warning(
+                f"事件循环已被阻塞 {blocked * 1000:.0f} ms，当前调用栈:\n{stack}"
+            )
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
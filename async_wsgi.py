@@ -0,0 +1,249 @@
+import io
+import sys
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from aiohttp import web
+from .wsgi_server import FileWrapper
+
+logger = logging.getLogger(__name__)
+
+# 由 aiohttp 自行管理的逐跳头部，不从 WSGI 响应中转发
+_HOP_BY_HOP = frozenset(
+    ("connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "proxy-connection")
+)
+
+# 每次从应用响应中读取并写出的数据量
+CHUNK_SIZE = 256 * 1024
+
+# 文件体每次交给 sendfile 发送的数据量，每段都受 request_timeout 限制
+SENDFILE_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class AsyncWSGIServer:
+    """在当前事件循环中运行的 WSGI 服务器
+
+    连接、保持连接和请求体读取由 aiohttp 在事件循环中处理，WSGI 应用在
+    有界线程池中执行，读取响应体也在线程池中进行，不阻塞事件循环。
+    send_file 返回的文件体在长度已知时通过 loop.sendfile 由内核直接发送。
+    与机器人运行在同一进程中，应用可以直接使用机器人的对象。
+    """
+
+    def __init__(self, app, workers: int = 8, request_timeout: float = 30.0,
+                 keep_alive_timeout: float = 5.0, max_body_size: int = 64 * 1024 * 1024,
+                 shutdown_timeout: float = 10.0):
+        """
+        Args:
+            app: WSGI 应用
+            workers: 执行 WSGI 应用的线程数
+            request_timeout: 读取请求体、写出每段响应时等待客户端的最长时间（秒）
+            keep_alive_timeout: 保持连接的空闲时间（秒）
+            max_body_size: 请求体大小上限（字节）
+            shutdown_timeout: 关闭时等待进行中请求完成的最长时间（秒）
+        """
+        self.app = app
+        self.workers = workers
+        self.request_timeout = request_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_body_size = max_body_size
+        self.shutdown_timeout = shutdown_timeout
+        self.host: Optional[str] = None
+        self.port: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None
+
+    async def start(self, host: str, port: int) -> None:
+        """开始监听，绑定端口失败时抛出 OSError"""
+        web_app = web.Application(client_max_size=self.max_body_size)
+        web_app.router.add_route("*", "/{path_info:.*}", self._handle)
+        runner = web.AppRunner(
+            web_app,
+            shutdown_timeout=self.shutdown_timeout,
+            keepalive_timeout=self.keep_alive_timeout,
+            access_log=None,
+        )
+        await runner.setup()
+        try:
+            site = web.TCPSite(runner, host, port)
+            await site.start()
+        except BaseException:
+            await runner.cleanup()
+            raise
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="webui-worker")
+        self._runner = runner
+        self.host = host
+        self.port = runner.addresses[0][1] if runner.addresses else port
+        logger.info(f"WebUI 服务器已在当前进程中启动: http://{host}:{self.port}（{self.workers} 个工作线程）")
+
+    async def stop(self) -> None:
+        """停止接受新连接，等待进行中的请求完成后关闭"""
+        runner, self._runner = self._runner, None
+        if runner is None:
+            return
+        await runner.cleanup()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        logger.info("WebUI 服务器已关闭")
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        loop = asyncio.get_running_loop()
+        try:
+            body = await asyncio.wait_for(request.read(), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise web.HTTPRequestTimeout()
+
+        environ = self._make_environ(request, body)
+        status, headers, iterator, first = await loop.run_in_executor(
+            self._executor, self._call_app, environ
+        )
+        try:
+            code, _, reason = status.partition(" ")
+            response = web.StreamResponse(status=int(code), reason=reason or None)
+            for key, value in headers:
+                if key.lower() not in _HOP_BY_HOP:
+                    response.headers.add(key, value)
+            await response.prepare(request)
+
+            if (
+                isinstance(iterator, FileWrapper)
+                and response.content_length is not None
+                and request.method != "HEAD"
+                and request.transport is not None
+            ):
+                await self._sendfile(request, response, iterator.file)
+                return response
+
+            data = first
+            while data is not None:
+                if data:
+                    await asyncio.wait_for(response.write(data), self.request_timeout)
+                data = await loop.run_in_executor(self._executor, self._read_chunk, iterator)
+            await response.write_eof()
+            return response
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    async def _sendfile(self, request: web.Request, response: web.StreamResponse, file) -> None:
+        """零拷贝发送文件体，事件循环或文件对象不支持时逐段读取发送"""
+        loop = asyncio.get_running_loop()
+        offset = file.tell()
+        remaining = response.content_length
+        try:
+            while remaining > 0:
+                count = min(remaining, SENDFILE_CHUNK_SIZE)
+                sent = await asyncio.wait_for(
+                    loop.sendfile(request.transport, file, offset, count), self.request_timeout
+                )
+                if not sent:
+                    raise ConnectionResetError("文件在发送过程中被截断")
+                offset += sent
+                remaining -= sent
+        except NotImplementedError:
+            # TLS 等传输不支持 sendfile，从当前偏移继续普通发送
+            file.seek(offset)
+            while remaining > 0:
+                data = await loop.run_in_executor(
+                    self._executor, file.read, min(remaining, CHUNK_SIZE)
+                )
+                if not data:
+                    raise ConnectionResetError("文件在发送过程中被截断")
+                await asyncio.wait_for(response.write(data), self.request_timeout)
+                remaining -= len(data)
+        await response.write_eof()
+
+    def _make_environ(self, request: web.Request, body: bytes) -> dict:
+        sockname = request.transport.get_extra_info("sockname") if request.transport else None
+        environ = {
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": request.scheme,
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+            "wsgi.file_wrapper": FileWrapper,
+            "REQUEST_METHOD": request.method,
+            "SCRIPT_NAME": "",
+            # WSGI 要求路径以 latin-1 字符串表示原始字节
+            "PATH_INFO": request.path.encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": request.query_string,
+            "REQUEST_URI": request.raw_path,
+            "REMOTE_ADDR": request.remote or "",
+            "SERVER_NAME": sockname[0] if sockname else (self.host or ""),
+            "SERVER_PORT": str(sockname[1] if sockname else self.port),
+            "SERVER_PROTOCOL": f"HTTP/{request.version.major}.{request.version.minor}",
+            "CONTENT_LENGTH": str(len(body)),
+        }
+        for key, value in request.headers.items():
+            key = key.upper().replace("-", "_")
+            if key == "CONTENT_LENGTH":
+                continue
+            if key != "CONTENT_TYPE":
+                key = f"HTTP_{key}"
+            value = value.encode("utf-8", "surrogateescape").decode("latin-1")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _call_app(self, environ: dict) -> Tuple[str, List[Tuple[str, str]], object, Optional[bytes]]:
+        """（工作线程中）调用 WSGI 应用，并读取第一段响应体，小响应只需一次线程切换"""
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and captured.get("started"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            captured["status"] = status
+            captured["headers"] = headers
+            return self._write_unsupported
+
+        app_iter = self.app(environ, start_response)
+        if isinstance(app_iter, FileWrapper):
+            # 文件体可能走 sendfile，这里不预读
+            captured["started"] = True
+            return captured["status"], captured["headers"], app_iter, b""
+        iterator = _ClosingIter(app_iter)
+        try:
+            first = self._read_chunk(iterator)
+        except BaseException:
+            iterator.close()
+            raise
+        captured["started"] = True
+        return captured["status"], captured["headers"], iterator, first
+
+    @staticmethod
+    def _write_unsupported(data: bytes) -> None:
+        raise NotImplementedError("不支持 WSGI write() 回调，请返回可迭代的响应体")
+
+    @staticmethod
+    def _read_chunk(iterator) -> Optional[bytes]:
+        """（工作线程中）读取下一段响应体，合并小块数据，结束时返回 None"""
+        if isinstance(iterator, FileWrapper):
+            return iterator.file.read(CHUNK_SIZE) or None
+        parts, size = [], 0
+        for data in iterator:
+            parts.append(data)
+            size += len(data)
+            if size >= CHUNK_SIZE:
+                break
+        return b"".join(parts) if parts else None
+
+
+class _ClosingIter:
+    """保留应用返回的可迭代对象，以便在响应结束后调用它的 close()"""
+
+    def __init__(self, app_iter):
+        self._app_iter = app_iter
+        self._iterator = iter(app_iter)
+
+    def __iter__(self):
+        return self._iterator
+
+    def close(self) -> None:
+        if hasattr(self._app_iter, "close"):
+            self._app_iter.close()
@@ -1,6 +1,9 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, g
 from .models import (
     scan_emoji_folder,
+    get_library_version,
+    count_emojis,
+    get_emoji_page,
     get_emoji_by_category,
     add_emoji_to_category,
     delete_emoji_from_category,
@@ -8,29 +11,109 @@ from .models import (
 import os
 import traceback
 from ..config import MEMES_DIR
+from ..meme_catalog import get_catalog
+from ..profiling import PROFILER
 
 
 api = Blueprint("api", __name__)
 
+# 分页接口单页的最大条数
+MAX_PAGE_SIZE = 500
+
+
+@api.before_request
+def start_profiling():
+    """开启性能分析时，为每个 API 请求记录一份结果"""
+    if PROFILER.enabled:
+        g.profile_session = PROFILER.start(request.endpoint or "api")
+
+
+@api.teardown_request
+def stop_profiling(exc=None):
+    PROFILER.stop(g.pop("profile_session", None))
+
+
+def _conditional_response(etag, build):
+    """处理条件请求：If-None-Match 命中时返回 304，否则调用 build() 生成响应"""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _page_args():
+    """解析分页参数，未提供 limit 时返回 (None, "") 表示不分页"""
+    cursor = request.args.get("cursor", "")
+    limit = request.args.get("limit")
+    if limit is None:
+        return None, cursor
+    return max(0, min(int(limit), MAX_PAGE_SIZE)), cursor
+
 
 @api.route("/emoji", methods=["GET"])
 def get_all_emojis():
-    """获取所有表情包（按类别分组）"""
-    emoji_data = scan_emoji_folder()
-    # 确保每个类别的表情包数据都是数组
-    for category in emoji_data:
-        if not isinstance(emoji_data[category], list):
-            emoji_data[category] = []  # 如果不是列表，设置为空列表
-    return jsonify(emoji_data)
+    """
+    获取所有表情包（按类别分组）
+
+    提供 limit 参数时返回分页格式：每个类别的数量、第一页文件名及其内容
+    版本号和下一页游标，limit=0 时只返回各类别数量。ETag 为表情包库版本号。
+    """
+    try:
+        limit, _ = _page_args()
+    except ValueError:
+        return jsonify({"message": "limit 参数无效"}), 400
+    version = get_library_version()
+
+    def build():
+        if limit is None:
+            emoji_data = scan_emoji_folder()
+            # 确保每个类别的表情包数据都是数组
+            for category in emoji_data:
+                if not isinstance(emoji_data[category], list):
+                    emoji_data[category] = []  # 如果不是列表，设置为空列表
+            return jsonify(emoji_data)
+
+        categories = {}
+        for category, count in count_emojis().items():
+            items, versions, next_cursor = get_emoji_page(category, "", limit) if count else ([], {}, None)
+            categories[category] = {
+                "count": count, "items": items, "versions": versions, "next_cursor": next_cursor
+            }
+        return jsonify({"version": version, "categories": categories})
+
+    return _conditional_response(f"emoji-{version}", build)
 
 
 @api.route("/emoji/<category>", methods=["GET"])
 def get_emojis_by_category(category):
-    """获取指定类别的表情包"""
-    emojis = get_emoji_by_category(category)
-    if emojis is None:
+    """
+    获取指定类别的表情包
+
+    提供 limit 参数时按文件名分页，cursor 为上一页返回的 next_cursor。
+    versions 为文件名到内容版本号的映射，附加为表情包 URL 的 ?v= 后可长期缓存。
+    """
+    try:
+        limit, cursor = _page_args()
+    except ValueError:
+        return jsonify({"message": "limit 参数无效"}), 400
+    if limit is None:
+        emojis = get_emoji_by_category(category)
+        if emojis is None:
+            return jsonify({"message": "Category not found"}), 404
+        return jsonify(emojis if isinstance(emojis, list) else []), 200  # 确保返回数组
+
+    if not os.path.isdir(os.path.join(MEMES_DIR, category)):
         return jsonify({"message": "Category not found"}), 404
-    return jsonify(emojis if isinstance(emojis, list) else []), 200  # 确保返回数组
+    version = get_library_version([category])
+
+    def build():
+        items, versions, next_cursor = get_emoji_page(category, cursor, limit)
+        return jsonify({"version": version, "items": items, "versions": versions, "next_cursor": next_cursor})
+
+    return _conditional_response(f"emoji-{version}", build)
 
 
 @api.route("/emoji/add", methods=["POST"])
@@ -50,15 +133,30 @@ def add_emoji():
         return jsonify({"message": "Category and image file are required"}), 400
 
     try:
-        result_path = add_emoji_to_category(category, image_file)
+        plugin_config = current_app.config.get("PLUGIN_CONFIG", {})
+        result_path, duplicate = add_emoji_to_category(
+            category,
+            image_file,
+            plugin_config.get("meme_variants"),
+            plugin_config.get("blob_store"),
+        )
         
         # 添加成功后同步配置
-        plugin_config = current_app.config.get("PLUGIN_CONFIG", {})
         category_manager = plugin_config.get("category_manager")
         if category_manager:
             category_manager.sync_with_filesystem()
+        meme_index = plugin_config.get("meme_index")
+        if meme_index:
+            meme_index.add(category, os.path.basename(result_path))
             
-        return jsonify({"message": "Emoji added successfully", "path": result_path, "category": category, "filename": image_file.filename}), 201
+        similar = []
+        near_duplicates = plugin_config.get("near_duplicates")
+        if near_duplicates and not duplicate:
+            similar = [path for path, _ in near_duplicates.similar_to(result_path)]
+
+        if duplicate:
+            return jsonify({"message": "Emoji already exists", "path": result_path, "category": category, "filename": os.path.basename(result_path), "duplicate": True}), 200
+        return jsonify({"message": "Emoji added successfully", "path": result_path, "category": category, "filename": os.path.basename(result_path), "duplicate": False, "similar": similar}), 201
     except Exception as e:
         return jsonify({"message": f"添加表情包失败: {str(e)}"}), 500
 
@@ -72,12 +170,41 @@ def delete_emoji():
     if not category or not image_file:
         return jsonify({"message": "Category and image file are required"}), 400
 
-    if delete_emoji_from_category(category, image_file):
+    plugin_config = current_app.config.get("PLUGIN_CONFIG", {})
+    if delete_emoji_from_category(category, image_file, plugin_config.get("meme_variants")):
+        meme_index = plugin_config.get("meme_index")
+        if meme_index:
+            meme_index.remove(category, image_file)
+        thumbnails = plugin_config.get("thumbnails")
+        if thumbnails:
+            thumbnails.discard(category, image_file)
+        blob_store = plugin_config.get("blob_store")
+        if blob_store:
+            blob_store.forget(category, image_file)
+            blob_store.collect_garbage()
         return jsonify({"message": "Emoji deleted successfully", "category": category, "filename": image_file}), 200
     else:
         return jsonify({"message": "Emoji not found"}), 404
 
 
+@api.route("/emoji/near_duplicates", methods=["GET"])
+def get_near_duplicates():
+    """获取全库近似重复表情包报告"""
+    try:
+        plugin_config = current_app.config.get("PLUGIN_CONFIG", {})
+        near_duplicates = plugin_config.get("near_duplicates")
+        if not near_duplicates:
+            return jsonify({"message": "近似重复索引未启用"}), 400
+
+        distance = request.args.get("distance", type=int)
+        # 增量刷新在后台进行，报告基于当前索引生成，刷新完成后再次请求即可看到新结果
+        near_duplicates.start_refresh()
+        groups = near_duplicates.find_duplicates(distance)
+        return jsonify({"groups": groups, "count": len(groups), "refreshing": near_duplicates.refreshing})
+    except Exception as e:
+        return jsonify({"message": f"生成近似重复报告失败: {str(e)}"}), 500
+
+
 @api.route("/emotions", methods=["GET"])
 def get_emotions():
     """获取标签描述映射"""
@@ -88,7 +215,10 @@ def get_emotions():
         if not category_manager:
             raise ValueError("未找到类别管理器")
         
-        return jsonify(category_manager.get_descriptions())
+        snapshot = category_manager.snapshot
+        return _conditional_response(
+            snapshot.etag, lambda: jsonify(dict(snapshot.descriptions))
+        )
     except Exception as e:
         current_app.logger.error(f"获取标签描述失败: {str(e)}")
         current_app.logger.error(f"错误详情: {traceback.format_exc()}")
@@ -111,6 +241,17 @@ def delete_category():
             return jsonify({"message": "Category manager not found"}), 404
 
         if category_manager.delete_category(category):
+            get_catalog().remove_category(category)
+            meme_index = plugin_config.get("meme_index")
+            if meme_index:
+                meme_index.invalidate(category)
+            thumbnails = plugin_config.get("thumbnails")
+            if thumbnails:
+                thumbnails.discard(category)
+            blob_store = plugin_config.get("blob_store")
+            if blob_store:
+                blob_store.forget(category)
+                blob_store.collect_garbage()
             return jsonify({"message": "Category deleted successfully"}), 200
         else:
             return jsonify({"message": "Failed to delete category"}), 500
@@ -259,6 +400,17 @@ def rename_category():
             return jsonify({"message": "Category manager not found"}), 404
 
         if category_manager.rename_category(old_name, new_name):
+            get_catalog().rename_category(old_name, new_name)
+            meme_index = plugin_config.get("meme_index")
+            if meme_index:
+                meme_index.invalidate(old_name)
+                meme_index.invalidate(new_name)
+            thumbnails = plugin_config.get("thumbnails")
+            if thumbnails:
+                thumbnails.discard(old_name)
+            blob_store = plugin_config.get("blob_store")
+            if blob_store:
+                blob_store.rename_category(old_name, new_name)
             return jsonify({"message": "Category renamed successfully"}), 200
         else:
             return jsonify({"message": "Failed to rename category"}), 500
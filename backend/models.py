@@ -1,25 +1,56 @@
 import os
+import uuid
 from werkzeug.utils import secure_filename
-from ..config import MEMES_DIR
+from ..config import MEMES_DIR, MEME_EXTENSIONS
+from ..meme_catalog import get_catalog
+
+# 表情包 URL 中 ?v= 版本号使用的内容哈希前缀长度
+CONTENT_VERSION_LENGTH = 12
 
 
 def scan_emoji_folder():
-    """扫描表情包文件夹，返回所有类别及其表情包"""
-    emoji_data = {}
+    """获取所有类别及其表情包（从元数据目录查询，只重新扫描有变化的类别）"""
+    if not os.path.exists(MEMES_DIR):
+        os.makedirs(MEMES_DIR)
+    catalog = get_catalog()
+    catalog.reconcile()
+    return catalog.list_all(MEME_EXTENSIONS)
+
+
+def get_library_version(categories=None):
+    """
+    与文件系统对账后返回表情包库的版本号，库内容有任何变化时递增
+
+    Args:
+        categories: 只对账指定类别，默认对账全部类别
+    """
     if not os.path.exists(MEMES_DIR):
         os.makedirs(MEMES_DIR)
-    for category in os.listdir(MEMES_DIR):
-        category_path = os.path.join(MEMES_DIR, category)
-        if os.path.isdir(category_path):
-            emoji_files = [
-                f
-                for f in os.listdir(category_path)
-                if f.lower().endswith((".png", ".jpg", ".jpeg", ".gif"))
-            ]
-            emoji_data[category] = emoji_files  # 将表情包数组赋值给类别
-        else:
-            emoji_data[category] = []  # 确保每个类别都有一个数组，即使为空
-    return emoji_data
+    catalog = get_catalog()
+    catalog.reconcile(categories)
+    return catalog.version
+
+
+def count_emojis():
+    """获取各类别的表情包数量（不对账，调用前先获取库版本号）"""
+    return get_catalog().count_by_category(MEME_EXTENSIONS)
+
+
+def get_emoji_page(category, cursor="", limit=100):
+    """
+    按文件名顺序分页获取类别下的表情包
+
+    Returns:
+        (文件名列表, 文件名 -> 内容版本号, 下一页游标)，没有下一页时游标为 None；
+        版本号为内容哈希前缀，用于构造可长期缓存的 ?v= URL
+    """
+    if limit <= 0:
+        return [], {}, cursor
+    rows = get_catalog().list_category_page(category, cursor, limit + 1, MEME_EXTENSIONS)
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    rows = rows[:limit]
+    versions = {f: sha256[:CONTENT_VERSION_LENGTH] for f, sha256 in rows if sha256}
+    return [f for f, _ in rows], versions, next_cursor
 
 
 def get_emoji_by_category(category):
@@ -27,16 +58,18 @@ def get_emoji_by_category(category):
     category_path = os.path.join(MEMES_DIR, category)
     if not os.path.isdir(category_path):
         return []  # 返回空数组而不是 None
-    emoji_files = [
-        f
-        for f in os.listdir(category_path)
-        if f.lower().endswith((".png", ".jpg", ".jpeg", ".gif"))
-    ]
-    return emoji_files
+    catalog = get_catalog()
+    catalog.reconcile([category])
+    return catalog.list_category(category, MEME_EXTENSIONS)
+
 
+def add_emoji_to_category(category, image_file, variants=None, blob_store=None):
+    """
+    添加表情包到指定类别
 
-def add_emoji_to_category(category, image_file):
-    """添加表情包到指定类别"""
+    传入 blob_store 时边写入边计算哈希并去重入库，传入 variants 时同时生成发送版本。
+    返回 (文件路径, 是否为同类别中已存在的重复内容)
+    """
     category_path = os.path.join(MEMES_DIR, category)
 
     if not os.path.exists(category_path):
@@ -44,11 +77,26 @@ def add_emoji_to_category(category, image_file):
     # 使用 secure_filename 确保文件名安全
     filename = secure_filename(image_file.filename)
     target_path = os.path.join(category_path, filename)
-    image_file.save(target_path)
-    return target_path
+    duplicate = False
+    if blob_store:
+        temp_path = os.path.join(category_path, f".{filename}.{uuid.uuid4().hex}.part")
+        try:
+            digest = blob_store.stream_to_temp(image_file.stream, temp_path)
+            stored = blob_store.ingest(temp_path, digest, target_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        target_path, duplicate = stored.path, stored.duplicate
+        get_catalog().upsert_file(target_path, sha256=stored.sha256)
+    else:
+        image_file.save(target_path)
+        get_catalog().upsert_file(target_path)
+    if variants and not duplicate:
+        variants.generate(target_path)
+    return target_path, duplicate
 
 
-def delete_emoji_from_category(category, image_file):
+def delete_emoji_from_category(category, image_file, variants=None):
     """删除指定类别下的表情包"""
     category_path = os.path.join(MEMES_DIR, category)
 
@@ -57,6 +105,9 @@ def delete_emoji_from_category(category, image_file):
     image_path = os.path.join(category_path, image_file)
     if os.path.exists(image_path):
         os.remove(image_path)
+        get_catalog().remove_file(category, image_file)
+        if variants:
+            variants.discard(image_path)
         return True
     return False
 
@@ -70,8 +121,10 @@ def update_emoji_in_category(category, old_image_file, new_image_file):
     old_image_path = os.path.join(category_path, old_image_file)
     if os.path.exists(old_image_path):
         os.remove(old_image_path)
+        get_catalog().remove_file(category, old_image_file)
         filename = secure_filename(new_image_file.filename)
         target_path = os.path.join(category_path, filename)
         new_image_file.save(target_path)
+        get_catalog().upsert_file(target_path)
         return True
     return False
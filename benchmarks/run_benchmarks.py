@@ -0,0 +1,344 @@
+"""离线性能基准
+
+在合成的表情包库（默认 1k / 10k / 100k 个文件）上测量插件的热点路径，
+全程不访问网络：
+
+    - 表情标记提取（MemeSender.resp 中的 EmotionTagExtractor.extract）
+    - 表情包挑选（MemeSelector.pick）
+    - scan_emoji_folder（元数据目录已对账时）
+    - FileHandler.scan_local_images（元数据目录 / 递归扫描两种方式）
+    - SyncManager.check_sync_status 的差异计算（使用离线图床）
+    - GET /api/emoji 的响应时间（完整列表 / 分页摘要 / 单个类别的一页）
+    - NearDuplicateIndex.find_duplicates 全库近似重复报告（使用合成的哈希，
+      不解码图片，其中每 50 张有一组近似重复）
+    - 插件加载时的导入耗时（main.py 启动时导入的模块，在独立进程中测量），
+      并检查 WebUI、图床同步和图像处理的重型依赖没有在加载时被导入
+
+用法（在插件目录下运行）:
+
+    python benchmarks/run_benchmarks.py                       # 运行并与基线比较
+    python benchmarks/run_benchmarks.py --sizes 1k,10k        # 只测指定规模
+    python benchmarks/run_benchmarks.py --save-baseline       # 把本次结果保存为基线
+
+结果写入 --output 指定的 JSON 文件；存在基线时，最短耗时超过基线
+--threshold 倍的项目会被标记为退化，并以退出码 1 结束。
+"""
+
+import io
+import ast
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import importlib
+import statistics
+import contextlib
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+PLUGIN_DIR = BENCH_DIR.parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCH_DIR / "results.json"
+DEFAULT_WORK_DIR = BENCH_DIR / ".data"
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+CATEGORY_COUNT = 40
+
+# 插件加载时不应导入的依赖，只在首次使用 WebUI / 图床同步 / 图像处理时导入
+LAZY_DEPENDENCIES = ("flask", "werkzeug", "requests", "psutil", "tqdm", "PIL", "numpy")
+# AstrBot 自身已经导入的依赖，计时前预先导入，只测量插件本身的开销
+HOST_PRELOADED = ("asyncio", "aiohttp", "sqlite3", "multiprocessing")
+
+# 插件以包的形式导入（模块内部使用相对导入），不加载依赖 AstrBot 的 main.py
+sys.path.insert(0, str(PLUGIN_DIR.parent))
+PACKAGE = PLUGIN_DIR.name
+
+
+def plugin_module(name: str):
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def build_library(root: Path, count: int) -> Path:
+    """生成合成表情包库，已存在时直接复用"""
+    memes_dir = root / f"memes_{count}"
+    marker = memes_dir / ".complete"
+    if marker.exists():
+        return memes_dir
+    if memes_dir.exists():
+        shutil.rmtree(memes_dir)
+
+    # 所有文件共用一张很小的图片，库的规模只体现在文件数量上
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (255, 200, 0)).save(buffer, format="PNG")
+    content = buffer.getvalue()
+    for index in range(count):
+        category_dir = memes_dir / f"category_{index % CATEGORY_COUNT:02d}"
+        if index < CATEGORY_COUNT:
+            category_dir.mkdir(parents=True)
+        ext = (".png", ".jpg", ".gif")[index % 3]
+        (category_dir / f"meme_{index:06d}{ext}").write_bytes(content)
+    marker.touch()
+    return memes_dir
+
+
+def measure(func: Callable[[], object], repeat: int, warmup: bool = True) -> Dict[str, float]:
+    """多次运行（默认先空跑一次预热），返回以毫秒计的统计值"""
+    if warmup:
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "repeat": repeat,
+    }
+
+
+class OfflineImageHost:
+    """离线图床：远程列表为本地文件的一半，再加上同样数量的仅远程存在的文件
+
+    上传、删除只修改内存中的列表，下载写入占位内容，不访问网络。
+    """
+
+    def __init__(self, local_images: List[Dict[str, str]]):
+        self.images = [
+            {"url": "", "id": img["id"], "filename": img["filename"], "category": img["category"]}
+            for img in local_images[::2]
+        ]
+        self.images += [
+            {"url": "", "id": f"remote_{i}.png", "filename": f"remote_{i}.png", "category": "remote"}
+            for i in range(len(self.images))
+        ]
+
+    def upload_image(self, file_path):
+        file_path = Path(file_path)
+        image = {"url": "", "id": file_path.name, "filename": file_path.name, "category": file_path.parent.name}
+        self.images.append(image)
+        return {"url": image["url"], "hash": image["id"]}
+
+    def delete_image(self, image_hash):
+        before = len(self.images)
+        self.images = [img for img in self.images if img["id"] != image_hash]
+        return len(self.images) < before
+
+    def get_image_list(self):
+        return self.images
+
+    def download_image(self, image_info, save_path):
+        save_path = Path(save_path)
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        save_path.write_bytes(b"\x89PNG\r\n\x1a\n")
+        return True
+
+
+def run_size(label: str, count: int, work_dir: Path, repeat: int) -> Dict[str, Dict[str, float]]:
+    meme_catalog = plugin_module("meme_catalog")
+    models = plugin_module("backend.models")
+    webui = plugin_module("webui")
+    from_index = plugin_module("meme_index")
+    from_selector = plugin_module("meme_selector")
+    from_extractor = plugin_module("emotion_extractor")
+    near_duplicates = plugin_module("near_duplicates")
+    file_handler = plugin_module("image_host.core.file_handler")
+    sync_manager = plugin_module("image_host.core.sync_manager")
+
+    memes_dir = build_library(work_dir, count)
+    db_path = work_dir / f"catalog_{count}.db"
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+
+    # 让 WebUI 的数据访问指向合成库
+    catalog = meme_catalog.MemeCatalog(str(db_path), str(memes_dir))
+    meme_catalog._default_catalog = catalog
+    models.MEMES_DIR = str(memes_dir)
+
+    results: Dict[str, Dict[str, float]] = {}
+    results["catalog_reconcile_cold"] = measure(catalog.reconcile, 1, warmup=False)
+    results["catalog_reconcile_warm"] = measure(catalog.reconcile, repeat)
+
+    categories = sorted(p.name for p in memes_dir.iterdir() if p.is_dir())
+    extractor = from_extractor.EmotionTagExtractor()
+    extractor.update(categories, 1)
+    rng = random.Random(0)
+    text = " ".join(
+        f"这是一段模拟的模型回复，{rng.choice(categories)} 包含若干表情标记 [{rng.choice(categories)}]。"
+        for _ in range(20)
+    )
+    results["tag_extract"] = measure(lambda: extractor.extract(text, limit=2), repeat * 20)
+
+    index = from_index.MemeIndex(str(memes_dir), catalog=catalog)
+    index.build(categories)
+    selector = from_selector.MemeSelector(index)
+    results["meme_pick"] = measure(
+        lambda: selector.pick(rng.choice(categories), f"chat_{rng.randrange(64)}"), repeat * 20
+    )
+
+    results["scan_emoji_folder"] = measure(models.scan_emoji_folder, repeat)
+
+    with_catalog = file_handler.FileHandler(memes_dir, catalog)
+    without_catalog = file_handler.FileHandler(memes_dir)
+    results["scan_local_images_catalog"] = measure(with_catalog.scan_local_images, repeat)
+    results["scan_local_images_walk"] = measure(without_catalog.scan_local_images, max(1, repeat // 2))
+
+    manager = sync_manager.SyncManager(
+        OfflineImageHost(with_catalog.scan_local_images()), memes_dir, catalog
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["check_sync_status"] = measure(manager.check_sync_status, repeat)
+
+    client = webui.create_app({}).test_client()
+    results["api_emoji"] = measure(lambda: client.get("/api/emoji"), repeat)
+    results["api_emoji_summary"] = measure(lambda: client.get("/api/emoji?limit=0"), repeat)
+    results["api_emoji_page"] = measure(
+        lambda: client.get(f"/api/emoji/{rng.choice(categories)}?limit=60"), repeat
+    )
+
+    phash_path = work_dir / f"phash_{count}.json"
+    hashes = {}
+    for i in range(count):
+        value = rng.getrandbits(64)
+        hashes[f"c{i % 100}/{i}.png"] = value
+        if i % 50 == 0:
+            hashes[f"c{i % 100}/{i}_dup.png"] = value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))
+    phash_path.write_text(
+        json.dumps({p: [0, 0, format(v, "016x")] for p, v in hashes.items()}), encoding="utf-8"
+    )
+    duplicates = near_duplicates.NearDuplicateIndex(str(memes_dir), str(phash_path))
+
+    def near_duplicates_report():
+        duplicates._report = None  # 跳过结果缓存，测量完整计算
+        return duplicates.find_duplicates()
+
+    results["near_duplicates_report"] = measure(near_duplicates_report, max(1, repeat // 2))
+
+    return {f"{name}[{label}]": value for name, value in results.items()}
+
+
+def startup_modules() -> List[str]:
+    """main.py 顶层导入的插件模块（跳过依赖 AstrBot 的 main.py 本身）"""
+    tree = ast.parse((PLUGIN_DIR / "main.py").read_text(encoding="utf-8"))
+    return [
+        node.module
+        for node in tree.body
+        if isinstance(node, ast.ImportFrom) and node.level == 1 and node.module
+    ]
+
+
+def measure_startup_import(repeat: int) -> Dict[str, object]:
+    """在全新的解释器中导入插件启动模块，返回耗时与被提前导入的重型依赖"""
+    code = (
+        "import sys, time, json, importlib\n"
+        f"sys.path.insert(0, {str(PLUGIN_DIR.parent)!r})\n"
+        f"for name in {HOST_PRELOADED!r}:\n"
+        "    importlib.import_module(name)\n"
+        "start = time.perf_counter()\n"
+        f"for name in {startup_modules()!r}:\n"
+        f"    importlib.import_module({PACKAGE!r} + '.' + name)\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps({'ms': elapsed * 1000, 'modules': sorted(sys.modules)}))\n"
+    )
+    samples, loaded = [], set()
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        report = json.loads(output.splitlines()[-1])
+        samples.append(report["ms"])
+        loaded = {m.split(".")[0] for m in report["modules"]}
+    return {
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "repeat": repeat,
+        "eager_dependencies": sorted(loaded.intersection(LAZY_DEPENDENCIES)),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """返回最短耗时超过基线 threshold 倍的项目"""
+    regressions = []
+    for name, value in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            print(f"  {name:<42} {value['min_ms']:>10.3f} ms   (无基线)")
+            continue
+        ratio = value["min_ms"] / base["min_ms"] if base["min_ms"] else float("inf")
+        flag = "  <-- 退化" if ratio > threshold else ""
+        print(f"  {name:<42} {value['min_ms']:>10.3f} ms   x{ratio:.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="表情包插件离线性能基准")
+    parser.add_argument("--sizes", default="1k,10k,100k", help="逗号分隔的库规模，可选 1k/10k/100k")
+    parser.add_argument("--repeat", type=int, default=5, help="每个项目的重复次数")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="结果 JSON 路径")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="基线 JSON 路径")
+    parser.add_argument("--threshold", type=float, default=1.5, help="判定退化的耗时倍数")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR, help="合成库存放目录")
+    args = parser.parse_args(argv)
+
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    results: Dict[str, Dict[str, float]] = {}
+
+    print("测量插件加载耗时...")
+    results["plugin_import"] = measure_startup_import(args.repeat)
+    eager = results["plugin_import"]["eager_dependencies"]
+    if eager:
+        print(f"插件加载时导入了本应按需导入的依赖: {', '.join(eager)}")
+    for label in args.sizes.split(","):
+        label = label.strip()
+        if label not in SIZES:
+            parser.error(f"未知的规模: {label}")
+        print(f"运行 {label} 规模基准...")
+        results.update(run_size(label, SIZES[label], args.work_dir, args.repeat))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"结果已写入 {args.output}")
+
+    # 提前导入可选依赖与基线无关，无论是否比较都判定为失败
+    status = 1 if eager else 0
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"基线已保存到 {args.baseline}")
+        return status
+
+    if not args.baseline.exists():
+        print("没有基线，跳过比较（使用 --save-baseline 保存）")
+        return status
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if eager:
+        regressions.append("plugin_import")
+    if regressions:
+        print(f"{len(regressions)} 个项目相对基线退化超过 {args.threshold} 倍")
+        return 1
+    print("没有发现性能退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import os
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from typing import BinaryIO, Dict, List, NamedTuple, Optional
+from .config import BLOBS_DIR, MEMES_DIR
+from .json_store import DebouncedJsonStore
+from .utils import ensure_dir_exists, save_json
+
+logger = logging.getLogger(__name__)
+
+
+class StoredImage(NamedTuple):
+    """入库结果"""
+
+    path: str  # 类别目录中的文件路径
+    sha256: str  # 内容哈希
+    duplicate: bool  # 同一类别中已存在相同内容，未新增文件
+
+
+class BlobStore:
+    """按 SHA-256 寻址的表情包内容存储
+
+    每份内容只在 blobs 目录中保存一次，类别目录中的表情包是指向它的硬链接
+    （文件系统不支持硬链接时退化为复制）。同一类别重复上传相同内容时直接
+    返回已有文件，不会新增文件，也就不会产生额外的同步流量；硬链接共享
+    inode，缓存也只占一份内存。
+
+    类别目录中的文件总是先链接（或复制）到同目录的临时文件再原子替换，
+    从不写入已有文件：已有文件可能与 blob 及其他类别中的表情包共享 inode。
+
+    refs.json 记录 哈希 -> 引用它的相对路径，删除、改名时由调用方通过
+    forget/rename_category 更新；修改以变更日志记录并合并写入。
+    """
+
+    def __init__(self, blobs_dir: str = BLOBS_DIR, memes_dir: str = MEMES_DIR, save_delay: float = 1.0):
+        """
+        Args:
+            save_delay: 合并写入 refs.json 的时间窗口（秒）
+        """
+        self.blobs_dir = blobs_dir
+        self.memes_dir = memes_dir
+        self.refs_path = os.path.join(blobs_dir, "refs.json")
+        ensure_dir_exists(blobs_dir)
+        if not os.path.exists(self.refs_path):
+            save_json({}, self.refs_path)
+        self._store = DebouncedJsonStore(self.refs_path, delay=save_delay)
+        self._refs: Dict[str, List[str]] = self._store.load({})
+        # 相对路径 -> 哈希，用于删除、改名和覆盖时找到旧记录
+        self._digest_of: Dict[str, str] = {
+            rel_path: digest for digest, paths in self._refs.items() for rel_path in paths
+        }
+        self._lock = threading.RLock()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    @staticmethod
+    def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+        """计算已有文件的 SHA-256"""
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def stream_to_temp(self, stream: BinaryIO, temp_path: str, chunk_size: int = 64 * 1024) -> str:
+        """将数据流写入临时文件并同时计算哈希，返回 SHA-256"""
+        hasher = hashlib.sha256()
+        with open(temp_path, "wb") as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                hasher.update(chunk)
+                f.write(chunk)
+        return hasher.hexdigest()
+
+    def find_in_dir(self, digest: str, directory: str) -> Optional[str]:
+        """查找目录中内容为 digest 的表情包"""
+        blob = self.blob_path(digest)
+        for rel_path in self._refs.get(digest, []):
+            path = os.path.join(self.memes_dir, rel_path)
+            if os.path.dirname(path) != os.path.normpath(directory):
+                continue
+            try:
+                if os.path.samefile(path, blob) or self.hash_file(path) == digest:
+                    return path
+            except OSError:
+                continue
+        return None
+
+    def ingest(self, temp_path: str, digest: str, target_path: str) -> StoredImage:
+        """
+        将已写好并计算过哈希的临时文件入库
+
+        Args:
+            temp_path: 临时文件路径，调用后会被移走或删除
+            digest: 临时文件内容的 SHA-256
+            target_path: 期望的类别目录文件路径
+
+        Returns:
+            StoredImage；同类别已有相同内容时 path 为已有文件、duplicate 为 True
+        """
+        blob = self.blob_path(digest)
+        with self._lock:
+            if os.path.exists(blob):
+                os.remove(temp_path)
+            else:
+                ensure_dir_exists(os.path.dirname(blob))
+                os.replace(temp_path, blob)
+
+            existing = self.find_in_dir(digest, os.path.dirname(target_path))
+            if existing:
+                return StoredImage(existing, digest, True)
+
+            # 目标文件可能是指向其他 blob 的硬链接，只能整体替换，不能写入
+            directory, name = os.path.split(target_path)
+            staging = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+            try:
+                try:
+                    os.link(blob, staging)
+                except OSError:
+                    shutil.copy2(blob, staging)
+                os.replace(staging, target_path)
+            finally:
+                if os.path.exists(staging):
+                    os.remove(staging)
+
+            self._set_ref(os.path.relpath(target_path, self.memes_dir), digest)
+        return StoredImage(target_path, digest, False)
+
+    def _set_ref(self, rel_path: str, digest: Optional[str]) -> None:
+        """将 rel_path 的引用改为 digest（None 表示移除），并记录变更（调用方持有锁）"""
+        changed = {}
+        old = self._digest_of.pop(rel_path, None)
+        if old is not None and old != digest:
+            paths = [p for p in self._refs.get(old, []) if p != rel_path]
+            changed[old] = paths
+        if digest is not None:
+            self._digest_of[rel_path] = digest
+            paths = self._refs.get(digest, [])
+            if rel_path not in paths:
+                changed[digest] = paths + [rel_path]
+        if changed:
+            self._store.update(changed)
+
+    def forget(self, category: str, filename: Optional[str] = None) -> None:
+        """表情包（或整个类别）被删除后移除引用记录，不再引用的内容由 collect_garbage 清理"""
+        with self._lock:
+            if filename is not None:
+                self._set_ref(os.path.join(category, filename), None)
+                return
+            prefix = category + os.sep
+            for rel_path in [p for p in self._digest_of if p.startswith(prefix)]:
+                self._set_ref(rel_path, None)
+
+    def rename_category(self, old_name: str, new_name: str) -> None:
+        """类别改名后更新引用记录"""
+        with self._lock:
+            prefix = old_name + os.sep
+            for rel_path in [p for p in self._digest_of if p.startswith(prefix)]:
+                digest = self._digest_of[rel_path]
+                self._set_ref(rel_path, None)
+                self._set_ref(os.path.join(new_name, rel_path[len(prefix):]), digest)
+
+    def flush(self) -> bool:
+        """立即写入尚未落盘的引用记录，在关闭前调用"""
+        return self._store.flush()
+
+    def collect_garbage(self) -> int:
+        """删除不再被任何表情包引用的内容，返回删除数量"""
+        removed = 0
+        with self._lock:
+            # 丢弃在插件之外被删除的文件的引用
+            for rel_path in list(self._digest_of):
+                if not os.path.exists(os.path.join(self.memes_dir, rel_path)):
+                    self._set_ref(rel_path, None)
+            dead = [digest for digest, paths in self._refs.items() if not paths]
+            if dead:
+                self._store.update(delete=dead)
+            for digest in dead:
+                try:
+                    os.remove(self.blob_path(digest))
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"清理了 {removed} 个未被引用的表情包内容")
+        return removed
@@ -1,17 +1,83 @@
 import os
+import time
 import logging
-from typing import Dict, Set, List, Tuple
+import threading
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional, Set, List, Tuple
 from .config import MEMES_DIR, MEMES_DATA_PATH, DEFAULT_CATEGORY_DESCRIPTIONS
-from .utils import ensure_dir_exists, save_json, load_json
+from .utils import ensure_dir_exists, save_json
+from .json_store import DebouncedJsonStore
 
 logger = logging.getLogger(__name__)
 
+
+class CategorySnapshot:
+    """类别配置的不可变快照
+
+    每次修改类别配置都会生成新的快照并递增版本号，读取方直接共享同一个对象，
+    依赖类别配置的缓存（标记匹配、文本、ETag）通过比较版本号判断是否失效。
+    """
+
+    __slots__ = ("version", "epoch", "descriptions", "tags", "by_description")
+
+    def __init__(self, descriptions: Mapping[str, str], version: int, epoch: int):
+        self.version = version
+        self.epoch = epoch  # 进程内唯一，避免重启后版本号重复导致 ETag 冲突
+        self.descriptions: Mapping[str, str] = MappingProxyType(dict(descriptions))
+        self.tags = frozenset(descriptions)
+        reverse: Dict[str, List[str]] = {}
+        for tag, description in descriptions.items():
+            reverse.setdefault(description, []).append(tag)
+        # 描述 -> 使用该描述的标签
+        self.by_description: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {description: tuple(tags) for description, tags in reverse.items()}
+        )
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self.tags
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    @property
+    def etag(self) -> str:
+        """不带引号的实体标签值"""
+        return f"categories-{self.epoch:x}-{self.version}"
+
+
 class CategoryManager:
-    def __init__(self):
-        """初始化类别管理器"""
+    def __init__(self, save_delay: float = 1.0):
+        """
+        初始化类别管理器
+
+        Args:
+            save_delay: 合并写入 memes_data.json 的时间窗口（秒），
+                窗口内的修改先记录在变更日志中
+        """
         ensure_dir_exists(MEMES_DIR)
         self._ensure_data_file()
+        self._store = DebouncedJsonStore(MEMES_DATA_PATH, delay=save_delay)
+        # 进程内运行的 WebUI 在工作线程中修改配置，与机器人共享同一个实例
+        self._lock = threading.RLock()
         self.descriptions = self._load_descriptions()
+        self._epoch = time.time_ns()
+        self.snapshot = CategorySnapshot(self.descriptions, 0, self._epoch)
+
+    @property
+    def version(self) -> int:
+        """类别配置版本号，每次变更后递增，用于使依赖缓存失效"""
+        return self.snapshot.version
+
+    def _publish(self) -> None:
+        """修改后生成新的快照"""
+        self.snapshot = CategorySnapshot(self.descriptions, self.snapshot.version + 1, self._epoch)
+
+    def _apply(self, set_items: Optional[Dict[str, str]] = None, delete: Iterable[str] = ()) -> bool:
+        """修改配置并发布新快照，返回修改是否已持久化"""
+        with self._lock:
+            saved = self._store.update(set_items, delete)
+            self._publish()
+            return saved
         
     def _ensure_data_file(self) -> None:
         """确保 memes_data.json 文件存在，不存在则创建并写入默认数据"""
@@ -20,8 +86,12 @@ class CategoryManager:
             logger.info(f"创建默认类别描述文件: {MEMES_DATA_PATH}")
             
     def _load_descriptions(self) -> Dict[str, str]:
-        """加载类别描述配置"""
-        return load_json(MEMES_DATA_PATH, DEFAULT_CATEGORY_DESCRIPTIONS)
+        """加载类别描述配置（包括变更日志中尚未写入文件的修改）"""
+        return self._store.load(DEFAULT_CATEGORY_DESCRIPTIONS)
+
+    def flush(self) -> bool:
+        """立即写入尚未落盘的修改，在关闭前调用"""
+        return self._store.flush()
     
     def get_local_categories(self) -> Set[str]:
         """获取本地文件夹中的类别"""
@@ -37,7 +107,7 @@ class CategoryManager:
         返回: (missing_in_config, deleted_categories)
         """
         local_categories = self.get_local_categories()
-        config_categories = set(self.descriptions.keys())
+        config_categories = set(self.snapshot.tags)
         
         return (
             list(local_categories - config_categories),  # 本地有但配置没有
@@ -48,16 +118,16 @@ class CategoryManager:
         """同步文件系统和配置"""
         try:
             local_categories = self.get_local_categories()
-            changed = False
-            
-            # 为新类别添加默认描述
-            for category in local_categories:
-                if category not in self.descriptions:
-                    self.descriptions[category] = "请添加描述"
-                    changed = True
-            
-            if changed:
-                return save_json(self.descriptions, MEMES_DATA_PATH)
+
+            with self._lock:
+                # 为新类别添加默认描述
+                added = {
+                    category: "请添加描述"
+                    for category in local_categories
+                    if category not in self.descriptions
+                }
+                if added:
+                    return self._apply(added)
             return True
         except Exception as e:
             logger.error(f"同步文件系统失败: {e}")
@@ -66,30 +136,34 @@ class CategoryManager:
     def update_description(self, category: str, description: str) -> bool:
         """更新类别描述"""
         try:
-            self.descriptions[category] = description
-            return save_json(self.descriptions, MEMES_DATA_PATH)
+            return self._apply({category: description})
         except Exception as e:
             logger.error(f"更新类别描述失败: {e}")
             return False
     
+    def update_descriptions(self, descriptions: Dict[str, str]) -> bool:
+        """批量更新类别描述"""
+        try:
+            return self._apply(descriptions)
+        except Exception as e:
+            logger.error(f"批量更新类别描述失败: {e}")
+            return False
+    
     def rename_category(self, old_name: str, new_name: str) -> bool:
         """重命名类别"""
         try:
-            if old_name not in self.descriptions:
-                return False
-                
-            # 更新配置
-            description = self.descriptions[old_name]
-            del self.descriptions[old_name]
-            self.descriptions[new_name] = description
-            
-            # 重命名文件夹
-            old_path = os.path.join(MEMES_DIR, old_name)
-            new_path = os.path.join(MEMES_DIR, new_name)
-            if os.path.exists(old_path):
-                os.rename(old_path, new_path)
-            
-            return save_json(self.descriptions, MEMES_DATA_PATH)
+            with self._lock:
+                if old_name not in self.descriptions:
+                    return False
+
+                # 重命名文件夹
+                old_path = os.path.join(MEMES_DIR, old_name)
+                new_path = os.path.join(MEMES_DIR, new_name)
+                if os.path.exists(old_path):
+                    os.rename(old_path, new_path)
+
+                # 更新配置
+                return self._apply({new_name: self.descriptions[old_name]}, delete=[old_name])
         except Exception as e:
             logger.error(f"重命名类别失败: {e}")
             return False
@@ -98,9 +172,9 @@ class CategoryManager:
         """删除类别"""
         try:
             # 从配置中删除
-            if category in self.descriptions:
-                del self.descriptions[category]
-                save_json(self.descriptions, MEMES_DATA_PATH)
+            with self._lock:
+                if category in self.descriptions:
+                    self._apply(delete=[category])
             
             # 删除文件夹
             category_path = os.path.join(MEMES_DIR, category)
@@ -113,6 +187,6 @@ class CategoryManager:
             logger.error(f"删除类别失败: {e}")
             return False
     
-    def get_descriptions(self) -> Dict[str, str]:
-        """获取所有类别描述"""
-        return self.descriptions.copy() 
\ No newline at end of file
+    def get_descriptions(self) -> Mapping[str, str]:
+        """获取所有类别描述（当前快照中的只读映射，不复制）"""
+        return self.snapshot.descriptions 
\ No newline at end of file
@@ -7,6 +7,13 @@ CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DATA_DIR = os.path.join(CURRENT_DIR, "../../memes_data")
 MEMES_DIR = os.path.join(BASE_DATA_DIR, "memes")  # 表情包存储路径
 MEMES_DATA_PATH = os.path.join(BASE_DATA_DIR, "memes_data.json")  # 类别描述数据文件路径
+BLOBS_DIR = os.path.join(BASE_DATA_DIR, "blobs")  # 按内容哈希寻址的表情包存储路径
+CATALOG_PATH = os.path.join(BASE_DATA_DIR, "memes_catalog.db")  # 表情包元数据目录路径
+PHASH_INDEX_PATH = os.path.join(BASE_DATA_DIR, "phash_index.json")  # 感知哈希索引文件路径
+VARIANTS_DIR = os.path.join(BASE_DATA_DIR, "variants")  # 发送用压缩版本存储路径
+THUMBS_DIR = os.path.join(BASE_DATA_DIR, "thumbs")  # WebUI 缩略图缓存路径
+PROFILES_DIR = os.path.join(BASE_DATA_DIR, "profiles")  # 性能分析结果存储路径
+MEME_WEIGHTS_PATH = os.path.join(BASE_DATA_DIR, "meme_weights.json")  # 表情包自定义权重文件路径
 
 # 默认的类别描述
 DEFAULT_CATEGORY_DESCRIPTIONS = {
@@ -30,4 +37,7 @@ DEFAULT_CATEGORY_DESCRIPTIONS = {
     "morning": "表达早安问候的场景",
     "sleep": "表达疲惫或休息的场景",
     "sigh": "表达叹息的场景"
-} 
\ No newline at end of file
+} 
+
+# 表情包支持的图片扩展名
+MEME_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif")
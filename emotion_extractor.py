@@ -0,0 +1,54 @@
+import re
+from typing import Iterable, List, Optional, Tuple
+
+
+class EmotionTagExtractor:
+    """LLM 回复中的表情标记提取器
+
+    用一个预编译的组合正则一次扫描文本，同时识别 [标签]、(标签)、（标签）
+    三种写法，命中已知标签的标记在同一遍扫描中被剔除。已知标签保存在
+    frozenset 中，匹配开销与类别数量无关；只有类别变化时才需要 update。
+    """
+
+    # 标记内部不允许再出现括号，嵌套写法如 ([happy]) 会命中内层标记
+    TAG_PATTERN = re.compile(
+        r"\[([^\[\]()（）]+)\]"  # [生气]
+        r"|\(([^\[\]()（）]+)\)"  # (生气)
+        r"|（([^\[\]()（）]+)）"  # （生气）
+    )
+
+    def __init__(self, tags: Iterable[str] = (), version: Optional[int] = None):
+        self._tags = frozenset(tags)
+        self.version = version
+
+    def update(self, tags: Iterable[str], version: Optional[int] = None) -> None:
+        """类别变化后重建已知标签集合"""
+        self._tags = frozenset(tags)
+        self.version = version
+
+    def extract(self, text: str, limit: int = 2) -> Tuple[str, List[str]]:
+        """
+        提取并剔除表情标记
+
+        Args:
+            text: LLM 回复文本
+            limit: 最多返回的表情数量（所有命中的标记都会被剔除）
+
+        Returns:
+            (剔除标记后的文本, 按出现顺序去重后的表情列表)
+        """
+        if not self._tags:
+            return text, []
+
+        tags = self._tags
+        found = {}
+
+        def _strip(match: re.Match) -> str:
+            emotion = match.group(match.lastindex)
+            if emotion in tags:
+                found.setdefault(emotion, None)
+                return ""
+            return match.group(0)
+
+        clean_text = self.TAG_PATTERN.sub(_strip, text)
+        return clean_text, list(found)[:limit]
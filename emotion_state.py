@@ -0,0 +1,62 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, List
+
+
+class EmotionStateStore:
+    """按事件保存识别到的表情
+
+    resp、on_decorating_result、after_message_sent 处理的是同一个事件对象，
+    因此以事件对象为键保存表情列表，并发回复之间互不影响。条目保留对事件
+    的引用，保证 id 在条目存活期间不会被复用；容量与存活时间都有上限，
+    未走完发送流程的事件会被自动淘汰。
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        """
+        Args:
+            max_size: 最多保存的事件数量，超出时淘汰最早的条目
+            ttl: 条目存活时间（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        """淘汰过期和超出容量的条目，调用方需持有锁"""
+        while self._entries:
+            _, (_, _, expire_at) = next(iter(self._entries.items()))
+            if expire_at > now and len(self._entries) <= self.max_size:
+                break
+            self._entries.popitem(last=False)
+
+    def set(self, event: Any, emotions: List[str]) -> None:
+        """保存事件对应的表情列表，列表为空时清除该事件"""
+        key = id(event)
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            if emotions:
+                self._entries[key] = (event, list(emotions), now + self.ttl)
+            self._evict(now)
+
+    def get(self, event: Any) -> List[str]:
+        """获取事件对应的表情列表"""
+        entry = self._entries.get(id(event))
+        if entry is None or entry[0] is not event or entry[2] < time.monotonic():
+            return []
+        return entry[1]
+
+    def pop(self, event: Any) -> List[str]:
+        """取出并清除事件对应的表情列表"""
+        with self._lock:
+            entry = self._entries.get(id(event))
+            if entry is None or entry[0] is not event:
+                return []
+            del self._entries[id(event)]
+        return entry[1] if entry[2] >= time.monotonic() else []
+
+    def __len__(self) -> int:
+        return len(self._entries)
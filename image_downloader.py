@@ -0,0 +1,265 @@
+import os
+import ssl
+import asyncio
+import hashlib
+import uuid
+import logging
+from typing import List, Optional, Union
+import aiohttp
+from .async_io import BlockingIO
+from .blob_store import BlobStore, StoredImage
+
+logger = logging.getLogger(__name__)
+
+# 该域名的 HTTPS 证书链在部分环境下校验失败，需要降级为 HTTP 下载
+TENCENT_MULTIMEDIA_HOST = "multimedia.nt.qq.com.cn"
+
+# 识别格式所需的文件头长度
+SNIFF_BYTES = 12
+
+# 文件头魔数 -> 扩展名
+_IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+
+class ImageDownloadError(Exception):
+    """图片下载失败（超出大小限制、格式不支持等）"""
+
+    pass
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """根据文件头识别图片格式，返回扩展名，无法识别时返回 None"""
+    for signature, ext in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+class ByteBudget:
+    """多个并发下载共享的字节预算
+
+    下载每收到一块数据就从预算中扣除，预算不足时中止该下载；失败或
+    重复的下载会归还已扣除的字节。只在事件循环中使用，无需加锁。
+    """
+
+    def __init__(self, total: int):
+        self.remaining = total
+
+    def reserve(self, nbytes: int) -> bool:
+        """扣除 nbytes，预算不足时不扣除并返回 False"""
+        if nbytes > self.remaining:
+            return False
+        self.remaining -= nbytes
+        return True
+
+    def release(self, nbytes: int) -> None:
+        self.remaining += nbytes
+
+
+class ImageDownloader:
+    """上传图片下载器
+
+    持有两个长期复用的连接池：一个用于腾讯多媒体域名的 HTTP 降级下载，
+    一个用于普通 HTTPS 下载（沿用旧逻辑，不校验证书）。两者都开启
+    keep-alive 与 DNS 缓存，同一条消息中的多张图片在并发上限内同时下载。
+
+    响应按块流式写入目标目录下的临时文件，根据首个数据块识别格式，
+    超出大小限制时立即中止，完成后原子重命名为正式文件，内存占用与
+    图片大小无关。写入的同时计算 SHA-256，交给 BlobStore 去重入库。
+    文件操作都通过 BlockingIO 在线程池中执行。
+    """
+
+    def __init__(
+        self,
+        blocking_io: BlockingIO,
+        blob_store: BlobStore,
+        concurrency: int = 4,
+        max_bytes: int = 10 * 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+        pool_size: int = 16,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30.0,
+        timeout: float = 60.0,
+    ):
+        """
+        Args:
+            blocking_io: 阻塞操作执行器
+            blob_store: 内容寻址存储，用于去重
+            concurrency: 单条消息内同时下载的图片数量上限
+            max_bytes: 单张图片的大小上限（字节）
+            chunk_size: 流式读取的块大小（字节）
+            pool_size: 每个连接池的最大连接数
+            dns_cache_ttl: DNS 缓存时间（秒）
+            keepalive_timeout: 空闲连接保持时间（秒）
+            timeout: 单张图片下载的总超时（秒）
+        """
+        self.blocking_io = blocking_io
+        self.blob_store = blob_store
+        self.concurrency = max(1, concurrency)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.pool_size = pool_size
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._https_session: Optional[aiohttp.ClientSession] = None
+
+    def _make_session(self, ssl_context) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            limit=self.pool_size,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    def _get_session(self, url: str):
+        """根据 URL 选择连接池，返回 (session, 实际请求的 URL)"""
+        if TENCENT_MULTIMEDIA_HOST in url:
+            if self._http_session is None or self._http_session.closed:
+                self._http_session = self._make_session(False)
+            insecure_url = url.replace("https://", "http://", 1)
+            logger.warning(f"检测到腾讯多媒体域名，使用 HTTP 协议下载: {insecure_url}")
+            return self._http_session, insecure_url
+
+        if self._https_session is None or self._https_session.closed:
+            # 创建忽略 SSL 验证的上下文
+            ssl_context = ssl.create_default_context()
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+            self._https_session = self._make_session(ssl_context)
+        return self._https_session, url
+
+    @staticmethod
+    def _sniff_or_raise(head: bytes) -> str:
+        ext = sniff_image_type(head)
+        if ext is None:
+            raise ImageDownloadError("下载内容不是支持的图片格式")
+        return ext
+
+    async def download(
+        self,
+        url: str,
+        save_dir: str,
+        stem: str,
+        max_bytes: Optional[int] = None,
+        budget: Optional[ByteBudget] = None,
+    ) -> StoredImage:
+        """
+        下载单张图片到 save_dir
+
+        Args:
+            url: 图片地址
+            save_dir: 保存目录
+            stem: 不含扩展名的文件名，扩展名根据识别出的格式决定
+            max_bytes: 本次下载的大小上限，默认使用初始化时的设置
+            budget: 与其他下载共享的字节预算，重复内容不占用预算
+
+        Returns:
+            入库结果，同类别已有相同内容时指向已有文件
+        """
+        session, request_url = self._get_session(url)
+        run = self.blocking_io.run
+        max_bytes = self.max_bytes if max_bytes is None else min(max_bytes, self.max_bytes)
+        temp_path = os.path.join(save_dir, f".{stem}.{uuid.uuid4().hex}.part")
+        reserved = 0
+        try:
+            async with session.get(request_url) as resp:
+                resp.raise_for_status()
+                if resp.content_length and resp.content_length > max_bytes:
+                    raise ImageDownloadError(
+                        f"图片过大: {resp.content_length} 字节，上限 {max_bytes} 字节"
+                    )
+                if budget is not None and resp.content_length and resp.content_length > budget.remaining:
+                    raise ImageDownloadError(
+                        f"图片过大: {resp.content_length} 字节，本次上传剩余额度 {budget.remaining} 字节"
+                    )
+
+                ext = None
+                head = b""
+                hasher = hashlib.sha256()
+                received = 0
+                f = await run(open, temp_path, "wb")
+                try:
+                    async for chunk in resp.content.iter_chunked(self.chunk_size):
+                        received += len(chunk)
+                        if received > max_bytes:
+                            raise ImageDownloadError(f"图片超过大小上限 {max_bytes} 字节")
+                        if budget is not None:
+                            if not budget.reserve(len(chunk)):
+                                raise ImageDownloadError("本次上传的图片总大小超过上限")
+                            reserved += len(chunk)
+                        if ext is None and len(head) < SNIFF_BYTES:
+                            head += chunk[: SNIFF_BYTES - len(head)]
+                            if len(head) >= SNIFF_BYTES:
+                                ext = self._sniff_or_raise(head)
+                        hasher.update(chunk)
+                        await run(f.write, chunk)
+                finally:
+                    await run(f.close)
+
+            if ext is None:
+                ext = self._sniff_or_raise(head)
+            save_path = os.path.join(save_dir, stem + ext)
+            stored = await run(
+                self.blob_store.ingest, temp_path, hasher.hexdigest(), save_path
+            )
+        except BaseException:
+            if budget is not None:
+                budget.release(reserved)
+            raise
+        finally:
+            await run(self._discard, temp_path)
+        if stored.duplicate and budget is not None:
+            budget.release(reserved)
+        return stored
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def download_all(
+        self,
+        urls: List[str],
+        save_dir: str,
+        stems: List[str],
+        total_bytes: Optional[int] = None,
+    ) -> List[Union[StoredImage, Exception]]:
+        """
+        并发下载多张图片
+
+        Args:
+            total_bytes: 所有图片合计的大小上限，并发下载共享这一额度，
+                默认只限制单张图片的大小
+
+        Returns:
+            与 urls 顺序一致的结果列表，成功为入库结果，失败为对应的异常
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        budget = ByteBudget(total_bytes) if total_bytes is not None else None
+
+        async def _download(url: str, stem: str) -> StoredImage:
+            async with semaphore:
+                return await self.download(url, save_dir, stem, budget=budget)
+
+        return await asyncio.gather(
+            *(_download(url, stem) for url, stem in zip(urls, stems)),
+            return_exceptions=True,
+        )
+
+    async def close(self) -> None:
+        """关闭连接池"""
+        for session in (self._http_session, self._https_session):
+            if session is not None and not session.closed:
+                await session.close()
+        self._http_session = None
+        self._https_session = None
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from typing import List, Dict
 
@@ -7,12 +8,33 @@ class FileHandler:
 
     SUPPORTED_FORMATS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, catalog=None):
+        """
+        Args:
+            base_dir: 本地图片目录
+            catalog: 可选的元数据目录，提供 reconcile/list_files/upsert_file 方法，
+                传入时用目录查询代替递归扫描
+        """
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.catalog = catalog
 
     def scan_local_images(self) -> List[Dict[str, str]]:
         """扫描本地图片"""
+        if self.catalog is not None:
+            self.catalog.reconcile()
+            base_dir = str(self.base_dir)
+            return [
+                {
+                    "path": os.path.join(base_dir, record["path"]),
+                    "id": record["filename"],
+                    "filename": record["filename"],
+                    "category": record["category"],
+                }
+                for record in self.catalog.list_files()
+                if os.path.splitext(record["filename"])[1].lower() in self.SUPPORTED_FORMATS
+            ]
+
         images = []
         for file_path in self.base_dir.rglob("*"):
             if (
@@ -39,6 +61,11 @@ class FileHandler:
                 )
         return images
 
+    def record_file(self, file_path: Path) -> None:
+        """登记新写入的本地文件"""
+        if self.catalog is not None:
+            self.catalog.upsert_file(str(file_path))
+
     def get_file_path(self, category: str, filename: str) -> Path:
         """获取文件完整路径，支持分类目录"""
         path = self.base_dir
@@ -3,15 +3,17 @@ from typing import Dict, List, Set
 from tqdm import tqdm
 from ..interfaces.image_host import ImageHostInterface
 from .file_handler import FileHandler
+from ...profiling import profiled
 
 
 class SyncManager:
     """同步管理器"""
 
-    def __init__(self, image_host: ImageHostInterface, local_dir: Path):
+    def __init__(self, image_host: ImageHostInterface, local_dir: Path, catalog=None):
         self.image_host = image_host
-        self.file_handler = FileHandler(local_dir)
+        self.file_handler = FileHandler(local_dir, catalog)
 
+    @profiled()
     def check_sync_status(self) -> Dict[str, List[Dict]]:
         """检查同步状态"""
         print("正在扫描本地文件...")
@@ -66,6 +68,7 @@ class SyncManager:
             "is_synced": not (to_upload or to_download),
         }
 
+    @profiled()
     def sync_to_remote(self) -> bool:
         """同步本地文件到远程"""
         status = self.check_sync_status()
@@ -100,6 +103,7 @@ class SyncManager:
 
         return True
 
+    @profiled()
     def sync_from_remote(self) -> bool:
         """从远程同步文件到本地"""
         status = self.check_sync_status()
@@ -122,6 +126,7 @@ class SyncManager:
                         save_path = self.file_handler.get_file_path(category, filename)
 
                         if self.image_host.download_image(image, save_path):
+                            self.file_handler.record_file(save_path)
                             pbar.update(1)
                         else:
                             print(f"\n下载失败: {filename}")
@@ -2,7 +2,9 @@ from pathlib import Path
 from typing import Dict, List, Optional, Union
 from .core.sync_manager import SyncManager
 from .providers.stardots_provider import StarDotsProvider
+from ..metrics import REGISTRY
 import multiprocessing
+import threading
 import sys
 import asyncio
 import logging
@@ -36,17 +38,19 @@ class ImageSync:
         sync.sync_all()
     """
 
-    def __init__(self, config: Dict[str, str], local_dir: Union[str, Path]):
+    def __init__(self, config: Dict[str, str], local_dir: Union[str, Path], catalog=None):
         """
         初始化同步客户端
 
         Args:
             config: 包含图床配置信息的字典，必须包含 key、secret 和 space
             local_dir: 本地图片目录的路径
+            catalog: 可选的 MemeCatalog 实例，用于代替目录扫描并登记下载的文件
         """
         logger.debug("Initializing ImageSync with config: %s", config)
         self.config = config  # 保存完整配置
         self.local_dir = Path(local_dir)  # 保存本地目录路径
+        self.catalog = catalog
         self.provider = self._initialize_provider(config)
         if self.provider is None:
             logger.error("Image provider initialization failed.")
@@ -54,7 +58,8 @@ class ImageSync:
             logger.debug("Image provider initialized successfully: %s", self.provider)
         self.sync_manager = SyncManager(
             image_host=self.provider, 
-            local_dir=self.local_dir
+            local_dir=self.local_dir,
+            catalog=catalog,
         )
         self.sync_process = None
         self._sync_task = None
@@ -92,13 +97,15 @@ class ImageSync:
         Returns:
             同步是否成功
         """
-        # 如果已有正在运行的同步任务，先停止它
+        loop = asyncio.get_running_loop()
+        # 如果已有正在运行的同步任务，先停止它（等待进程退出，在线程池中执行）
         if self.sync_process and self.sync_process.is_alive():
             logger.warning("已有正在运行的同步任务，将先停止它")
-            self.stop_sync()
+            self._cancel_sync_task()
+            await loop.run_in_executor(None, self._terminate_sync_process)
 
-        # 检查是否需要同步
-        status = self.check_status()
+        # 检查是否需要同步（对账元数据目录并请求图床文件列表，在线程池中执行）
+        status = await loop.run_in_executor(None, self.check_status)
         if task == 'upload' and not status.get("to_upload"):
             logger.info("没有文件需要上传")
             return True
@@ -107,15 +114,12 @@ class ImageSync:
             return True
 
         # 创建并启动进程，使用 self.local_dir 而不是 sync_manager.local_dir
-        self.sync_process = multiprocessing.Process(
-            target=run_sync_process,
-            args=(self.config, str(self.local_dir), task)  # 使用字符串形式的路径
-        )
-        self.sync_process.start()
+        self.sync_process, metrics_conn = self._spawn_sync_process(task)
 
         # 创建异步任务来等待进程完成
-        loop = asyncio.get_event_loop()
-        self._sync_task = loop.run_in_executor(None, self.sync_process.join)
+        self._sync_task = loop.run_in_executor(
+            None, _wait_sync_process, self.sync_process, metrics_conn
+        )
         
         try:
             # 等待进程完成
@@ -128,12 +132,19 @@ class ImageSync:
 
     def stop_sync(self):
         """停止当前正在运行的同步任务"""
+        self._terminate_sync_process()
+        self._cancel_sync_task()
+
+    def _terminate_sync_process(self):
+        """终止同步进程并等待其退出（阻塞）"""
         if self.sync_process and self.sync_process.is_alive():
             self.sync_process.terminate()
             self.sync_process.join(timeout=5)
             if self.sync_process.is_alive():
                 self.sync_process.kill()
             self.sync_process = None
+
+    def _cancel_sync_task(self):
         if self._sync_task and not self._sync_task.done():
             self._sync_task.cancel()
             self._sync_task = None
@@ -205,15 +216,29 @@ class ImageSync:
         """
         在独立进程中运行同步任务
         """
-        # 创建进程对象
+        process, metrics_conn = self._spawn_sync_process(task)
+        # 调用方不等待进程结束，由后台线程回收子进程的指标
+        threading.Thread(
+            target=_wait_sync_process, args=(process, metrics_conn),
+            name="img-sync-wait", daemon=True,
+        ).start()
+        return process
+
+    def _spawn_sync_process(self, task: str):
+        """启动同步子进程，返回 (进程, 接收子进程指标的管道端)"""
+        receiver, sender = multiprocessing.Pipe(duplex=False)
         process = multiprocessing.Process(
             target=run_sync_process,
-            args=(self.config, str(self.local_dir), task)
+            args=(self.config, str(self.local_dir), task, self._catalog_path(), sender)  # 使用字符串形式的路径
         )
-        
-        # 启动进程
         process.start()
-        return process
+        # 父进程关闭发送端，子进程异常退出时接收端才能读到 EOF
+        sender.close()
+        return process, receiver
+
+    def _catalog_path(self) -> Optional[str]:
+        """子进程中重新打开元数据目录所需的数据库路径"""
+        return self.catalog.db_path if self.catalog is not None else None
 
     def get_files_to_upload(self) -> List[Dict[str, str]]:
         """获取待上传的文件列表"""
@@ -229,19 +254,51 @@ class ImageSync:
         to_download = set(remote_files) - local_files
         return [{"filename": file} for file in to_download]
 
-def run_sync_process(config: Dict[str, str], local_dir: str, task: str):
+def _wait_sync_process(process: multiprocessing.Process, metrics_conn) -> None:
+    """等待同步子进程结束，并把它记录的指标（图床请求耗时等）合并到本进程"""
+    try:
+        state = metrics_conn.recv()
+    except (EOFError, OSError):
+        # 子进程被终止或异常退出，没有发回指标
+        state = None
+    finally:
+        metrics_conn.close()
+    process.join()
+    if state:
+        REGISTRY.merge(state)
+
+
+def run_sync_process(config: Dict[str, str], local_dir: str, task: str, catalog_path: Optional[str] = None,
+                     metrics_conn=None):
     """
     在独立进程中运行同步任务
+
+    metrics_conn 不为空时，结束前把本进程记录的指标通过它发回父进程。
     """
-    sync = ImageSync(config, local_dir)
-    
-    if task == 'upload':
-        success = sync.sync_manager.sync_to_remote()
-        sys.exit(0 if success else 1)
-    elif task == 'download':
-        success = sync.sync_manager.sync_from_remote()
-        sys.exit(0 if success else 1)
-    elif task == 'sync_all':
-        upload_success = sync.sync_manager.sync_to_remote()
-        download_success = sync.sync_manager.sync_from_remote()
-        sys.exit(0 if upload_success and download_success else 1)
+    # fork 出的子进程继承了父进程的指标数值，清空后只记录本次同步的数据
+    REGISTRY.reset()
+    try:
+        catalog = None
+        if catalog_path:
+            from ..meme_catalog import MemeCatalog
+
+            catalog = MemeCatalog(catalog_path, local_dir)
+        sync = ImageSync(config, local_dir, catalog)
+
+        if task == 'upload':
+            success = sync.sync_manager.sync_to_remote()
+            sys.exit(0 if success else 1)
+        elif task == 'download':
+            success = sync.sync_manager.sync_from_remote()
+            sys.exit(0 if success else 1)
+        elif task == 'sync_all':
+            upload_success = sync.sync_manager.sync_to_remote()
+            download_success = sync.sync_manager.sync_from_remote()
+            sys.exit(0 if upload_success and download_success else 1)
+    finally:
+        if metrics_conn is not None:
+            try:
+                metrics_conn.send(REGISTRY.dump())
+            except Exception as e:
+                logger.warning(f"发回同步进程指标失败: {e}")
+            metrics_conn.close()
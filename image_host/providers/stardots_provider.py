@@ -8,6 +8,7 @@ from urllib3.util.retry import Retry
 from pathlib import Path
 from typing import List, Dict, TypedDict
 from ..interfaces.image_host import ImageHostInterface
+from ...metrics import STARDOTS_REQUEST_SECONDS, STARDOTS_REQUESTS
 import urllib3
 import json
 import logging
@@ -114,7 +115,9 @@ class StarDotsProvider(ImageHostInterface):
         """同步服务器时间"""
         try:
             # 使用任意API请求来获取服务器时间
-            response = requests.get(f"{self.base_url}/openapi/space/list")
+            response = self._observe(
+                "space/list", requests.get, f"{self.base_url}/openapi/space/list"
+            )
             if response.status_code == 200:
                 result = response.json()
                 server_ts = result.get("ts", 0) // 1000  # 转换为秒
@@ -141,8 +144,21 @@ class StarDotsProvider(ImageHostInterface):
             "Content-Type": "application/json",
         }
 
+    def _observe(self, endpoint: str, func, *args, **kwargs) -> requests.Response:
+        """发送请求，并记录耗时与响应状态"""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = func(*args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            STARDOTS_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+            STARDOTS_REQUESTS.labels(endpoint, status).inc()
+
     def _make_request(self, method: str, url: str, **kwargs) -> requests.Response:
         """统一的请求处理方法"""
+        endpoint = url.split("/openapi/", 1)[-1]
         try:
             # 添加默认超时
             kwargs.setdefault("timeout", 30)
@@ -150,13 +166,13 @@ class StarDotsProvider(ImageHostInterface):
             # 添加SSL验证选项
             kwargs.setdefault("verify", True)
 
-            response = self.session.request(method, url, **kwargs)
+            response = self._observe(endpoint, self.session.request, method, url, **kwargs)
             response.raise_for_status()
             return response
         except requests.exceptions.SSLError as e:
             # SSL错误，尝试禁用验证
             kwargs["verify"] = False
-            response = self.session.request(method, url, **kwargs)
+            response = self._observe(endpoint, self.session.request, method, url, **kwargs)
             response.raise_for_status()
             return response
         except Exception as e:
@@ -245,7 +261,9 @@ class StarDotsProvider(ImageHostInterface):
                     }
 
                     # 使用 PUT 方法上传
-                    response = requests.put(
+                    response = self._observe(
+                        "file/upload",
+                        requests.put,
                         f"{self.base_url}/openapi/file/upload",
                         headers=headers,
                         files=files,
@@ -306,8 +324,12 @@ class StarDotsProvider(ImageHostInterface):
 
         data = {"space": self.space, "filenameList": [image_id]}  # 使用 image_id 删除
 
-        response = requests.delete(
-            f"{self.base_url}/openapi/file/delete", headers=headers, json=data
+        response = self._observe(
+            "file/delete",
+            requests.delete,
+            f"{self.base_url}/openapi/file/delete",
+            headers=headers,
+            json=data,
         )
 
         if response.status_code == 200:
@@ -454,7 +476,9 @@ class StarDotsProvider(ImageHostInterface):
                         url = f"{base_url}?ticket={ticket_result['data']['ticket']}"
 
                         # 下载文件
-                        response = requests.get(url, stream=True, verify=False)
+                        response = self._observe(
+                            "download", requests.get, url, stream=True, verify=False
+                        )
 
                         # 检查响应头
                         content_type = response.headers.get("Content-Type", "")
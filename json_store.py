@@ -0,0 +1,150 @@
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+from .utils import load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+
+class DebouncedJsonStore:
+    """合并写入的 JSON 字典存储
+
+    每次修改先以一行 JSON 追加到变更日志，再安排一次延迟写入：delay 秒内
+    的多次修改只会完整写一次文件（临时文件 + fsync + 原子替换），写入成功
+    后清空变更日志。进程在延迟窗口内崩溃或被终止时，下次 load() 会把变更
+    日志重放到上一次完整写入的内容上。
+
+    变更日志在窗口内保持打开，每条记录只写入操作系统缓冲（进程崩溃或被
+    终止时不会丢失），fsync 合并为窗口结束时的一次完整写入；完整写入失败
+    时才对变更日志 fsync。因此只有系统掉电时会丢失最近一个窗口内的修改。
+
+    journal_path 为 None 时不记录变更日志，只做合并写入。
+    """
+
+    def __init__(self, path: str, delay: float = 1.0, journal_path: Optional[str] = ""):
+        """
+        Args:
+            path: JSON 文件路径
+            delay: 合并写入的时间窗口（秒），为 0 时每次修改立即写入
+            journal_path: 变更日志路径，默认为 path + ".journal"，None 表示不记录
+        """
+        self.path = path
+        self.delay = delay
+        self.journal_path = f"{path}.journal" if journal_path == "" else journal_path
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self._journal = None  # 当前窗口内打开的变更日志文件
+
+    def load(self, default: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """读取文件并重放未落盘的变更，返回存储持有的字典（调用方不应直接修改）"""
+        with self._lock:
+            data = load_json(self.path, dict(default) if default is not None else {})
+            replayed = self._replay(data)
+            self._data = data
+            if replayed:
+                logger.info(f"已从变更日志恢复 {replayed} 条修改: {self.journal_path}")
+                self._write()
+            return self._data
+
+    def _replay(self, data: Dict[str, Any]) -> int:
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
+        count = 0
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半
+                    logger.warning(f"忽略损坏的变更日志行: {line[:80]!r}")
+                    continue
+                for key in entry.get("delete", ()):
+                    data.pop(key, None)
+                data.update(entry.get("set", {}))
+                count += 1
+        return count
+
+    def update(self, set_items: Optional[Dict[str, Any]] = None, delete: Iterable[str] = ()) -> bool:
+        """
+        修改存储内容，先删除再设置，一次调用作为一条变更记录
+
+        Returns:
+            变更是否已写入变更日志（未启用日志时恒为 True）
+        """
+        set_items = dict(set_items or {})
+        delete = list(delete)
+        with self._lock:
+            for key in delete:
+                self._data.pop(key, None)
+            self._data.update(set_items)
+            ok = self._append_journal({"set": set_items, "delete": delete})
+            self._schedule()
+            return ok
+
+    def _append_journal(self, entry: Dict[str, Any]) -> bool:
+        if not self.journal_path:
+            return True
+        try:
+            if self._journal is None:
+                self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal.flush()
+            return True
+        except OSError as e:
+            logger.error(f"写入变更日志失败 {self.journal_path}: {e}")
+            self._close_journal()
+            return False
+
+    def _sync_journal(self) -> None:
+        if self._journal is not None:
+            try:
+                os.fsync(self._journal.fileno())
+            except OSError as e:
+                logger.warning(f"同步变更日志失败 {self.journal_path}: {e}")
+
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            try:
+                self._journal.close()
+            except OSError:
+                pass
+            self._journal = None
+
+    def _schedule(self) -> None:
+        self._dirty = True
+        if self.delay <= 0:
+            self._write()
+            return
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _write(self) -> bool:
+        """完整写入文件并清空变更日志（调用方持有锁）"""
+        if not save_json(self._data, self.path):
+            # 没能完整写入，变更日志成为唯一的副本，此时再 fsync
+            self._sync_journal()
+            return False
+        self._dirty = False
+        self._close_journal()
+        if self.journal_path and os.path.exists(self.journal_path):
+            try:
+                os.remove(self.journal_path)
+            except OSError as e:
+                logger.warning(f"清理变更日志失败 {self.journal_path}: {e}")
+        return True
+
+    def flush(self) -> bool:
+        """立即写入尚未落盘的修改"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return True
+            return self._write()
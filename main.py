@@ -1,14 +1,10 @@
-import re
 import os
-import io
-import random
 import logging
 import json
 import time
-import aiohttp
-import ssl
-import imghdr
-from PIL import Image
+import uuid
+import importlib
+import threading
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star, register
 from astrbot.api.provider import LLMResponse
@@ -18,15 +14,26 @@ from astrbot.api.event import ResultContentType
 from astrbot.core.message.components import Plain
 from astrbot.api.all import *
 from astrbot.core.message.message_event_result import MessageChain
-from .webui import start_server, shutdown_server
 from .utils import get_public_ip
-from .image_host.img_sync import ImageSync
 from .config import MEMES_DIR
 from .category_manager import CategoryManager
+from .meme_index import MemeIndex
+from .meme_catalog import get_catalog
+from .meme_selector import MemeSelector
+from .emotion_extractor import EmotionTagExtractor
+from .emotion_state import EmotionStateStore
+from .meme_cache import MemeCache
+from .meme_variants import MemeVariants
+from .meme_dispatcher import MemeDispatcher
+from .image_downloader import ImageDownloader
+from .async_io import BlockingIO, LoopBlockMonitor
+from .blob_store import BlobStore
+from .near_duplicates import NearDuplicateIndex
+from .upload_sessions import UploadSessionManager
+from .metrics import REGISTRY, STAGE_SECONDS, STAGE_ERRORS, MetricsBridge
+from .profiling import PROFILER, PROFILING_MODES, profiled
 from .init import init_plugin
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
-
 logger = logging.getLogger(__name__)
 
 @register(
@@ -44,8 +51,62 @@ class MemeSender(Star):
             logger.error("Plugin initialization failed.")
             raise RuntimeError("插件初始化失败")
         
+        # 性能分析钩子，默认关闭
+        PROFILER.max_files = self.config.get("profiling_max_files", 50)
+        PROFILER.set_mode(self.config.get("profiling_mode", "off"))
+
+        # 阻塞操作统一投递到有界线程池，避免卡住事件循环
+        self.blocking_io = BlockingIO(max_workers=self.config.get("io_workers", 4))
+        self.loop_monitor = None
+        if self.config.get("debug_loop_block_ms", 0) > 0:
+            self.loop_monitor = LoopBlockMonitor(self.config["debug_loop_block_ms"])
+            self.loop_monitor.start()
+
         # 初始化类别管理器
         self.category_manager = CategoryManager()
+
+        # 初始化表情包元数据目录和内存索引
+        self.meme_catalog = get_catalog()
+        self.meme_index = MemeIndex(MEMES_DIR, catalog=self.meme_catalog)
+        self.meme_index.build(self.category_manager.snapshot.tags)
+        self.meme_selector = MemeSelector(
+            self.meme_index,
+            history_size=self.config.get("meme_no_repeat", 5),
+            new_boost=self.config.get("new_meme_boost", 2.0),
+            new_days=self.config.get("new_meme_days", 7),
+        )
+
+        # 初始化热门表情包缓存
+        self.meme_cache = MemeCache(
+            max_bytes=self.config.get("meme_cache_size_mb", 64) * 1024 * 1024
+        )
+
+        # 初始化发送版本生成器和近似重复索引。补齐已有表情包的发送版本、
+        # 计算感知哈希需要导入 PIL 并解码整个库，推迟到插件加载之后在后台进行
+        self.meme_variants = MemeVariants(
+            max_side=self.config.get("meme_max_side", 512),
+            enabled=self.config.get("optimize_memes", True),
+        )
+        self.near_duplicates = NearDuplicateIndex(
+            distance=self.config.get("near_duplicate_distance", 6)
+        )
+        self._background_timer = None
+        background_delay = self.config.get("background_tasks_delay", 120)
+        if background_delay >= 0:
+            self._background_timer = threading.Timer(background_delay, self._start_background_tasks)
+            self._background_timer.daemon = True
+            self._background_timer.start()
+
+        # 初始化表情包发送调度器
+        self.meme_dispatcher = MemeDispatcher(
+            self._send_meme_chain,
+            mode=self.config.get("meme_send_mode", "concurrent"),
+            per_origin_limit=self.config.get("meme_send_concurrency", 2),
+        )
+
+        # 初始化表情标记提取器，类别变化时按版本号重建
+        self.tag_extractor = EmotionTagExtractor()
+        self._category_list = (None, "")  # (快照版本, 类别列表文本)
         
         # 初始化图床同步客户端
         self.img_sync = None
@@ -53,38 +114,101 @@ class MemeSender(Star):
             stardots_config = self.config.get("image_host_config", {}).get("stardots", {})
             if stardots_config.get("key") and stardots_config.get("secret"):
                 logger.debug("Initializing ImageSync with stardots config: %s", stardots_config)
+                # 图床同步依赖 requests/tqdm 等，只在配置了图床时导入
+                from .image_host.img_sync import ImageSync
+
                 self.img_sync = ImageSync(
                     config={
                         "key": stardots_config["key"],
                         "secret": stardots_config["secret"],
                         "space": stardots_config.get("space", "memes")
                     },
-                    local_dir=MEMES_DIR
+                    local_dir=MEMES_DIR,
+                    catalog=self.meme_catalog,
                 )
             else:
                 logger.error("Stardots configuration is missing key or secret.")
 
-        # 用于存储服务器进程
+        # 上传图片下载器，复用连接池
+        self.blob_store = BlobStore()
+        self.downloader = ImageDownloader(
+            self.blocking_io,
+            self.blob_store,
+            concurrency=self.config.get("upload_concurrency", 4),
+            max_bytes=self.config.get("max_upload_size_mb", 10) * 1024 * 1024,
+        )
+
+        # 用于存储服务器进程（独立进程模式）或进程内服务器
         self.server_process = None
+        self.webui_server = None
         self.server_key = None
 
         # 初始化表情状态
-        self.found_emotions = []  # 存储找到的表情
-        self.upload_states = {}   # 存储上传状态：{user_session: {"category": str, "expire_time": float}}
+        self.emotion_states = EmotionStateStore()  # 按事件存储找到的表情
+        self.upload_sessions = UploadSessionManager(
+            ttl=self.config.get("upload_timeout", 30),
+            max_images=self.config.get("upload_max_images", 20),
+            max_bytes=self.config.get("upload_max_total_mb", 50) * 1024 * 1024,
+        )
         self.pending_images = {}  # 存储待发送的图片
 
+        # 指标只在被采集时计算，WebUI 进程通过管道获取
+        REGISTRY.gauge(
+            "meme_cache_hit_ratio", "表情包缓存命中率", lambda: self.meme_cache.stats()["hit_ratio"]
+        )
+        REGISTRY.gauge(
+            "meme_cache_bytes", "表情包缓存占用字节数", lambda: self.meme_cache.stats()["bytes"]
+        )
+        REGISTRY.gauge(
+            "meme_upload_sessions", "上传会话累计数量", lambda: self.upload_sessions.counters, "outcome"
+        )
+        # 独立进程运行的 WebUI 通过管道获取机器人的指标，进程内运行时直接读取注册表
+        self.webui_mode = self.config.get("webui_mode", "inprocess")
+        self.metrics_bridge = None
+        if self.webui_mode == "process":
+            self.metrics_bridge = MetricsBridge(REGISTRY)
+            self.metrics_bridge.start()
+
+    def _start_background_tasks(self):
+        """补齐发送版本并增量刷新感知哈希索引（均在各自的后台线程中运行）"""
+        self.meme_variants.start_backfill()
+        self.near_duplicates.start_refresh()
+
     @filter.command("启动表情包管理服务器")
+    @profiled()
     async def start_webui(self, event: AstrMessageEvent):
         """启动表情包管理服务器的指令，返回访问地址和当前秘钥"""
         yield event.plain_result("表情包管理服务器启动中，请稍候……")
 
         try:
-            server_key, server_process = start_server({
+            webui_config = {
                 "img_sync": self.img_sync,
                 "category_manager": self.category_manager,
-                "webui_port": self.config.get("webui_port", 5000)
-            })
-            self.server_process = server_process
+                "meme_index": self.meme_index,
+                "meme_variants": self.meme_variants,
+                "blob_store": self.blob_store,
+                "near_duplicates": self.near_duplicates,
+                "metrics_bridge": self.metrics_bridge,
+                "metrics_public": self.config.get("metrics_public", False),
+                "webui_port": self.config.get("webui_port", 5000),
+                "webui_workers": self.config.get("webui_workers", 8),
+                "webui_request_timeout": self.config.get("webui_request_timeout", 30),
+            }
+            await self._shutdown_webui()
+
+            # WebUI 依赖 Flask 等，只在首次启动时导入；导入耗时较长，在线程池中执行
+            await self.blocking_io.run(importlib.import_module, ".webui", __package__)
+            if self.webui_mode == "process":
+                from .webui import start_server
+
+                # 检查并结束占用端口的旧进程（遍历进程、等待退出）会阻塞
+                server_key, self.server_process = await self.blocking_io.run(
+                    start_server, webui_config
+                )
+            else:
+                from .webui import start_inprocess_server
+
+                server_key, self.webui_server = await start_inprocess_server(webui_config)
 
             # 获取公网 IP
             public_ip = await get_public_ip()
@@ -99,30 +223,46 @@ class MemeSender(Star):
             yield event.plain_result(f"启动表情包管理服务器失败: {str(e)}")
 
     @filter.command("关闭表情包管理服务器")
+    @profiled()
     async def stop_server(self, event: AstrMessageEvent):
         """
         关闭表情包管理服务器的指令
         """
-        if not self.server_process:
+        if not self.server_process and not self.webui_server:
             yield event.plain_result("表情包管理服务器未启动或已关闭。")
             return
 
         yield event.plain_result("正在关闭表情包管理服务器……")
-        shutdown_server(self.server_process)
-        self.server_process = None
+        await self._shutdown_webui()
         yield event.plain_result("表情包管理服务器已关闭！")
 
+    async def _shutdown_webui(self):
+        """关闭正在运行的 WebUI，等待进行中的请求完成"""
+        if self.webui_server:
+            await self.webui_server.stop()
+            self.webui_server = None
+        if self.server_process:
+            from .webui import shutdown_server
+
+            # 等待进行中的请求完成可能需要数秒，不阻塞事件循环
+            await self.blocking_io.run(shutdown_server, self.server_process)
+            self.server_process = None
+
     @filter.command("查看表情包")
+    @profiled()
     async def list_emotions(self, event: AstrMessageEvent):
         """查看所有可用表情包类别"""
-        descriptions = self.category_manager.get_descriptions()
-        categories = "\n".join([
-            f"- {tag}: {desc}" 
-            for tag, desc in descriptions.items()
-        ])
-        yield event.plain_result(f"当前支持的表情包类别：\n{categories}")
+        snapshot = self.category_manager.snapshot
+        if self._category_list[0] != snapshot.version:
+            categories = "\n".join([
+                f"- {tag}: {desc}" 
+                for tag, desc in snapshot.descriptions.items()
+            ])
+            self._category_list = (snapshot.version, categories)
+        yield event.plain_result(f"当前支持的表情包类别：\n{self._category_list[1]}")
 
     @filter.command("上传表情包")
+    @profiled()
     async def upload_meme(self, event: AstrMessageEvent, category: str = None):
         """上传表情包到指定类别"""
         if not category:
@@ -131,104 +271,108 @@ class MemeSender(Star):
             )
             return
 
-        if category not in self.category_manager.get_descriptions():
+        if category not in self.category_manager.snapshot:
             yield event.plain_result(
                 f"无效的表情包类别：{category}\n使用/查看表情包查看可用类别"
             )
             return
 
         user_key = f"{event.session_id}_{event.get_sender_id()}"
-        self.upload_states[user_key] = {
-            "category": category,
-            "expire_time": time.time() + 30,
-        }
+        self.upload_sessions.start(user_key, category)
         yield event.plain_result(
-            f"请于30秒内发送要添加到【{category}】类别的图片（支持多图）"
+            f"请于{self.upload_sessions.ttl:g}秒内发送要添加到【{category}】类别的图片（支持多图）"
         )
 
     @filter.event_message_type(EventMessageType.ALL)
     async def handle_upload_image(self, event: AstrMessageEvent):
         """处理用户上传的图片"""
-        user_key = f"{event.session_id}_{event.get_sender_id()}"
-        upload_state = self.upload_states.get(user_key)
+        # 没有进行中的上传会话时直接返回，普通聊天消息不做任何额外处理。
+        # 每条消息都会经过这里，只对真正的上传过程做性能分析，避免大量
+        # 空结果挤掉有用的分析文件
+        if not self.upload_sessions:
+            return
 
-        if not upload_state or time.time() > upload_state["expire_time"]:
-            if user_key in self.upload_states:
-                del self.upload_states[user_key]
+        user_key = f"{event.session_id}_{event.get_sender_id()}"
+        upload_session = self.upload_sessions.get(user_key)
+        if upload_session is None:
             return
 
+        async for result in self._save_upload_images(event, user_key, upload_session):
+            yield result
+
+    @profiled("handle_upload_image")
+    async def _save_upload_images(self, event: AstrMessageEvent, user_key: str, upload_session):
+        """下载并保存上传会话中用户发送的图片"""
         images = [c for c in event.message_obj.message if isinstance(c, Image)]
 
         if not images:
             yield event.plain_result("请发送图片文件进行上传")
             return
 
-        category_cn = upload_state["category"]
-        category_en = self.category_manager.get_descriptions()[category_cn]
-        save_dir = os.path.join(MEMES_DIR, category_en)
+        remaining = self.upload_sessions.remaining_images(upload_session)
+        if len(images) > remaining:
+            yield event.plain_result(
+                f"单次最多上传 {self.upload_sessions.max_images} 张图片，超出的 {len(images) - remaining} 张将被忽略"
+            )
+            images = images[:remaining]
+
+        category = upload_session.category
+        save_dir = os.path.join(MEMES_DIR, category)
 
         try:
-            os.makedirs(save_dir, exist_ok=True)
+            await self.blocking_io.run(os.makedirs, save_dir, exist_ok=True)
             saved_files = []
+            duplicate_files = []
+            similar_notes = []
+
+            # 同一条消息中的图片并发流式下载，直接写入类别目录；文件名加入随机
+            # 批次号，同一秒内多个用户上传到同一类别时不会互相覆盖
+            batch = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+            with STAGE_SECONDS.labels("upload_download").time():
+                results = await self.downloader.download_all(
+                    [img.url for img in images],
+                    save_dir,
+                    [f"{batch}_{idx}" for idx in range(1, len(images) + 1)],
+                    total_bytes=self.upload_sessions.remaining_bytes(upload_session),
+                )
 
-            # 创建忽略 SSL 验证的上下文
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
-            for idx, img in enumerate(images, 1):
-                timestamp = int(time.time())
-
+            for img, result in zip(images, results):
                 try:
-                    # 特殊处理腾讯多媒体域名
-                    if "multimedia.nt.qq.com.cn" in img.url:
-                        insecure_url = img.url.replace("https://", "http://", 1)
-                        self.logger.warning(
-                            f"检测到腾讯多媒体域名，使用 HTTP 协议下载: {insecure_url}"
-                        )
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get(insecure_url) as resp:
-                                content = await resp.read()
-                    else:
-                        async with aiohttp.ClientSession(
-                            connector=aiohttp.TCPConnector(ssl=ssl_context)
-                        ) as session:
-                            async with session.get(img.url) as resp:
-                                content = await resp.read()
-
-                    file_type = imghdr.what(None, h=content)
-                    if not file_type:
-                        try:
-                            with Image.open(io.BytesIO(content)) as temp_img:
-                                temp_img.verify()  # 验证文件完整性
-                                file_type = temp_img.format.lower()
-                        except Exception as e:
-                            self.logger.error(f"图片格式检测失败: {str(e)}")
-                            file_type = "unknown"
-
-                    ext_mapping = {
-                        "jpeg": ".jpg",
-                        "png": ".png",
-                        "gif": ".gif",
-                        "webp": ".webp",
-                    }
-                    ext = ext_mapping.get(file_type, ".bin")
-                    filename = f"{timestamp}_{idx}{ext}"
-                    save_path = os.path.join(save_dir, filename)
-
-                    with open(save_path, "wb") as f:
-                        f.write(content)
+                    if isinstance(result, Exception):
+                        raise result
+
+                    filename = os.path.basename(result.path)
+                    if result.duplicate:
+                        duplicate_files.append(filename)
+                        continue
                     saved_files.append(filename)
+                    self.upload_sessions.record(
+                        upload_session, 1, await self.blocking_io.run(os.path.getsize, result.path)
+                    )
+                    self.meme_index.add(category, filename)
+                    await self.blocking_io.run(
+                        self.meme_catalog.upsert_file, result.path, result.sha256
+                    )
+                    await self.blocking_io.run(self.meme_variants.generate, result.path)
+                    similar = await self.blocking_io.run(
+                        self.near_duplicates.similar_to, result.path
+                    )
+                    if similar:
+                        similar_notes.append(f"{filename} 与 {similar[0][0]} 相似")
 
                 except Exception as e:
+                    STAGE_ERRORS.labels("upload_download").inc()
                     self.logger.error(f"下载图片失败: {str(e)}")
                     yield event.plain_result(f"文件 {img.url} 下载失败: {str(e)}")
                     continue
 
-            del self.upload_states[user_key]
-            result_msg = [
-                Plain(f"成功添加 {len(saved_files)} 张图片到【{category_cn}】类别！")
-            ]
+            self.upload_sessions.end(user_key)
+            result_text = f"成功添加 {len(saved_files)} 张图片到【{category}】类别！"
+            if duplicate_files:
+                result_text += f"\n{len(duplicate_files)} 张图片已存在，未重复添加：{'、'.join(duplicate_files)}"
+            if similar_notes:
+                result_text += "\n疑似重复：" + "；".join(similar_notes)
+            result_msg = [Plain(result_text)]
             yield event.chain_result(result_msg)
             await self.reload_emotions()
 
@@ -238,6 +382,10 @@ class MemeSender(Star):
 
     async def reload_emotions(self):
         """动态加载表情配置"""
+        await self.blocking_io.run(self._load_emotions_file)
+
+    def _load_emotions_file(self):
+        """读取 emotions.json 并更新类别描述（阻塞操作）"""
         config_path = os.path.join(MEMES_DIR, "emotions.json")
         if os.path.exists(config_path):
             with open(config_path, "r", encoding="utf-8") as f:
@@ -250,7 +398,7 @@ class MemeSender(Star):
             self.logger.error(f"表情包根目录不存在: {MEMES_DIR}")
             return
 
-        for emotion in self.category_manager.get_descriptions().values():
+        for emotion in self.category_manager.snapshot.tags:
             emotion_path = os.path.join(MEMES_DIR, emotion)
             if not os.path.exists(emotion_path):
                 self.logger.error(f"表情目录不存在: {emotion_path}")
@@ -267,117 +415,117 @@ class MemeSender(Star):
                 self.logger.info(f"表情目录 {emotion} 包含 {len(memes)} 个图片")
 
     @filter.on_llm_response(priority=90)
+    @profiled()
     async def resp(self, event: AstrMessageEvent, response: LLMResponse):
         """处理 LLM 响应，识别表情"""
         if not response or not response.completion_text:
             return
 
-        text = response.completion_text
-        self.found_emotions = []  # 重置表情列表
+        if self.loop_monitor and not self.loop_monitor.running:
+            self.loop_monitor.start()
 
-        # 定义表情正则模式
-        patterns = [
-            r"\[([^\]]+)\]",  # [生气]
-            r"\(([^)]+)\)",  # (生气)
-            r"（([^）]+)）",  # （生气）
-        ]
+        with STAGE_SECONDS.labels("resp").time():
+            extractor = self.tag_extractor
+            snapshot = self.category_manager.snapshot
+            if extractor.version != snapshot.version:
+                extractor.update(snapshot.tags, snapshot.version)
 
-        clean_text = text
-
-        # 查找所有表情标记
-        for pattern in patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                emotion = match.group(1)
-                if emotion in self.category_manager.get_descriptions():
-                    self.found_emotions.append(emotion)
-                    clean_text = clean_text.replace(match.group(0), "")
-
-        # 去重并限制最多2个表情
-        self.found_emotions = list(dict.fromkeys(self.found_emotions))[:2]
+            # 单次扫描识别并剔除所有表情标记，去重并限制最多2个表情
+            clean_text, found_emotions = extractor.extract(
+                response.completion_text, limit=2
+            )
+            self.emotion_states.set(event, found_emotions)
 
-        if self.found_emotions:
-            response.completion_text = clean_text.strip()
+            if found_emotions:
+                response.completion_text = clean_text.strip()
 
     @filter.on_decorating_result()
+    @profiled()
     async def on_decorating_result(self, event: AstrMessageEvent):
         """在消息发送前处理文本部分"""
-        if not self.found_emotions:
+        if not self.emotion_states.get(event):
             return
 
         result = event.get_result()
         if not result:
             return
 
-        try:
-            chains = []
-            original_chain = result.chain
-
-            if original_chain:
-                if isinstance(original_chain, str):
-                    chains.append(Plain(original_chain))
-                elif isinstance(original_chain, MessageChain):
-                    chains.extend([c for c in original_chain if isinstance(c, Plain)])
-                elif isinstance(original_chain, list):
-                    chains.extend([c for c in original_chain if isinstance(c, Plain)])
-
-            text_result = event.make_result().set_result_content_type(
-                ResultContentType.LLM_RESULT
-            )
-            for component in chains:
-                if isinstance(component, Plain):
-                    text_result = text_result.message(component.text)
+        with STAGE_SECONDS.labels("on_decorating_result").time():
+            try:
+                chains = []
+                original_chain = result.chain
+
+                if original_chain:
+                    if isinstance(original_chain, str):
+                        chains.append(Plain(original_chain))
+                    elif isinstance(original_chain, MessageChain):
+                        chains.extend([c for c in original_chain if isinstance(c, Plain)])
+                    elif isinstance(original_chain, list):
+                        chains.extend([c for c in original_chain if isinstance(c, Plain)])
+
+                text_result = event.make_result().set_result_content_type(
+                    ResultContentType.LLM_RESULT
+                )
+                for component in chains:
+                    if isinstance(component, Plain):
+                        text_result = text_result.message(component.text)
 
-            event.set_result(text_result)
+                event.set_result(text_result)
 
-        except Exception as e:
-            self.logger.error(f"处理文本失败: {str(e)}")
-            import traceback
+            except Exception as e:
+                STAGE_ERRORS.labels("on_decorating_result").inc()
+                self.logger.error(f"处理文本失败: {str(e)}")
+                import traceback
 
-            self.logger.error(traceback.format_exc())
+                self.logger.error(traceback.format_exc())
 
     @filter.after_message_sent()
+    @profiled()
     async def after_message_sent(self, event: AstrMessageEvent):
         """消息发送后处理图片部分"""
-        if not self.found_emotions:
+        found_emotions = self.emotion_states.pop(event)
+        if not found_emotions:
             return
 
-        try:
-            for emotion in self.found_emotions:
-                emotion_en = self.category_manager.get_descriptions().get(emotion)
-                if not emotion_en:
-                    continue
-
-                emotion_path = os.path.join(MEMES_DIR, emotion_en)
-                if not os.path.exists(emotion_path):
-                    continue
-
-                memes = [
-                    f
-                    for f in os.listdir(emotion_path)
-                    if f.endswith((".jpg", ".png", ".gif"))
-                ]
-                if not memes:
-                    continue
-
-                meme = random.choice(memes)
-                meme_file = os.path.join(emotion_path, meme)
-
-                await self.context.send_message(
-                    event.unified_msg_origin,
-                    MessageChain([Image.fromFileSystem(meme_file)]),
-                )
-            self.found_emotions = []
-
-        except Exception as e:
-            self.logger.error(f"发送表情图片失败: {str(e)}")
-            import traceback
-
-            self.logger.error(traceback.format_exc())
-        finally:
-            self.found_emotions = []
+        with STAGE_SECONDS.labels("after_message_sent").time():
+            try:
+                components = []
+                for emotion in found_emotions:
+                    # 表情标签即类别目录名；单张读取失败不影响其余表情包
+                    try:
+                        meme = await self.blocking_io.run(
+                            self._load_meme, emotion, event.unified_msg_origin
+                        )
+                    except Exception as e:
+                        STAGE_ERRORS.labels("after_message_sent").inc()
+                        self.logger.warning(f"读取类别 {emotion} 的表情包失败，已跳过: {e}")
+                        continue
+                    if meme:
+                        components.append(Image.fromBase64(meme.base64))
+
+                await self.meme_dispatcher.dispatch(event.unified_msg_origin, components)
+
+            except Exception as e:
+                STAGE_ERRORS.labels("after_message_sent").inc()
+                self.logger.error(f"发送表情图片失败: {str(e)}")
+                import traceback
+
+                self.logger.error(traceback.format_exc())
+
+    def _load_meme(self, category: str, unified_msg_origin: str):
+        """挑选表情包并读取发送数据（阻塞操作），类别为空时返回 None"""
+        meme_file = self.meme_selector.pick(category, unified_msg_origin)
+        if not meme_file:
+            return None
+        self.meme_catalog.increment_send_count(meme_file)
+        return self.meme_cache.get(self.meme_variants.best_path(meme_file))
+
+    async def _send_meme_chain(self, unified_msg_origin: str, components: list):
+        """发送一条由表情包组件构成的消息"""
+        await self.context.send_message(unified_msg_origin, MessageChain(components))
 
     @filter.command("检查同步状态")
+    @profiled()
     async def check_sync_status(self, event: AstrMessageEvent):
         """检查表情包与图床的同步状态"""
         if not self.img_sync:
@@ -385,7 +533,8 @@ class MemeSender(Star):
             return
         
         try:
-            status = self.img_sync.check_status()
+            # 对账元数据目录并请求图床文件列表，在线程池中执行
+            status = await self.blocking_io.run(self.img_sync.check_status)
             to_upload = status.get("to_upload", [])
             to_download = status.get("to_download", [])
             
@@ -413,6 +562,7 @@ class MemeSender(Star):
             yield event.plain_result(f"检查同步状态失败: {str(e)}")
 
     @filter.command("同步到云端")
+    @profiled()
     async def sync_to_remote(self, event: AstrMessageEvent):
         """将本地表情包同步到云端"""
         if not self.img_sync:
@@ -431,6 +581,7 @@ class MemeSender(Star):
             yield event.plain_result(f"同步到云端失败: {str(e)}")
 
     @filter.command("从云端同步")
+    @profiled()
     async def sync_from_remote(self, event: AstrMessageEvent):
         """从云端同步表情包到本地"""
         if not self.img_sync:
@@ -450,18 +601,53 @@ class MemeSender(Star):
             self.logger.error(f"从云端同步失败: {str(e)}")
             yield event.plain_result(f"从云端同步失败: {str(e)}")
 
+    @filter.command("性能分析")
+    async def toggle_profiling(self, event: AstrMessageEvent, mode: str = None):
+        """切换性能分析模式：off / cprofile / sampling"""
+        if mode not in PROFILING_MODES:
+            yield event.plain_result(
+                f"当前性能分析模式：{PROFILER.mode}\n"
+                f"格式：/性能分析 [{'/'.join(PROFILING_MODES)}]"
+            )
+            return
+
+        PROFILER.set_mode(mode)
+        if mode == "off":
+            yield event.plain_result("性能分析已关闭。")
+        else:
+            message = f"性能分析已开启（{mode}），之后的指令和事件处理会逐次记录到 {PROFILER.profiles_dir}。"
+            if self.webui_mode == "process" and self.server_process:
+                # 独立进程中的 WebUI 在启动时读取性能分析模式
+                message += "\nWebUI 需重启后生效。"
+            yield event.plain_result(message)
+
+    async def terminate(self):
+        """插件卸载时关闭 WebUI、写入未落盘的配置并释放连接池"""
+        if self._background_timer:
+            self._background_timer.cancel()
+        await self._shutdown_webui()
+        self.category_manager.flush()
+        self.blob_store.flush()
+        self.near_duplicates.flush()
+        await self.downloader.close()
+        if self.loop_monitor:
+            self.loop_monitor.stop()
+        self.blocking_io.shutdown()
+
     def __del__(self):
         """清理资源"""
         if self.img_sync:
             self.img_sync.stop_sync()
         if self.server_process:
+            from .webui import shutdown_server
+
             shutdown_server(self.server_process)
 
     async def handle_message(self, event: AstrMessageEvent):
         """处理消息，直接匹配英文标签"""
         message = event.message.strip()
         # 直接查找对应的英文标签
-        if message in self.category_manager.get_descriptions():
+        if message in self.category_manager.snapshot:
             # 使用英文标签查找表情包
             await self.send_random_emoji(event, message)
             return True
@@ -471,23 +657,15 @@ class MemeSender(Star):
         """发送随机表情包"""
         try:
             # 直接使用英文分类名
-            emoji_dir = os.path.join(MEMES_DIR, category)
-            if not os.path.exists(emoji_dir):
-                self.logger.error(f"表情目录不存在: {emoji_dir}")
-                return
-
-            emoji_files = [f for f in os.listdir(emoji_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.gif'))]
-            if not emoji_files:
+            meme = await self.blocking_io.run(
+                self._load_meme, category, event.unified_msg_origin
+            )
+            if not meme:
                 self.logger.warning(f"目录 {category} 中没有表情包")
                 return
 
-            random_emoji = random.choice(emoji_files)
-            emoji_path = os.path.join(emoji_dir, random_emoji)
-            
             # 发送图片
-            with open(emoji_path, 'rb') as f:
-                image_data = f.read()
-            yield event.image_result(image_data)
+            yield event.image_result(meme.data)
 
         except Exception as e:
             self.logger.error(f"发送表情包失败: {str(e)}")
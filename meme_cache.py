@@ -0,0 +1,139 @@
+import os
+import base64
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CachedMeme:
+    """缓存的表情包数据，base64 编码结果按需生成并随条目一起缓存"""
+
+    __slots__ = ("data", "_base64")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._base64: Optional[str] = None
+
+    @property
+    def base64(self) -> str:
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode("ascii")
+        return self._base64
+
+    @property
+    def cost(self) -> int:
+        """预算占用：原始字节加上 base64 编码结果（约 4/3 倍）"""
+        return len(self.data) * 7 // 3
+
+
+class MemeCache:
+    """按内存预算淘汰的表情包 LRU 缓存
+
+    以 (设备, inode, mtime, 文件大小) 为键缓存原始字节和 base64 编码结果，
+    文件被替换后旧条目自然失效；指向同一内容的硬链接共享一个条目。
+    热门表情包发送时不再读盘或重复编码。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_item_bytes: Optional[int] = None):
+        """
+        Args:
+            max_bytes: 缓存总内存预算（字节），为 0 时禁用缓存
+            max_item_bytes: 单个文件的大小上限，默认为预算的 1/4
+        """
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes if max_item_bytes is not None else max_bytes // 4
+        self._entries: "OrderedDict[Tuple, CachedMeme]" = OrderedDict()
+        self._paths: Dict[str, Tuple] = {}  # 路径 -> 当前键，用于清理旧版本
+        self._key_paths: Dict[Tuple, Set[str]] = {}  # 键 -> 指向它的路径，条目淘汰时一并清理
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _make_key(path: str) -> Tuple:
+        st = os.stat(path)
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def get(self, path: str) -> CachedMeme:
+        """获取表情包数据，未命中时从磁盘读取并放入缓存"""
+        key = self._make_key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if self._paths.get(path) != key:
+                    # 硬链接的另一个路径命中了共享条目
+                    self._track(path, key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        with open(path, "rb") as f:
+            entry = CachedMeme(f.read())
+        if key[3] <= self.max_item_bytes:
+            self._put(path, key, entry)
+        return entry
+
+    def _put(self, path: str, key: Tuple, entry: CachedMeme) -> None:
+        with self._lock:
+            self._track(path, key)
+            if key in self._entries:
+                return
+            self._entries[key] = entry
+            self._size += entry.cost
+            self._shrink()
+
+    def _track(self, path: str, key: Tuple) -> None:
+        """记录路径当前指向的键，调用方需持有锁"""
+        old_key = self._paths.get(path)
+        if old_key is not None and old_key != key:
+            paths = self._key_paths.get(old_key)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    # 同一路径的旧版本不再被任何路径引用，直接移除
+                    self._remove(old_key)
+        self._paths[path] = key
+        self._key_paths.setdefault(key, set()).add(path)
+
+    def _remove(self, key: Tuple) -> None:
+        """移除条目及指向它的路径记录，调用方需持有锁"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.cost
+        for path in self._key_paths.pop(key, ()):
+            self._paths.pop(path, None)
+
+    def _shrink(self) -> None:
+        """淘汰最久未使用的条目直至回到预算内，调用方需持有锁"""
+        while self._size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """清除指定路径或全部缓存"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._paths.clear()
+                self._key_paths.clear()
+                self._size = 0
+                return
+            key = self._paths.get(path)
+            if key is not None:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, float]:
+        """返回缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
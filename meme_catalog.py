@@ -0,0 +1,344 @@
+import os
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from .config import CATALOG_PATH, MEMES_DIR
+from .blob_store import BlobStore
+
+logger = logging.getLogger(__name__)
+
+# 目录中被视为表情包的扩展名（与图床同步支持的格式一致）
+CATALOG_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memes (
+    path TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    format TEXT,
+    width INTEGER,
+    height INTEGER,
+    frames INTEGER,
+    sha256 TEXT,
+    send_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_memes_category ON memes (category, filename);
+CREATE TABLE IF NOT EXISTS categories (
+    name TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def probe_image(path: str) -> Tuple[Optional[str], Optional[int], Optional[int], Optional[int]]:
+    """读取图片头信息，返回 (格式, 宽, 高, 帧数)，无法识别时均为 None"""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            return img.format.lower(), img.width, img.height, getattr(img, "n_frames", 1)
+    except Exception:
+        return None, None, None, None
+
+
+class MemeCatalog:
+    """表情包元数据目录（SQLite，WAL 模式）
+
+    记录每个表情包的路径、类别、大小、mtime、格式、宽高、帧数、内容哈希
+    和发送次数。所有写路径（上传、WebUI 增删改、云端下载）都会同步更新
+    目录；reconcile 只重新扫描 mtime 发生变化的类别目录，用于发现外部修改。
+    读路径通过索引查询，不再随目录规模遍历文件系统。
+
+    每个线程（以及 fork 出的子进程）使用独立的数据库连接。
+    """
+
+    def __init__(self, db_path: str = CATALOG_PATH, memes_dir: str = MEMES_DIR):
+        self.db_path = db_path
+        self.memes_dir = memes_dir
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---- 版本 ----
+
+    @property
+    def version(self) -> int:
+        """库版本号，任何增删改都会递增"""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    # ---- 写路径 ----
+
+    def _file_row(self, category: str, filename: str, st: os.stat_result, sha256: Optional[str] = None) -> tuple:
+        path = os.path.join(self.memes_dir, category, filename)
+        fmt, width, height, frames = probe_image(path)
+        if sha256 is None:
+            try:
+                sha256 = BlobStore.hash_file(path)
+            except OSError:
+                sha256 = None
+        return (
+            f"{category}/{filename}", category, filename, st.st_size, st.st_mtime_ns,
+            fmt, width, height, frames, sha256,
+        )
+
+    @staticmethod
+    def _upsert_rows(conn: sqlite3.Connection, rows: Iterable[tuple]) -> None:
+        conn.executemany(
+            "INSERT INTO memes (path, category, filename, size, mtime_ns, format, width, height, frames, sha256) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+            "format = excluded.format, width = excluded.width, height = excluded.height, "
+            "frames = excluded.frames, sha256 = excluded.sha256",
+            rows,
+        )
+
+    def upsert_file(self, path: str, sha256: Optional[str] = None) -> None:
+        """登记新增或被替换的表情包文件"""
+        category, filename = os.path.relpath(path, self.memes_dir).replace(os.sep, "/").split("/", 1)
+        if not filename.lower().endswith(CATALOG_EXTENSIONS):
+            return
+        row = self._file_row(category, filename, os.stat(path), sha256)
+        with self._write_lock, self._connect() as conn:
+            self._upsert_rows(conn, [row])
+            self._bump_version(conn)
+
+    def remove_file(self, category: str, filename: str) -> None:
+        """登记被删除的表情包文件"""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM memes WHERE path = ?", (f"{category}/{filename}",))
+            self._bump_version(conn)
+
+    def remove_category(self, category: str) -> None:
+        """登记被删除的类别"""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM memes WHERE category = ?", (category,))
+            conn.execute("DELETE FROM categories WHERE name = ?", (category,))
+            self._bump_version(conn)
+
+    def rename_category(self, old_name: str, new_name: str) -> None:
+        """登记类别重命名"""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM memes WHERE category = ?", (new_name,))
+            conn.execute(
+                "UPDATE memes SET category = ?, path = ? || '/' || filename WHERE category = ?",
+                (new_name, new_name, old_name),
+            )
+            conn.execute("DELETE FROM categories WHERE name IN (?, ?)", (old_name, new_name))
+            self._bump_version(conn)
+        # 新目录的 mtime 由下一次 reconcile 记录
+        self.reconcile([new_name])
+
+    def increment_send_count(self, path: str) -> None:
+        """表情包被发送后累加发送次数"""
+        rel_path = os.path.relpath(path, self.memes_dir).replace(os.sep, "/")
+        with self._write_lock, self._connect() as conn:
+            conn.execute("UPDATE memes SET send_count = send_count + 1 WHERE path = ?", (rel_path,))
+
+    # ---- 与文件系统对账 ----
+
+    def reconcile(self, categories: Optional[Iterable[str]] = None) -> int:
+        """
+        与文件系统增量对账
+
+        Args:
+            categories: 只检查指定类别，默认检查全部类别（并清理已不存在的类别）
+
+        Returns:
+            变更的文件数量
+        """
+        conn = self._connect()
+        known = dict(conn.execute("SELECT name, mtime_ns FROM categories").fetchall())
+        full_scan = categories is None
+        if full_scan:
+            try:
+                categories = [
+                    d for d in os.listdir(self.memes_dir)
+                    if os.path.isdir(os.path.join(self.memes_dir, d))
+                ]
+            except OSError as e:
+                logger.error(f"扫描表情包目录失败: {e}")
+                return 0
+        categories = list(categories)
+
+        changed = 0
+        for category in categories:
+            try:
+                mtime_ns = os.stat(os.path.join(self.memes_dir, category)).st_mtime_ns
+            except OSError:
+                if category in known:
+                    self.remove_category(category)
+                continue
+            if known.get(category) != mtime_ns:
+                changed += self._reconcile_category(category, mtime_ns)
+
+        if full_scan:
+            for category in set(known) - set(categories):
+                self.remove_category(category)
+                changed += 1
+        return changed
+
+    def _reconcile_category(self, category: str, mtime_ns: int) -> int:
+        """逐文件比对一个类别目录"""
+        conn = self._connect()
+        category_path = os.path.join(self.memes_dir, category)
+        existing = {
+            filename: (size, mtime)
+            for filename, size, mtime in conn.execute(
+                "SELECT filename, size, mtime_ns FROM memes WHERE category = ?", (category,)
+            )
+        }
+
+        is_new = conn.execute("SELECT 1 FROM categories WHERE name = ?", (category,)).fetchone() is None
+
+        rows, seen = [], set()
+        with os.scandir(category_path) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.lower().endswith(CATALOG_EXTENSIONS):
+                    continue
+                seen.add(entry.name)
+                st = entry.stat()
+                if existing.get(entry.name) != (st.st_size, st.st_mtime_ns):
+                    rows.append(self._file_row(category, entry.name, st))
+        removed = [f for f in existing if f not in seen]
+
+        with self._write_lock, conn:
+            if rows:
+                self._upsert_rows(conn, rows)
+            if removed:
+                conn.executemany(
+                    "DELETE FROM memes WHERE path = ?", [(f"{category}/{f}",) for f in removed]
+                )
+            conn.execute(
+                "INSERT INTO categories (name, mtime_ns) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+                (category, mtime_ns),
+            )
+            if rows or removed or is_new:
+                self._bump_version(conn)
+        return len(rows) + len(removed)
+
+    # ---- 读路径 ----
+
+    def is_reconciled(self, category: str, mtime_ns: int) -> bool:
+        """类别目录自上次对账后是否未发生变化（不访问文件）"""
+        row = self._connect().execute(
+            "SELECT mtime_ns FROM categories WHERE name = ?", (category,)
+        ).fetchone()
+        return row is not None and row[0] == mtime_ns
+
+    def list_categories(self) -> List[str]:
+        return [row[0] for row in self._connect().execute("SELECT name FROM categories ORDER BY name")]
+
+    def list_category(self, category: str, extensions: Tuple[str, ...] = CATALOG_EXTENSIONS) -> List[str]:
+        """获取类别下的表情包文件名"""
+        rows = self._connect().execute(
+            "SELECT filename FROM memes WHERE category = ? ORDER BY filename", (category,)
+        )
+        return [f for (f,) in rows if f.lower().endswith(extensions)]
+
+    @staticmethod
+    def _extension_clause(extensions: Tuple[str, ...]) -> Tuple[str, List[str]]:
+        """按扩展名过滤的 SQL 条件
+
+        目录中只有 CATALOG_EXTENSIONS 的文件，排除其余扩展名即可；
+        LIKE 对 ASCII 不区分大小写，比逐个 lower() 匹配快得多。
+        """
+        excluded = [f"%{ext}" for ext in CATALOG_EXTENSIONS if ext not in extensions]
+        if not excluded:
+            return "1", []
+        return " AND ".join("filename NOT LIKE ?" for _ in excluded), excluded
+
+    def list_category_page(self, category: str, after: str = "", limit: int = 100,
+                           extensions: Tuple[str, ...] = CATALOG_EXTENSIONS) -> List[Tuple[str, Optional[str]]]:
+        """按文件名顺序分页获取类别下的 (文件名, 内容哈希)，after 为上一页最后一个文件名"""
+        clause, params = self._extension_clause(extensions)
+        rows = self._connect().execute(
+            f"SELECT filename, sha256 FROM memes WHERE category = ? AND filename > ? AND {clause} "
+            "ORDER BY filename LIMIT ?",
+            (category, after, *params, limit),
+        )
+        return rows.fetchall()
+
+    def count_by_category(self, extensions: Tuple[str, ...] = CATALOG_EXTENSIONS) -> Dict[str, int]:
+        """获取各类别的表情包数量，空类别为 0"""
+        clause, params = self._extension_clause(extensions)
+        result = {c: 0 for c in self.list_categories()}
+        rows = self._connect().execute(
+            f"SELECT category, COUNT(*) FROM memes WHERE {clause} GROUP BY category", params
+        )
+        result.update(rows)
+        return result
+
+    def list_all(self, extensions: Tuple[str, ...] = CATALOG_EXTENSIONS) -> Dict[str, List[str]]:
+        """获取所有类别及其表情包文件名，空类别对应空列表"""
+        result: Dict[str, List[str]] = {c: [] for c in self.list_categories()}
+        rows = self._connect().execute("SELECT category, filename FROM memes ORDER BY category, filename")
+        for category, filename in rows:
+            if filename.lower().endswith(extensions):
+                result.setdefault(category, []).append(filename)
+        return result
+
+    def list_files(self) -> List[Dict[str, object]]:
+        """获取所有表情包的完整记录"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute("SELECT * FROM memes ORDER BY path")]
+        finally:
+            conn.row_factory = None
+
+    def content_hash(self, category: str, filename: str, st: os.stat_result) -> str:
+        """
+        获取表情包的内容哈希
+
+        目录记录与文件当前的大小和 mtime 一致时直接使用记录中的哈希，
+        否则（文件在对账前被外部修改）现场计算。
+        """
+        row = self._connect().execute(
+            "SELECT size, mtime_ns, sha256 FROM memes WHERE path = ?", (f"{category}/{filename}",)
+        ).fetchone()
+        if row and row[2] and (row[0], row[1]) == (st.st_size, st.st_mtime_ns):
+            return row[2]
+        return BlobStore.hash_file(os.path.join(self.memes_dir, category, filename))
+
+
+
+_default_catalog: Optional[MemeCatalog] = None
+_default_lock = threading.Lock()
+
+
+def get_catalog() -> MemeCatalog:
+    """获取默认路径上的共享目录实例"""
+    global _default_catalog
+    if _default_catalog is None:
+        with _default_lock:
+            if _default_catalog is None:
+                _default_catalog = MemeCatalog()
+    return _default_catalog
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+SEND_MODES = ("merge", "concurrent", "sequential")
+
+
+class MemeDispatcher:
+    """表情包发送调度器
+
+    merge：所有表情包合并为一条消息发送，只需一次平台往返；
+    concurrent：每个表情包单独成消息，并发发送；
+    sequential：逐条发送（旧行为）。
+    同一会话的并发数受 per_origin_limit 限制，单条发送失败不影响其他图片。
+    """
+
+    def __init__(
+        self,
+        send_func: Callable[[str, List[Any]], Awaitable[Any]],
+        mode: str = "concurrent",
+        per_origin_limit: int = 2,
+        max_origins: int = 1024,
+    ):
+        """
+        Args:
+            send_func: 发送函数，参数为 (unified_msg_origin, 消息组件列表)
+            mode: 发送模式，见 SEND_MODES
+            per_origin_limit: 同一会话同时进行的发送数量上限
+            max_origins: 最多保留信号量的会话数量
+        """
+        if mode not in SEND_MODES:
+            logger.warning(f"未知的表情包发送模式 {mode}，使用 concurrent")
+            mode = "concurrent"
+        self.send_func = send_func
+        self.mode = mode
+        self.per_origin_limit = max(1, per_origin_limit)
+        self.max_origins = max_origins
+        self._semaphores: "OrderedDict[str, asyncio.Semaphore]" = OrderedDict()
+
+    def _semaphore(self, origin: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(origin)
+        if semaphore is None:
+            semaphore = self._semaphores[origin] = asyncio.Semaphore(self.per_origin_limit)
+            # 淘汰空闲的旧会话信号量
+            while len(self._semaphores) > self.max_origins:
+                old_origin, old = next(iter(self._semaphores.items()))
+                if old.locked():
+                    break
+                del self._semaphores[old_origin]
+        else:
+            self._semaphores.move_to_end(origin)
+        return semaphore
+
+    async def _send(self, origin: str, components: List[Any]) -> None:
+        async with self._semaphore(origin):
+            await self.send_func(origin, components)
+
+    async def dispatch(self, origin: str, components: List[Any]) -> int:
+        """
+        发送表情包组件
+
+        Args:
+            origin: 目标会话 unified_msg_origin
+            components: 图片消息组件列表
+
+        Returns:
+            成功发送的组件数量
+        """
+        if not components:
+            return 0
+
+        if self.mode == "merge" or len(components) == 1:
+            try:
+                await self._send(origin, components)
+                return len(components)
+            except Exception as e:
+                logger.error(f"发送表情图片失败: {e}")
+                return 0
+
+        if self.mode == "sequential":
+            sent = 0
+            for component in components:
+                try:
+                    await self._send(origin, [component])
+                    sent += 1
+                except Exception as e:
+                    logger.error(f"发送表情图片失败: {e}")
+            return sent
+
+        results = await asyncio.gather(
+            *(self._send(origin, [component]) for component in components),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"发送表情图片失败: {result}")
+        return sum(1 for result in results if not isinstance(result, BaseException))
@@ -0,0 +1,161 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+from .config import MEMES_DIR, MEME_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+class _CategoryEntry:
+    """单个类别的索引条目"""
+
+    __slots__ = ("files", "mtime_ns", "checked_at")
+
+    def __init__(self, files: Tuple[str, ...], mtime_ns: int, checked_at: float):
+        self.files = files
+        self.mtime_ns = mtime_ns
+        self.checked_at = checked_at
+
+
+class MemeIndex:
+    """表情包内存索引
+
+    维护 类别 -> 文件列表 的映射，启动时构建一次。发送路径直接读取内存中的
+    文件列表；索引通过显式钩子（上传、WebUI 增删）增量更新，并在超过
+    check_interval 秒后用目录 mtime 做一次兜底校验，以发现外部修改。
+    传入元数据目录时，已对账的类别从目录查询；未对账或已变化的类别先
+    列举文件夹，同时在后台线程中对账（需要计算新文件的哈希），不阻塞
+    启动和发送路径。
+    """
+
+    def __init__(self, memes_dir: str = MEMES_DIR, check_interval: float = 5.0, catalog=None):
+        """
+        Args:
+            memes_dir: 表情包根目录
+            check_interval: 两次目录 mtime 校验之间的最小间隔（秒）
+            catalog: 可选的 MemeCatalog 实例
+        """
+        self.memes_dir = memes_dir
+        self.check_interval = check_interval
+        self.catalog = catalog
+        self._entries: Dict[str, _CategoryEntry] = {}
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()  # 等待后台对账的类别
+        self._reconcile_thread: Optional[threading.Thread] = None
+
+    def build(self, categories: Optional[Iterable[str]] = None) -> None:
+        """构建索引，未指定类别时扫描根目录下的所有子目录"""
+        if categories is None:
+            try:
+                categories = [
+                    d
+                    for d in os.listdir(self.memes_dir)
+                    if os.path.isdir(os.path.join(self.memes_dir, d))
+                ]
+            except OSError as e:
+                logger.error(f"构建表情包索引失败: {e}")
+                return
+
+        for category in categories:
+            self._load(category)
+        logger.info(f"表情包索引构建完成，共 {len(self._entries)} 个类别")
+
+    def _load(self, category: str) -> Optional[_CategoryEntry]:
+        """从磁盘重新扫描一个类别"""
+        category_path = os.path.join(self.memes_dir, category)
+        try:
+            mtime_ns = os.stat(category_path).st_mtime_ns
+            files = None
+            if self.catalog is not None:
+                if self.catalog.is_reconciled(category, mtime_ns):
+                    files = tuple(self.catalog.list_category(category, MEME_EXTENSIONS))
+                else:
+                    self._schedule_reconcile(category)
+            if files is None:
+                files = tuple(
+                    f for f in os.listdir(category_path) if f.lower().endswith(MEME_EXTENSIONS)
+                )
+        except OSError:
+            with self._lock:
+                self._entries.pop(category, None)
+            return None
+
+        entry = _CategoryEntry(files, mtime_ns, time.monotonic())
+        with self._lock:
+            self._entries[category] = entry
+        return entry
+
+    def _schedule_reconcile(self, category: str) -> None:
+        """安排类别在后台对账，同一时间只有一个对账线程"""
+        with self._lock:
+            self._pending.add(category)
+            if self._reconcile_thread is not None:
+                return
+            self._reconcile_thread = threading.Thread(
+                target=self._reconcile_pending, name="meme-index-reconcile", daemon=True
+            )
+            self._reconcile_thread.start()
+
+    def _reconcile_pending(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._reconcile_thread = None
+                    return
+                category = self._pending.pop()
+            try:
+                self.catalog.reconcile([category])
+            except Exception as e:
+                logger.warning(f"后台对账类别 {category} 失败: {e}")
+
+    def _validate(self, category: str, entry: _CategoryEntry) -> Optional[_CategoryEntry]:
+        """用目录 mtime 校验条目，目录变化时重新扫描"""
+        try:
+            mtime_ns = os.stat(os.path.join(self.memes_dir, category)).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._entries.pop(category, None)
+            return None
+
+        if mtime_ns != entry.mtime_ns:
+            return self._load(category)
+        entry.checked_at = time.monotonic()
+        return entry
+
+    def get_memes(self, category: str) -> Tuple[str, ...]:
+        """获取类别下的表情包文件名列表"""
+        entry = self._entries.get(category)
+        if entry is None:
+            entry = self._load(category)
+        elif time.monotonic() - entry.checked_at > self.check_interval:
+            entry = self._validate(category, entry)
+        return entry.files if entry else ()
+
+    def add(self, category: str, filename: str) -> None:
+        """登记新增的表情包"""
+        if not filename.lower().endswith(MEME_EXTENSIONS):
+            return
+        with self._lock:
+            entry = self._entries.get(category)
+            if entry is not None and filename not in entry.files:
+                entry.files = entry.files + (filename,)
+                return
+        if entry is None:
+            self._load(category)
+
+    def remove(self, category: str, filename: str) -> None:
+        """登记删除的表情包"""
+        with self._lock:
+            entry = self._entries.get(category)
+            if entry is not None:
+                entry.files = tuple(f for f in entry.files if f != filename)
+
+    def invalidate(self, category: Optional[str] = None) -> None:
+        """使类别（或全部类别）的索引失效，下次访问时重新扫描"""
+        with self._lock:
+            if category is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(category, None)
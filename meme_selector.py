@@ -0,0 +1,166 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+from .config import MEME_WEIGHTS_PATH
+from .meme_index import MemeIndex
+from .utils import load_json
+
+logger = logging.getLogger(__name__)
+
+
+class AliasTable:
+    """Walker/Vose 别名表，O(n) 构建后每次加权抽样 O(1)"""
+
+    __slots__ = ("prob", "alias")
+
+    def __init__(self, weights: List[float]):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def sample(self, rng: random.Random) -> int:
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class MemeSelector:
+    """表情包选择引擎
+
+    每个类别维护一张别名表实现 O(1) 加权抽样（新近添加的表情包权重更高，
+    也可在 meme_weights.json 中为单个表情包指定权重）。每个会话记录最近
+    发送过的若干表情包，抽中时重新抽样，多次仍抽中时改为均匀抽取下标并
+    拒绝被避开的文件，保证同一会话里不连续重复；会话数量和每个会话的记录
+    长度都有上限，内存占用有界。
+    """
+
+    MAX_RETRIES = 8
+
+    def __init__(
+        self,
+        meme_index: MemeIndex,
+        history_size: int = 5,
+        new_boost: float = 2.0,
+        new_days: float = 7.0,
+        max_chats: int = 1024,
+        rng: Optional[random.Random] = None,
+    ):
+        """
+        Args:
+            meme_index: 表情包索引
+            history_size: 每个会话每个类别记录的最近发送数量，0 表示允许重复
+            new_boost: 新近表情包的权重倍数
+            new_days: 多少天内添加的表情包算作新近
+            max_chats: 最多记录的会话数量，超出时淘汰最久未发送的会话
+            rng: 随机数生成器
+        """
+        self.meme_index = meme_index
+        self.history_size = history_size
+        self.new_boost = new_boost
+        self.new_days = new_days
+        self.max_chats = max_chats
+        self.rng = rng or random.Random()
+        self.weights: Dict[str, Dict[str, float]] = {}
+        if os.path.exists(MEME_WEIGHTS_PATH):
+            self.weights = load_json(MEME_WEIGHTS_PATH, {})
+        self._tables: Dict[str, Tuple[Tuple[str, ...], AliasTable]] = {}
+        self._history: "OrderedDict[str, Dict[str, deque]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _build_table(self, category: str, files: Tuple[str, ...]) -> AliasTable:
+        """根据文件 mtime 和自定义权重构建别名表"""
+        category_path = os.path.join(self.meme_index.memes_dir, category)
+        overrides = self.weights.get(category, {})
+        new_after = time.time() - self.new_days * 86400
+        weights = []
+        for filename in files:
+            weight = overrides.get(filename)
+            if weight is None:
+                weight = 1.0
+                try:
+                    if os.stat(os.path.join(category_path, filename)).st_mtime >= new_after:
+                        weight = self.new_boost
+                except OSError:
+                    pass
+            weights.append(max(float(weight), 0.0) or 1e-9)
+        return AliasTable(weights)
+
+    def _get_table(self, category: str, files: Tuple[str, ...]) -> AliasTable:
+        cached = self._tables.get(category)
+        # 索引更新时会替换文件元组，按对象身份判断是否需要重建
+        if cached is not None and cached[0] is files:
+            return cached[1]
+        table = self._build_table(category, files)
+        self._tables[category] = (files, table)
+        return table
+
+    def _recent(self, chat_id: str, category: str) -> deque:
+        """获取会话在某类别下的最近发送记录，调用方需持有锁"""
+        chat = self._history.get(chat_id)
+        if chat is None:
+            chat = self._history[chat_id] = {}
+            while len(self._history) > self.max_chats:
+                self._history.popitem(last=False)
+        else:
+            self._history.move_to_end(chat_id)
+        recent = chat.get(category)
+        if recent is None:
+            recent = chat[category] = deque(maxlen=self.history_size)
+        return recent
+
+    def pick(self, category: str, chat_id: Optional[str] = None) -> Optional[str]:
+        """
+        为会话从类别中挑选一个表情包
+
+        Args:
+            category: 类别名（即目录名）
+            chat_id: 会话标识，为空时不做去重
+
+        Returns:
+            表情包完整路径，类别为空时返回 None
+        """
+        files = self.meme_index.get_memes(category)
+        if not files:
+            # 类别已被清空或删除，释放对应的别名表
+            with self._lock:
+                self._tables.pop(category, None)
+            return None
+
+        with self._lock:
+            table = self._get_table(category, files)
+            index = table.sample(self.rng)
+            if chat_id is not None and self.history_size > 0:
+                recent = self._recent(chat_id, category)
+                # 类别内文件少于记录长度时只避开最近 n-1 个
+                avoid = min(len(recent), len(files) - 1)
+                if avoid > 0:
+                    blocked = set(list(recent)[-avoid:])
+                    for _ in range(self.MAX_RETRIES):
+                        if files[index] not in blocked:
+                            break
+                        index = table.sample(self.rng)
+                    else:
+                        # 被避开的文件占了大部分权重，改为均匀抽取并拒绝被避开的文件。
+                        # 至少有一个文件未被避开，期望抽取次数 n / (n - avoid)
+                        # 不超过 history_size + 1，与类别大小无关
+                        while True:
+                            index = self.rng.randrange(len(files))
+                            if files[index] not in blocked:
+                                break
+                recent.append(files[index])
+
+        return os.path.join(self.meme_index.memes_dir, category, files[index])
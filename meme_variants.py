@@ -0,0 +1,235 @@
+import os
+import re
+import logging
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from .config import MEMES_DIR, VARIANTS_DIR, MEME_EXTENSIONS
+from .utils import file_version
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 发送版本文件名中原图文件名与扩展名之间的版本标识：.<大小>-<inode>-<mtime>
+_VERSION = re.compile(r"\.[0-9a-f]+-[0-9a-f]+-[0-9a-f]+")
+
+
+class MemeVariants:
+    """表情包发送版本生成器
+
+    入库时为每个表情包生成一个体积受限的发送版本：静态图缩放到 max_side
+    以内并去除元数据，GIF 转为动态 WebP。发送版本存放在 VARIANTS_DIR 下，
+    与原图目录结构一致，不参与图床同步，文件名包含原图的版本标识（见
+    file_version），原图被替换后旧版本自动失效。只有比原图更小的版本才会
+    被保留，发送时通过 best_path 选择最小的可用文件。
+    """
+
+    def __init__(
+        self,
+        memes_dir: str = MEMES_DIR,
+        variants_dir: str = VARIANTS_DIR,
+        max_side: int = 512,
+        jpeg_quality: int = 85,
+        enabled: bool = True,
+    ):
+        """
+        Args:
+            memes_dir: 表情包根目录
+            variants_dir: 发送版本存储目录
+            max_side: 发送版本的最长边（像素）
+            jpeg_quality: JPEG / WebP 编码质量
+            enabled: 是否启用，关闭时 best_path 始终返回原图
+        """
+        self.memes_dir = memes_dir
+        self.variants_dir = variants_dir
+        self.max_side = max_side
+        self.jpeg_quality = jpeg_quality
+        self.enabled = enabled
+        self._choices: Dict[str, Tuple[str, str]] = {}  # 原图路径 -> (版本标识, 选择结果)
+        self._backfill_thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _suffix(src_path: str) -> str:
+        return ".webp" if src_path.lower().endswith(".gif") else os.path.splitext(src_path)[1]
+
+    def variant_path(self, src_path: str, src_stat: os.stat_result) -> str:
+        """返回原图当前版本对应的发送版本路径"""
+        rel_path = os.path.relpath(src_path, self.memes_dir)
+        return os.path.join(
+            self.variants_dir, f"{rel_path}.{file_version(src_stat)}{self._suffix(src_path)}"
+        )
+
+    def _remove_stale(self, src_path: str, keep: Optional[str] = None) -> None:
+        """清理同一原图其他版本（以及旧命名方式）的发送版本"""
+        rel_path = os.path.relpath(src_path, self.memes_dir)
+        dst_dir = os.path.join(self.variants_dir, os.path.dirname(rel_path))
+        basename, suffix = os.path.basename(rel_path), self._suffix(src_path)
+        try:
+            with os.scandir(dst_dir) as it:
+                for entry in it:
+                    if entry.path == keep or not entry.name.startswith(basename):
+                        continue
+                    rest = entry.name[len(basename):]
+                    if rest.endswith(suffix) and (
+                        rest == suffix or _VERSION.fullmatch(rest[:-len(suffix)])
+                    ):
+                        os.remove(entry.path)
+        except OSError:
+            pass
+
+    def _resize(self, frame: "Image.Image") -> "Image.Image":
+        from PIL import Image
+
+        if max(frame.size) <= self.max_side:
+            return frame
+        frame = frame.copy()
+        frame.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+        return frame
+
+    def _encode(self, src_path: str, dst_path: str) -> None:
+        """编码发送版本，不携带 EXIF 等元数据"""
+        from PIL import Image, ImageSequence
+
+        with Image.open(src_path) as img:
+            if img.format == "GIF" and getattr(img, "n_frames", 1) > 1:
+                frames, durations = [], []
+                for frame in ImageSequence.Iterator(img):
+                    durations.append(frame.info.get("duration", 100))
+                    frames.append(self._resize(frame.convert("RGBA")))
+                frames[0].save(
+                    dst_path,
+                    "WEBP",
+                    save_all=True,
+                    append_images=frames[1:],
+                    duration=durations,
+                    loop=img.info.get("loop", 0),
+                    quality=self.jpeg_quality,
+                    method=4,
+                )
+            elif img.format == "GIF":
+                self._resize(img.convert("RGBA")).save(dst_path, "WEBP", quality=self.jpeg_quality)
+            elif img.format == "PNG":
+                self._resize(img).save(dst_path, "PNG", optimize=True)
+            else:
+                frame = img if img.mode in ("RGB", "L") else img.convert("RGB")
+                self._resize(frame).save(
+                    dst_path, "JPEG", quality=self.jpeg_quality, optimize=True, progressive=True
+                )
+
+    def generate(self, src_path: str, force: bool = False) -> Optional[str]:
+        """
+        为原图生成发送版本
+
+        Args:
+            src_path: 原图路径（位于 memes_dir 下）
+            force: 已有最新版本时是否仍然重新生成
+
+        Returns:
+            发送版本路径；版本不比原图小或生成失败时返回 None
+        """
+        if not self.enabled or not src_path.lower().endswith(MEME_EXTENSIONS):
+            return None
+
+        try:
+            src_stat = os.stat(src_path)
+            dst_path = self.variant_path(src_path, src_stat)
+            if not force and os.path.exists(dst_path):
+                return dst_path if os.path.getsize(dst_path) > 0 else None
+
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            # 回填线程与上传可能同时生成同一文件，各自使用唯一的临时文件
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=f".{os.path.basename(dst_path)}.", suffix=".tmp", dir=os.path.dirname(dst_path)
+            )
+            os.close(fd)
+            try:
+                self._encode(src_path, tmp_path)
+                if os.path.getsize(tmp_path) >= src_stat.st_size:
+                    # 没有收益，保留空标记避免反复重试
+                    open(dst_path, "wb").close()
+                    dst_path = None
+                else:
+                    os.replace(tmp_path, dst_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        except Exception as e:
+            logger.error(f"生成发送版本失败 {src_path}: {e}")
+            return None
+
+        self._remove_stale(src_path, keep=self.variant_path(src_path, src_stat))
+        self._choices.pop(src_path, None)
+        return dst_path
+
+    def discard(self, src_path: str) -> None:
+        """原图被删除后清理对应的发送版本"""
+        self._choices.pop(src_path, None)
+        self._remove_stale(src_path)
+
+    def best_path(self, src_path: str) -> str:
+        """返回发送时应使用的文件：存在且不过期的发送版本，否则为原图"""
+        if not self.enabled:
+            return src_path
+        try:
+            src_stat = os.stat(src_path)
+        except OSError:
+            return src_path
+
+        version = file_version(src_stat)
+        cached = self._choices.get(src_path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        choice = src_path
+        dst_path = self.variant_path(src_path, src_stat)
+        try:
+            if os.path.getsize(dst_path) > 0:
+                choice = dst_path
+        except OSError:
+            pass
+        self._choices[src_path] = (version, choice)
+        return choice
+
+    def backfill(self) -> int:
+        """为库中所有缺少或过期发送版本的表情包补齐版本，返回处理的文件数"""
+        count = 0
+        try:
+            categories = [
+                d for d in os.listdir(self.memes_dir)
+                if os.path.isdir(os.path.join(self.memes_dir, d))
+            ]
+        except OSError as e:
+            logger.error(f"扫描表情包目录失败: {e}")
+            return 0
+
+        for category in categories:
+            category_path = os.path.join(self.memes_dir, category)
+            try:
+                filenames = os.listdir(category_path)
+            except OSError as e:
+                # 类别可能在回填过程中被删除或改名
+                logger.warning(f"扫描类别 {category} 失败，跳过: {e}")
+                continue
+            for filename in filenames:
+                if not filename.lower().endswith(MEME_EXTENSIONS):
+                    continue
+                try:
+                    self.generate(os.path.join(category_path, filename))
+                except Exception as e:
+                    logger.warning(f"补齐发送版本失败 {category}/{filename}: {e}")
+                count += 1
+        logger.info(f"发送版本补齐完成，共检查 {count} 个文件")
+        return count
+
+    def start_backfill(self) -> None:
+        """在后台线程中补齐发送版本，不阻塞插件加载"""
+        if not self.enabled:
+            return
+        if self._backfill_thread and self._backfill_thread.is_alive():
+            return
+        self._backfill_thread = threading.Thread(
+            target=self.backfill, name="meme-variants-backfill", daemon=True
+        )
+        self._backfill_thread.start()
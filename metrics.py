@@ -0,0 +1,396 @@
+import os
+import time
+import bisect
+import logging
+import threading
+import multiprocessing
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认延迟分桶（秒），覆盖从亚毫秒级的内存操作到数十秒的网络请求
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# 渲染时附带的分位数
+QUANTILES = (0.5, 0.95, 0.99)
+
+# 快照格式: [(名称, 类型, 说明, [(后缀, 标签字典, 值), ...]), ...]
+Sample = Tuple[str, Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+
+class _Timer:
+    """上下文管理器，退出时把耗时记录到直方图"""
+
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dump(self) -> float:
+        with self._lock:
+            return self.value
+
+    def merge(self, value: float) -> None:
+        self.inc(value)
+
+
+class _HistogramChild:
+    __slots__ = ("_upper_bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, upper_bounds: Sequence[float]):
+        self._upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def dump(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def merge(self, value: Tuple[List[int], float, int]) -> None:
+        counts, value_sum, total = value
+        if len(counts) != len(self.counts):
+            raise ValueError("直方图分桶不一致")
+        with self._lock:
+            for index, n in enumerate(counts):
+                self.counts[index] += n
+            self.sum += value_sum
+            self.count += total
+
+    def quantile(self, q: float) -> float:
+        """按分桶线性插值估计分位数"""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, n in enumerate(counts):
+            if cumulative + n >= rank and n:
+                if index == len(self._upper_bounds):
+                    return self._upper_bounds[-1]
+                lower = self._upper_bounds[index - 1] if index else 0.0
+                upper = self._upper_bounds[index]
+                return lower + (upper - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self._upper_bounds[-1]
+
+
+class _Metric:
+    """带标签的指标族，labels() 返回具体的子指标"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def collect(self) -> List[Family]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def collect(self) -> List[Family]:
+        samples = [
+            ("", dict(zip(self.labelnames, key)), child.value)
+            for key, child in self._items()
+        ]
+        return [(self.name, "counter", self.documentation, samples)]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def collect(self) -> List[Family]:
+        samples: List[Sample] = []
+        quantiles: List[Sample] = []
+        for key, child in self._items():
+            labels = dict(zip(self.labelnames, key))
+            with child._lock:
+                counts, total, value_sum = list(child.counts), child.count, child.sum
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(("_sum", labels, value_sum))
+            samples.append(("_count", labels, total))
+            for q in QUANTILES:
+                quantiles.append(("", {**labels, "quantile": str(q)}, child.quantile(q)))
+        return [
+            (self.name, "histogram", self.documentation, samples),
+            (f"{self.name}_quantile", "gauge", f"{self.documentation}（分桶估计的分位数）", quantiles),
+        ]
+
+
+class Gauge(_Metric):
+    """由回调函数在采集时计算数值的仪表
+
+    带一个标签时，回调返回 {标签值: 数值} 字典。回调描述的是注册进程中的
+    对象，fork 出的子进程里不采集，避免报告过期的副本。
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], object], labelname: Optional[str] = None):
+        super().__init__(name, documentation, (labelname,) if labelname else ())
+        self.func = func
+        self._pid = os.getpid()
+
+    def collect(self) -> List[Family]:
+        if os.getpid() != self._pid:
+            return []
+        try:
+            value = self.func()
+            if self.labelnames:
+                samples = [("", {self.labelnames[0]: str(k)}, float(v)) for k, v in value.items()]
+            else:
+                samples = [("", {}, float(value))]
+        except Exception as e:
+            logger.debug(f"采集指标 {self.name} 失败: {e}")
+            return []
+        return [(self.name, "gauge", self.documentation, samples)]
+
+
+class Registry:
+    """指标注册表，只在被采集时才渲染"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, func: Callable[[], object],
+              labelname: Optional[str] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, func, labelname))
+
+    def snapshot(self) -> List[Family]:
+        """采集当前所有指标，结果可以跨进程传递"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        families: List[Family] = []
+        for metric in metrics:
+            families.extend(metric.collect())
+        return families
+
+    def _stateful(self) -> List[_Metric]:
+        with self._lock:
+            return [m for m in self._metrics.values() if isinstance(m, (Counter, Histogram))]
+
+    def dump(self) -> Dict[str, list]:
+        """
+        导出计数器与直方图的原始数值，可以跨进程传递
+
+        与 snapshot 不同，结果可以用 merge 累加到另一个进程的注册表，
+        用于把短生命周期子进程（如图床同步）记录的数据交回父进程。
+        """
+        return {
+            metric.name: [(key, child.dump()) for key, child in metric._items()]
+            for metric in self._stateful()
+        }
+
+    def merge(self, state: Dict[str, list]) -> None:
+        """把 dump 导出的数值累加到本注册表中同名的指标，忽略未注册的指标"""
+        metrics = {metric.name: metric for metric in self._stateful()}
+        for name, children in state.items():
+            metric = metrics.get(name)
+            if metric is None:
+                continue
+            for key, value in children:
+                try:
+                    metric.labels(*key).merge(value)
+                except ValueError as e:
+                    logger.warning(f"合并指标 {name} 失败: {e}")
+
+    def reset(self) -> None:
+        """清空计数器与直方图，fork 出的子进程在开始记录前调用，避免把继承的数值再交回父进程"""
+        for metric in self._stateful():
+            with metric._lock:
+                metric._children.clear()
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(float(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def merge_snapshots(snapshots: Dict[str, List[Family]], label: str = "process") -> List[Family]:
+    """合并多个进程的快照，为每个样本加上来源标签，同名指标族合并为一族"""
+    merged: Dict[str, Family] = {}
+    for source, families in snapshots.items():
+        for name, type_name, documentation, samples in families:
+            if name not in merged:
+                merged[name] = (name, type_name, documentation, [])
+            merged[name][3].extend(
+                (suffix, {label: source, **labels}, value) for suffix, labels, value in samples
+            )
+    return list(merged.values())
+
+
+def render(families: List[Family]) -> str:
+    """渲染为 Prometheus 文本格式"""
+    lines = []
+    for name, type_name, documentation, samples in families:
+        lines.append(f"# HELP {name} {_escape(documentation)}")
+        lines.append(f"# TYPE {name} {type_name}")
+        for suffix, labels, value in samples:
+            if labels:
+                label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsBridge:
+    """把机器人进程的指标提供给 WebUI 进程
+
+    WebUI 运行在独立进程中，/metrics 通过管道向机器人进程请求快照。
+    机器人进程的服务线程平时阻塞在 recv 上，没有采集请求时不产生开销。
+    """
+
+    def __init__(self, registry: Registry):
+        self.registry = registry
+        self._server_conn, self.client_conn = multiprocessing.Pipe()
+        self._client_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._serve, name="metrics-bridge", daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                self._server_conn.recv()
+                self._server_conn.send(self.registry.snapshot())
+            except (EOFError, OSError):
+                return
+            except Exception as e:
+                logger.error(f"提供指标快照失败: {e}")
+
+    def request(self, timeout: float = 2.0) -> Optional[List[Family]]:
+        """（WebUI 进程中调用）获取机器人进程的快照，超时返回 None"""
+        with self._client_lock:
+            try:
+                # 丢弃之前超时请求迟到的应答
+                while self.client_conn.poll():
+                    self.client_conn.recv()
+                self.client_conn.send(None)
+                if self.client_conn.poll(timeout):
+                    return self.client_conn.recv()
+            except (EOFError, OSError) as e:
+                logger.warning(f"获取机器人进程指标失败: {e}")
+        return None
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "meme_stage_duration_seconds", "插件各处理阶段的耗时", ("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "meme_stage_errors_total", "插件各处理阶段的异常次数", ("stage",)
+)
+STARDOTS_REQUEST_SECONDS = REGISTRY.histogram(
+    "stardots_request_duration_seconds", "StarDots 图床请求耗时", ("endpoint",)
+)
+STARDOTS_REQUESTS = REGISTRY.counter(
+    "stardots_requests_total", "StarDots 图床请求次数", ("endpoint", "status")
+)
@@ -0,0 +1,418 @@
+import os
+import logging
+import threading
+import math
+import functools
+import itertools
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from .config import MEMES_DIR, PHASH_INDEX_PATH, MEME_EXTENSIONS
+from .json_store import DebouncedJsonStore
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # dHash 边长，得到 64 位哈希
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """首次批量计算时导入 numpy，未安装时返回 None"""
+    try:
+        import numpy
+    except ImportError:  # numpy 为可选依赖，缺失时逐张计算
+        return None
+    return numpy
+
+
+def _load_gray(path: str) -> "Image.Image":
+    """读取图片并缩放为 (HASH_SIZE + 1) x HASH_SIZE 灰度图"""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        # JPEG 在解码阶段直接降采样，避免解码整张大图
+        img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+        return img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+
+
+def dhash(path: str) -> int:
+    """计算单张图片的 64 位 dHash"""
+    pixels = list(_load_gray(path).getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def dhash_batch(paths: List[str]) -> List[Optional[int]]:
+    """批量计算 dHash，安装了 numpy 时向量化比较与打包，无法读取的图片为 None"""
+    np = _numpy()
+    if np is None:
+        results = []
+        for path in paths:
+            try:
+                results.append(dhash(path))
+            except Exception as e:
+                logger.debug(f"计算感知哈希失败 {path}: {e}")
+                results.append(None)
+        return results
+
+    results: List[Optional[int]] = [None] * len(paths)
+    arrays, positions = [], []
+    for i, path in enumerate(paths):
+        try:
+            arrays.append(np.asarray(_load_gray(path), dtype=np.int16))
+            positions.append(i)
+        except Exception as e:
+            logger.debug(f"计算感知哈希失败 {path}: {e}")
+    if not arrays:
+        return results
+
+    stack = np.stack(arrays)  # (n, 8, 9)
+    bits = (stack[:, :, :-1] > stack[:, :, 1:]).reshape(len(arrays), -1)
+    packed = np.packbits(bits, axis=1)  # (n, 8) 大端字节
+    for i, row in zip(positions, packed):
+        results[i] = int.from_bytes(row.tobytes(), "big")
+    return results
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+@functools.lru_cache(maxsize=None)
+def _flip_masks(width: int, radius: int) -> Tuple[int, ...]:
+    """width 位内所有翻转不超过 radius 位的掩码（含 0）"""
+    masks = [0]
+    for k in range(1, radius + 1):
+        for bits in itertools.combinations(range(width), k):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            masks.append(mask)
+    return tuple(masks)
+
+
+class MultiIndexHash:
+    """汉明距离上的多索引哈希（Norouzi 等，MIH）
+
+    将 64 位哈希切分为 m 段并各建一张表。由抽屉原理，距离不超过 r 的两个
+    哈希至少有一段的距离不超过 r // m，查询时在每段枚举该半径内的所有子串
+    并比较命中的候选。段数按预期规模 n 选择，使"枚举的子串数 + 期望候选数"
+    最小，每段约 log2(n) 位、每个桶平均只有常数个条目，单次查询的代价随库
+    大小亚线性增长。条目数量远超建表时的规模后，调用方应按新规模重建
+    （见 NearDuplicateIndex）。
+    """
+
+    def __init__(self, expected_size: int = 1024, radius: int = 6, bits: int = HASH_SIZE * HASH_SIZE):
+        """
+        Args:
+            expected_size: 预期条目数量，用于选择段数
+            radius: 常用的查询半径，用于选择段数；查询时可使用其他半径
+            bits: 哈希位数
+        """
+        self.bits = bits
+        self.expected_size = max(1, expected_size)
+        self.bands = bands = self._choose_bands(self.expected_size, radius, bits)
+        # 各段的 (右移位数, 位数)，位数尽量均分
+        self._slices: List[Tuple[int, int]] = []
+        offset = bits
+        for i in range(bands):
+            size = bits // bands + (1 if i < bits % bands else 0)
+            offset -= size
+            self._slices.append((offset, size))
+        self._tables: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(bands)]
+        self._values: Dict[str, int] = {}
+        # 累计枚举的子串数与比较的候选数，用于观察查询代价
+        self.probes = 0
+        self.comparisons = 0
+
+    @staticmethod
+    def _choose_bands(n: int, radius: int, bits: int) -> int:
+        best, best_cost = 1, math.inf
+        for bands in range(1, min(bits, radius + 1) + 1):
+            width = bits / bands
+            sub_radius = radius // bands
+            probes = bands * sum(math.comb(int(width), k) for k in range(min(sub_radius, int(width)) + 1))
+            cost = probes + probes * n / 2 ** width
+            if cost < best_cost:
+                best, best_cost = bands, cost
+        return best
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @classmethod
+    def build(cls, values: Dict[str, int], radius: int = 6) -> "MultiIndexHash":
+        index = cls(len(values), radius)
+        for item, value in values.items():
+            index.add(value, item)
+        return index
+
+    def add(self, value: int, item: str) -> None:
+        if item in self._values:
+            self.remove(item)
+        self._values[item] = value
+        entry = (value, item)
+        for table, (shift, size) in zip(self._tables, self._slices):
+            table.setdefault((value >> shift) & ((1 << size) - 1), []).append(entry)
+
+    def remove(self, item: str) -> None:
+        value = self._values.pop(item, None)
+        if value is None:
+            return
+        entry = (value, item)
+        for table, (shift, size) in zip(self._tables, self._slices):
+            key = (value >> shift) & ((1 << size) - 1)
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.remove(entry)
+                if not bucket:
+                    del table[key]
+
+    def query(self, value: int, radius: int) -> List[Tuple[int, str]]:
+        """返回与 value 距离不超过 radius 的 (距离, 条目) 列表"""
+        sub_radius = radius // self.bands
+        masks = [_flip_masks(size, min(sub_radius, size)) for _, size in self._slices]
+        probes = sum(map(len, masks))
+        if probes >= len(self._values):
+            # 枚举的子串比条目还多，直接扫描
+            self.comparisons += len(self._values)
+            return [
+                (distance, item)
+                for item, other in self._values.items()
+                if (distance := (value ^ other).bit_count()) <= radius
+            ]
+
+        # 桶中直接保存 (哈希, 条目)，省去按条目回查哈希；同一条目可能命中多段，按条目去重
+        self.probes += probes
+        matches: Dict[str, int] = {}
+        for table, (shift, size), band_masks in zip(self._tables, self._slices, masks):
+            key = (value >> shift) & ((1 << size) - 1)
+            for mask in band_masks:
+                bucket = table.get(key ^ mask)
+                if not bucket:
+                    continue
+                self.comparisons += len(bucket)
+                for other, item in bucket:
+                    distance = (value ^ other).bit_count()
+                    if distance <= radius:
+                        matches[item] = distance
+        return [(distance, item) for item, distance in matches.items()]
+
+
+class NearDuplicateIndex:
+    """表情包近似重复索引
+
+    为库中每张图片保存 dHash（按 mtime/大小增量更新，持久化到
+    PHASH_INDEX_PATH，修改以变更日志记录并合并写入），并用多索引哈希
+    支持与库大小基本无关的汉明距离查询。上传时用 similar_to 检查是否与
+    已有表情包近似，WebUI 用 find_duplicates 生成全库近似重复报告。
+    """
+
+    def __init__(
+        self,
+        memes_dir: str = MEMES_DIR,
+        index_path: str = PHASH_INDEX_PATH,
+        distance: int = 6,
+        batch_size: int = 256,
+        save_delay: float = 1.0,
+    ):
+        """
+        Args:
+            memes_dir: 表情包根目录
+            index_path: 哈希索引文件路径
+            distance: 判定为近似重复的最大汉明距离
+            batch_size: 批量计算哈希时每批的图片数量
+            save_delay: 合并写入索引文件的时间窗口（秒）
+        """
+        self.memes_dir = memes_dir
+        self.index_path = index_path
+        self.distance = distance
+        self.batch_size = batch_size
+        self._entries: Dict[str, Tuple[int, int, int]] = {}  # 相对路径 -> (mtime_ns, size, hash)
+        self._index = MultiIndexHash(radius=distance)
+        self._store = DebouncedJsonStore(index_path, delay=save_delay)
+        self._lock = threading.Lock()
+        self._generation = 0  # 索引内容每次变化后递增
+        self._report: Optional[Tuple[int, int, List[List[Dict[str, object]]]]] = None
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.index_path) and not os.path.exists(self._store.journal_path):
+            return
+        for rel_path, (mtime_ns, size, hex_hash) in self._store.load({}).items():
+            self._entries[rel_path] = (mtime_ns, size, int(hex_hash, 16))
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        self._index = MultiIndexHash.build(
+            {rel_path: value for rel_path, (_, _, value) in self._entries.items()}, self.distance
+        )
+
+    def _resize_index(self) -> None:
+        """条目数量与建表规模相差 4 倍以上时按当前规模重建索引，调用方需持有锁"""
+        expected = self._index.expected_size
+        if len(self._entries) > expected * 4 or (expected > 1024 and len(self._entries) < expected // 4):
+            self._rebuild_index()
+
+    @staticmethod
+    def _serialize(entry: Tuple[int, int, int]) -> list:
+        mtime_ns, size, value = entry
+        return [mtime_ns, size, format(value, "016x")]
+
+    def flush(self) -> bool:
+        """立即写入尚未落盘的索引修改，在关闭前调用"""
+        return self._store.flush()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """扫描库中所有图片的 (mtime_ns, size)"""
+        files = {}
+        for category in os.listdir(self.memes_dir):
+            category_path = os.path.join(self.memes_dir, category)
+            if not os.path.isdir(category_path):
+                continue
+            with os.scandir(category_path) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.lower().endswith(MEME_EXTENSIONS):
+                        st = entry.stat()
+                        files[f"{category}/{entry.name}"] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def refresh(self) -> int:
+        """增量同步索引与文件系统，返回重新计算哈希的图片数量"""
+        try:
+            files = self._scan()
+        except OSError as e:
+            logger.error(f"扫描表情包目录失败: {e}")
+            return 0
+
+        with self._lock:
+            known = {p: entry[:2] for p, entry in self._entries.items()}
+        stale = [p for p, stat in files.items() if known.get(p) != stat]
+        hashed = {}
+        for start in range(0, len(stale), self.batch_size):
+            batch = stale[start:start + self.batch_size]
+            values = dhash_batch([os.path.join(self.memes_dir, p) for p in batch])
+            for rel_path, value in zip(batch, values):
+                if value is not None:
+                    hashed[rel_path] = files[rel_path] + (value,)
+
+        with self._lock:
+            removed = [p for p in self._entries if p not in files]
+            for rel_path in removed:
+                del self._entries[rel_path]
+                self._index.remove(rel_path)
+            for rel_path, entry in hashed.items():
+                self._entries[rel_path] = entry
+                self._index.add(entry[2], rel_path)
+            self._resize_index()
+            if hashed or removed:
+                self._generation += 1
+                self._store.update(
+                    {p: self._serialize(entry) for p, entry in hashed.items()}, removed
+                )
+        if hashed:
+            logger.info(f"感知哈希索引已更新 {len(hashed)} 张图片")
+        return len(hashed)
+
+    @property
+    def refreshing(self) -> bool:
+        """后台刷新是否正在进行"""
+        return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def start_refresh(self) -> None:
+        """在后台线程中刷新索引"""
+        if self.refreshing:
+            return
+        self._refresh_thread = threading.Thread(
+            target=self.refresh, name="meme-phash-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def similar_to(self, path: str, distance: Optional[int] = None, add: bool = True) -> List[Tuple[str, int]]:
+        """
+        查询与图片近似的已有表情包
+
+        Args:
+            path: 图片路径
+            distance: 最大汉明距离，默认使用初始化时的设置
+            add: 查询后是否把该图片加入索引
+
+        Returns:
+            [(相对路径, 距离)]，按距离升序
+        """
+        distance = self.distance if distance is None else distance
+        rel_path = os.path.relpath(path, self.memes_dir).replace(os.sep, "/")
+        st = os.stat(path)
+        value = dhash(path)
+        with self._lock:
+            matches = sorted(
+                ((p, d) for d, p in self._index.query(value, distance) if p != rel_path),
+                key=lambda m: m[1],
+            )
+            if add:
+                entry = (st.st_mtime_ns, st.st_size, value)
+                self._entries[rel_path] = entry
+                self._index.add(value, rel_path)
+                self._resize_index()
+                self._generation += 1
+                self._store.update({rel_path: self._serialize(entry)})
+        return matches
+
+    def find_duplicates(self, distance: Optional[int] = None) -> List[List[Dict[str, object]]]:
+        """
+        生成全库近似重复报告
+
+        在锁外基于索引快照计算：按快照规模建立多索引哈希，逐张图片先查询
+        已加入的图片再加入自身，每对近似图片只比较一次，总代价与库大小近似
+        线性。索引未变化时直接返回上次的结果。
+
+        Returns:
+            近似重复分组列表，每组为 [{"path": 相对路径, "category": 类别, "filename": 文件名}]
+        """
+        distance = self.distance if distance is None else distance
+        with self._lock:
+            generation = self._generation
+            cached = self._report
+            if cached is not None and cached[:2] == (generation, distance):
+                return cached[2]
+            entries = dict(self._entries)
+
+        index = MultiIndexHash(len(entries), distance)
+        parent = {p: p for p in entries}
+
+        def find(p: str) -> str:
+            while parent[p] != p:
+                parent[p] = parent[parent[p]]
+                p = parent[p]
+            return p
+
+        for rel_path, (_, _, value) in entries.items():
+            for _, other in index.query(value, distance):
+                a, b = find(rel_path), find(other)
+                if a != b:
+                    parent[b] = a
+            index.add(value, rel_path)
+
+        groups: Dict[str, List[str]] = {}
+        for rel_path in entries:
+            groups.setdefault(find(rel_path), []).append(rel_path)
+
+        report = []
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            report.append([
+                {"path": p, "category": p.split("/", 1)[0], "filename": p.split("/", 1)[1]}
+                for p in sorted(members)
+            ])
+        report.sort(key=len, reverse=True)
+        with self._lock:
+            if self._generation == generation:
+                self._report = (generation, distance, report)
+        return report
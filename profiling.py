@@ -0,0 +1,338 @@
+import os
+import io
+import re
+import sys
+import time
+import inspect
+import logging
+import functools
+import threading
+from collections import Counter
+from typing import Callable, Optional
+from .config import PROFILES_DIR
+
+logger = logging.getLogger(__name__)
+
+PROFILING_MODES = ("off", "cprofile", "sampling")
+
+# 文本报告中列出的函数数量
+REPORT_TOP_N = 30
+
+
+class _Sampler:
+    """采样分析器：后台线程按固定间隔记录目标线程的调用栈，暂停时不采样"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.thread_id: Optional[int] = None  # 正在分析的线程，None 表示暂停
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def resume(self) -> None:
+        self.thread_id = threading.get_ident()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+            self._thread.start()
+
+    def pause(self) -> None:
+        self.thread_id = None
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            thread_id = self.thread_id
+            frame = sys._current_frames().get(thread_id) if thread_id is not None else None
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            # 折叠栈格式：根在前，以分号分隔
+            self.stacks[";".join(reversed(stack))] += 1
+
+
+class _Session:
+    """一次被分析的调用，分析器只在 resume() 与 pause() 之间运行"""
+
+    def __init__(self, recorder: "ProfileRecorder", name: str, mode: str):
+        self.recorder = recorder
+        self.name = name
+        self.mode = mode
+        self.started_at = time.time()
+        self.steps = 0  # 实际被分析的同步片段数
+        self.active = 0.0  # 被分析片段的累计耗时（秒）
+        self._start = time.perf_counter()
+        self._step_start = 0.0
+        if mode == "cprofile":
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+        else:
+            self._profiler = _Sampler(recorder.interval)
+
+    def resume(self) -> None:
+        """开始分析一个同步片段，cProfile 已被其他线程占用时抛出 ValueError"""
+        if self.mode == "cprofile":
+            self._profiler.enable()
+        else:
+            self._profiler.resume()
+        self._step_start = time.perf_counter()
+
+    def pause(self) -> None:
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.pause()
+        self.steps += 1
+        self.active += time.perf_counter() - self._step_start
+
+    def finish(self) -> None:
+        elapsed = time.perf_counter() - self._start
+        if self.mode != "cprofile":
+            self._profiler.stop()
+        if not self.steps:
+            # 整个调用都嵌套在其他被分析的调用中
+            return
+        try:
+            self.recorder._write(self, elapsed)
+        except Exception as e:
+            logger.error(f"保存性能分析结果失败: {e}")
+
+
+class _ProfiledAwaitable:
+    """逐步驱动协程，只在协程自身代码运行时开启分析
+
+    协程在 await 处挂起后分析器暂停，事件循环在此期间运行的其他任务不会
+    计入本次结果，也可以被独立分析。
+    """
+
+    def __init__(self, awaitable, recorder: "ProfileRecorder", session: _Session):
+        self._awaitable = awaitable
+        self._recorder = recorder
+        self._session = session
+
+    def __await__(self):
+        target = self._awaitable
+        value, error = None, None
+        while True:
+            entered = self._recorder._enter(self._session)
+            try:
+                if error is not None:
+                    yielded = target.throw(error)
+                else:
+                    yielded = target.send(value)
+            except StopIteration as e:
+                return e.value
+            finally:
+                if entered:
+                    self._recorder._exit(self._session)
+            try:
+                value, error = (yield yielded), None
+            except GeneratorExit:
+                target.close()
+                raise
+            except BaseException as e:
+                value, error = None, e
+
+
+class ProfileRecorder:
+    """按调用记录性能分析结果
+
+    mode 为 "cprofile" 时写出 .pstats 文件，为 "sampling" 时写出折叠栈
+    (.collapsed，可直接用于 flamegraph.pl / speedscope)；两种模式都会附带
+    一份 top-N 文本报告。结果保存在 profiles_dir 中，只保留最近 max_files 次调用。
+    关闭时被装饰的函数只多一次属性判断。
+
+    协程和异步生成器只在自身代码运行的同步片段中被分析，在 await / yield
+    处挂起时暂停，因此同一事件循环中并发的调用可以各自被分析，互不混入。
+    同一线程同时只运行一个被分析的片段，嵌套的调用计入外层调用。
+    """
+
+    def __init__(self, profiles_dir: str = PROFILES_DIR, mode: str = "off",
+                 max_files: int = 50, interval: float = 0.005):
+        self.profiles_dir = profiles_dir
+        self.max_files = max_files
+        self.interval = interval
+        self.mode = "off"
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.set_mode(mode)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def set_mode(self, mode: str) -> None:
+        if mode not in PROFILING_MODES:
+            raise ValueError(f"未知的性能分析模式: {mode}，可选 {', '.join(PROFILING_MODES)}")
+        self.mode = mode
+        if mode != "off":
+            os.makedirs(self.profiles_dir, exist_ok=True)
+            logger.info(f"性能分析已开启（{mode}），结果保存在 {self.profiles_dir}")
+
+    def open(self, name: str) -> Optional[_Session]:
+        """创建一次调用的分析会话（尚未开始分析），未开启时返回 None"""
+        if self.mode == "off":
+            return None
+        return _Session(self, name, self.mode)
+
+    def close(self, session: Optional[_Session]) -> None:
+        """结束会话并写出结果"""
+        if session is not None:
+            session.finish()
+
+    def _enter(self, session: _Session) -> bool:
+        """开始分析一个同步片段，当前线程已有被分析的片段时返回 False"""
+        if getattr(self._local, "active", False):
+            return False
+        try:
+            session.resume()
+        except ValueError as e:
+            # 其他线程已占用 cProfile（Python 3.12+ 全局只允许一个）
+            logger.debug(f"跳过性能分析 {session.name}: {e}")
+            return False
+        self._local.active = True
+        return True
+
+    def _exit(self, session: _Session) -> None:
+        session.pause()
+        self._local.active = False
+
+    def start(self, name: str) -> Optional[_Session]:
+        """开始分析一次同步调用，未开启或当前线程已在分析时返回 None"""
+        session = self.open(name)
+        if session is None or not self._enter(session):
+            return None
+        return session
+
+    def stop(self, session: Optional[_Session]) -> None:
+        if session is None:
+            return
+        self._exit(session)
+        session.finish()
+
+    def _write(self, session: _Session, elapsed: float) -> None:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(session.started_at))
+        safe_name = re.sub(r"[^\w.-]+", "_", session.name)
+        base = os.path.join(
+            self.profiles_dir, f"{stamp}-{int(session.started_at * 1000) % 1000:03d}_{safe_name}"
+        )
+        header = (
+            f"# {session.name}  耗时 {elapsed * 1000:.1f} ms  "
+            f"（被分析的片段 {session.steps} 个，共 {session.active * 1000:.1f} ms）  模式 {session.mode}\n"
+        )
+
+        report = io.StringIO()
+        report.write(header)
+        if session.mode == "cprofile":
+            import pstats
+
+            session._profiler.dump_stats(f"{base}.pstats")
+            stats = pstats.Stats(session._profiler, stream=report)
+            stats.sort_stats("cumulative").print_stats(REPORT_TOP_N)
+        else:
+            stacks = session._profiler.stacks
+            with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            self._write_sampling_report(report, stacks)
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+        self._rotate()
+
+    @staticmethod
+    def _write_sampling_report(report: io.StringIO, stacks: Counter) -> None:
+        total = sum(stacks.values())
+        own, inclusive = Counter(), Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        report.write(f"共 {total} 个样本\n\n自身耗时:\n")
+        for frame, count in own.most_common(REPORT_TOP_N):
+            report.write(f"{count / total:7.1%}  {frame}\n")
+        report.write("\n累计耗时:\n")
+        for frame, count in inclusive.most_common(REPORT_TOP_N):
+            report.write(f"{count / total:7.1%}  {frame}\n")
+
+    def _rotate(self) -> None:
+        """只保留最近 max_files 次调用的结果"""
+        with self._write_lock:
+            groups = {}
+            for entry in os.scandir(self.profiles_dir):
+                stem = os.path.splitext(entry.name)[0]
+                groups.setdefault(stem, []).append(entry.path)
+            for stem in sorted(groups)[:-self.max_files or None]:
+                for path in groups[stem]:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+
+PROFILER = ProfileRecorder()
+
+
+def profiled(name: Optional[str] = None, recorder: ProfileRecorder = PROFILER) -> Callable:
+    """
+    为函数挂上性能分析钩子，支持普通函数、协程函数和异步生成器函数
+
+    Args:
+        name: 结果文件中使用的名称，默认为函数的限定名
+        recorder: 使用的分析记录器
+    """
+
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__qualname__
+
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def asyncgen_wrapper(*args, **kwargs):
+                session = recorder.open(label) if recorder.enabled else None
+                if session is None:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    return
+                agen = func(*args, **kwargs)
+                try:
+                    while True:
+                        try:
+                            item = await _ProfiledAwaitable(agen.__anext__(), recorder, session)
+                        except StopAsyncIteration:
+                            break
+                        yield item
+                finally:
+                    await agen.aclose()
+                    recorder.close(session)
+            return asyncgen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def coroutine_wrapper(*args, **kwargs):
+                session = recorder.open(label) if recorder.enabled else None
+                if session is None:
+                    return await func(*args, **kwargs)
+                try:
+                    return await _ProfiledAwaitable(func(*args, **kwargs), recorder, session)
+                finally:
+                    recorder.close(session)
+            return coroutine_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            session = recorder.start(label) if recorder.enabled else None
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.stop(session)
+        return wrapper
+
+    return decorator
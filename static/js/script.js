@@ -2,11 +2,17 @@ document.addEventListener("DOMContentLoaded", () => {
   const categoriesContainer = document.getElementById("emoji-categories");
   const addCategoryForm = document.getElementById("add-category-form");
 
-  // 获取表情包数据和描述
+  // 每次加载的表情包数量
+  const PAGE_SIZE = 60;
+  // 当前页面展示的表情包库版本和标签描述，未变化时不重建页面
+  let renderedVersion = null;
+  let renderedDescriptions = null;
+
+  // 获取表情包数据和描述（只获取各类别数量，表情包按需分页加载）
   async function fetchEmojis() {
     try {
-      const [emojiResponse, tagDescriptions] = await Promise.all([
-        fetch("/api/emoji").then((res) => {
+      const [summary, tagDescriptions] = await Promise.all([
+        fetch("/api/emoji?limit=0").then((res) => {
           if (!res.ok) throw new Error("获取表情包数据失败");
           return res.json();
         }),
@@ -15,8 +21,17 @@ document.addEventListener("DOMContentLoaded", () => {
           return res.json();
         }),
       ]);
-      displayCategories(emojiResponse, tagDescriptions);
-      updateSidebar(emojiResponse, tagDescriptions);
+      const descriptionsKey = JSON.stringify(tagDescriptions);
+      if (
+        summary.version === renderedVersion &&
+        descriptionsKey === renderedDescriptions
+      ) {
+        return;
+      }
+      renderedVersion = summary.version;
+      renderedDescriptions = descriptionsKey;
+      displayCategories(summary.categories, tagDescriptions);
+      updateSidebar(summary.categories, tagDescriptions);
     } catch (error) {
       console.error("加载表情包数据失败", error);
     }
@@ -41,12 +56,110 @@ document.addEventListener("DOMContentLoaded", () => {
     img.replaceWith(errorDiv);
   }
 
-  // 根据数据生成 DOM 节点，展示每个分类及其表情包，并添加上传块
-  function displayCategories(emojiData, tagDescriptions) {
+  // 懒加载缩略图：表情包进入视口时才设置背景图片
+  const thumbObserver = new IntersectionObserver(
+    (entries, observer) => {
+      entries.forEach((entry) => {
+        if (entry.isIntersecting) {
+          const emojiItem = entry.target;
+          const bgUrl = emojiItem.getAttribute("data-bg");
+          emojiItem.style.backgroundImage = `url('${bgUrl}')`; // 加载背景图片
+          emojiItem.removeAttribute("data-bg"); // 移除临时属性
+          observer.unobserve(emojiItem); // 停止观察
+        }
+      });
+    },
+    { threshold: 0.1 }
+  );
+
+  // 分页加载：类别末尾的占位元素接近视口时加载下一页
+  const pageObserver = new IntersectionObserver(
+    (entries) => {
+      entries.forEach((entry) => {
+        if (entry.isIntersecting) {
+          loadNextPage(entry.target);
+        }
+      });
+    },
+    { rootMargin: "300px 0px" }
+  );
+
+  // 加载类别的下一页表情包
+  async function loadNextPage(sentinel) {
+    const category = sentinel.dataset.category;
+    const grid = sentinel.previousElementSibling;
+    if (sentinel.dataset.loading) return;
+    sentinel.dataset.loading = "1";
+    try {
+      const params = new URLSearchParams({
+        limit: PAGE_SIZE,
+        cursor: sentinel.dataset.cursor,
+      });
+      const response = await fetch(
+        `/api/emoji/${encodeURIComponent(category)}?${params}`
+      );
+      if (!response.ok) throw new Error("获取表情包数据失败");
+      const page = await response.json();
+      page.items.forEach((emoji) => {
+        grid.appendChild(createEmojiItem(category, emoji, page.versions[emoji]));
+      });
+
+      pageObserver.unobserve(sentinel);
+      if (page.next_cursor === null) {
+        sentinel.remove();
+      } else {
+        // 重新观察，占位元素仍在视口内时会立即继续加载
+        sentinel.dataset.cursor = page.next_cursor;
+        pageObserver.observe(sentinel);
+      }
+    } catch (error) {
+      console.error(`加载类别 ${category} 的表情包失败`, error);
+    } finally {
+      delete sentinel.dataset.loading;
+    }
+  }
+
+  // 生成单个表情包节点，version 为内容哈希前缀，带上后图片可被浏览器长期缓存
+  function createEmojiItem(category, emoji, version) {
+    const emojiItem = document.createElement("div");
+    emojiItem.className = "emoji-item";
+    emojiItem.style.width = "150px";
+    emojiItem.style.height = "150px";
+    emojiItem.style.backgroundSize = "contain";
+    emojiItem.style.backgroundPosition = "center";
+    emojiItem.style.backgroundRepeat = "no-repeat";
+    emojiItem.style.cursor = "pointer";
+    emojiItem.style.border = "1px solid #ddd";
+    emojiItem.style.borderRadius = "4px";
+    emojiItem.style.flexShrink = "0";
+    emojiItem.style.position = "relative";
+
+    // 添加删除按钮
+    const deleteBtn = document.createElement("button");
+    deleteBtn.className = "delete-btn";
+    deleteBtn.innerHTML = "×";
+    deleteBtn.onclick = (e) => {
+      e.stopPropagation();
+      deleteEmoji(category, emoji, emojiItem);
+    };
+    emojiItem.appendChild(deleteBtn);
+
+    // 使用 data-bg 存储缩略图URL，点击时打开原图
+    const query = version ? `?v=${encodeURIComponent(version)}` : "";
+    emojiItem.setAttribute("data-bg", `/thumb/${category}/${emoji}${query}`);
+    emojiItem.onclick = () => window.open(`/memes/${category}/${emoji}${query}`, "_blank");
+    thumbObserver.observe(emojiItem);
+    return emojiItem;
+  }
+
+  // 根据数据生成 DOM 节点，展示每个分类，表情包在滚动到该分类时分页加载
+  function displayCategories(categories, tagDescriptions) {
     const container = document.getElementById("emoji-categories");
+    thumbObserver.disconnect();
+    pageObserver.disconnect();
     container.innerHTML = "";
 
-    Object.entries(emojiData).forEach(([category, emojis]) => {
+    Object.entries(categories).forEach(([category, info]) => {
       const categoryDiv = document.createElement("div");
       categoryDiv.className = "category";
       categoryDiv.id = `category-${category}`;
@@ -85,61 +198,19 @@ document.addEventListener("DOMContentLoaded", () => {
       emojiGrid.style.gap = "10px";
       emojiGrid.style.padding = "10px";
 
-      // 确保 emojis 是数组
-      if (Array.isArray(emojis)) {
-        emojis.forEach((emoji) => {
-          const emojiItem = document.createElement("div");
-          emojiItem.className = "emoji-item";
-          emojiItem.style.width = "150px";
-          emojiItem.style.height = "150px";
-          emojiItem.style.backgroundSize = "contain";
-          emojiItem.style.backgroundPosition = "center";
-          emojiItem.style.backgroundRepeat = "no-repeat";
-          emojiItem.style.cursor = "pointer";
-          emojiItem.style.border = "1px solid #ddd";
-          emojiItem.style.borderRadius = "4px";
-          emojiItem.style.flexShrink = "0";
-          emojiItem.style.position = "relative";
-
-          // 添加删除按钮
-          const deleteBtn = document.createElement("button");
-          deleteBtn.className = "delete-btn";
-          deleteBtn.innerHTML = "×";
-          deleteBtn.onclick = (e) => {
-            e.stopPropagation();
-            deleteEmoji(category, emoji);
-          };
-          emojiItem.appendChild(deleteBtn);
-
-          // 使用 data-bg 存储图片URL
-          emojiItem.setAttribute("data-bg", `/memes/${category}/${emoji}`);
-          emojiGrid.appendChild(emojiItem);
-        });
-      }
-
       categoryDiv.appendChild(emojiGrid);
-      container.appendChild(categoryDiv);
-    });
 
-    // 懒加载背景图片
-    const lazyBackgrounds = document.querySelectorAll(".emoji-item");
-    const observer = new IntersectionObserver(
-      (entries, observer) => {
-        entries.forEach((entry) => {
-          if (entry.isIntersecting) {
-            const emojiItem = entry.target;
-            const bgUrl = emojiItem.getAttribute("data-bg");
-            emojiItem.style.backgroundImage = `url('${bgUrl}')`; // 加载背景图片
-            emojiItem.removeAttribute("data-bg"); // 移除临时属性
-            observer.unobserve(emojiItem); // 停止观察
-          }
-        });
-      },
-      { threshold: 0.1 }
-    );
-
-    lazyBackgrounds.forEach((item) => {
-      observer.observe(item);
+      // 分页占位元素，滚动到这里时加载下一页
+      if (info.count > 0) {
+        const sentinel = document.createElement("div");
+        sentinel.className = "emoji-page-sentinel";
+        sentinel.style.height = "1px";
+        sentinel.dataset.category = category;
+        sentinel.dataset.cursor = "";
+        categoryDiv.appendChild(sentinel);
+        pageObserver.observe(sentinel);
+      }
+      container.appendChild(categoryDiv);
     });
 
     // 添加编辑描述的事件监听器
@@ -180,6 +251,16 @@ document.addEventListener("DOMContentLoaded", () => {
         return;
       }
       fetchEmojis(); // 刷新表情包列表
+      if (data.duplicate) {
+        alert(`类别 ${data.category} 中已存在相同的表情包: ${data.filename}`);
+        return;
+      }
+      if (data.similar && data.similar.length > 0) {
+        alert(
+          `添加表情包成功: ${data.filename} 到类别 ${data.category}\n疑似重复: ${data.similar.join("、")}`
+        );
+        return;
+      }
       alert(`添加表情包成功: ${data.filename} 到类别 ${data.category}`);
     } catch (error) {
       console.error("添加表情包失败", error);
@@ -187,7 +268,7 @@ document.addEventListener("DOMContentLoaded", () => {
   }
 
   // 删除表情包
-  async function deleteEmoji(category, emoji) {
+  async function deleteEmoji(category, emoji, emojiItem) {
     if (!confirm("是否删除该表情包？")) return;
     if (!confirm("请再次确认删除该表情包，此操作不可恢复！")) return;
     try {
@@ -202,7 +283,7 @@ document.addEventListener("DOMContentLoaded", () => {
         alert(data.message);
         return;
       }
-      fetchEmojis(); // 刷新表情包列表
+      emojiItem.remove(); // 只移除该节点，不重新加载整个列表
       alert(`删除表情包成功: ${data.filename} 从类别 ${data.category}`);
     } catch (error) {
       console.error("删除表情包失败", error);
@@ -444,7 +525,58 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   }
 
+  // 近似重复报告
+  async function findNearDuplicates() {
+    const reportDiv = document.getElementById("near-duplicates-report");
+    if (!reportDiv) return;
+    reportDiv.innerHTML = "<p>正在查找近似重复的表情包...</p>";
+
+    try {
+      const response = await fetch("/api/emoji/near_duplicates");
+      const data = await response.json();
+      if (!response.ok) throw new Error(data.message);
+
+      // 文件名和类别名来自用户上传，只通过 textContent / 属性赋值写入页面
+      reportDiv.innerHTML = "";
+      if (data.refreshing) {
+        const note = document.createElement("p");
+        note.textContent = "索引正在后台更新，稍后再次查找可获得最新结果。";
+        reportDiv.appendChild(note);
+      }
+      if (data.count === 0) {
+        const empty = document.createElement("p");
+        empty.textContent = "没有发现近似重复的表情包。";
+        reportDiv.appendChild(empty);
+        return;
+      }
+      const heading = document.createElement("h4");
+      heading.textContent = `发现 ${data.count} 组近似重复：`;
+      reportDiv.appendChild(heading);
+      data.groups.forEach((group) => {
+        const groupDiv = document.createElement("div");
+        groupDiv.className = "duplicate-group";
+        group.forEach((item) => {
+          const img = document.createElement("img");
+          img.src = `/thumb/${encodeURIComponent(item.category)}/${encodeURIComponent(item.filename)}`;
+          img.title = item.path;
+          img.loading = "lazy";
+          groupDiv.appendChild(img);
+        });
+        reportDiv.appendChild(groupDiv);
+      });
+    } catch (error) {
+      console.error("查找近似重复失败:", error);
+      const message = document.createElement("p");
+      message.style.color = "red";
+      message.textContent = `查找近似重复失败: ${error.message}`;
+      reportDiv.replaceChildren(message);
+    }
+  }
+
   // 添加事件监听器
+  document
+    .getElementById("find-duplicates-btn")
+    .addEventListener("click", findNearDuplicates);
   document
     .getElementById("upload-sync-btn")
     .addEventListener("click", syncToRemote);
@@ -587,31 +719,6 @@ document.addEventListener("DOMContentLoaded", () => {
   // 同步配置
   syncConfig();
 
-  // 加载类别数据并更新显示
-  async function loadCategories() {
-    try {
-      const response = await fetch("/api/emotions");
-      if (!response.ok) {
-        throw new Error("无法加载类别数据");
-      }
-      const data = await response.json();
-
-      // 确保 data 是一个对象
-      if (typeof data !== "object" || Array.isArray(data)) {
-        throw new Error("返回的数据格式不正确");
-      }
-
-      updateSidebar(data, data); // 假设 data 也包含描述
-      displayCategories(data, data); // 更新类别显示
-    } catch (error) {
-      console.error("加载类别失败:", error);
-      alert("加载类别失败: " + error.message);
-    }
-  }
-
-  // 在 DOMContentLoaded 事件中调用 loadCategories
-  loadCategories(); // 页面加载时获取类别
-
   // 在页面加载时自动检查同步状态
   checkSyncStatus();
 
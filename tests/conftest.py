@@ -0,0 +1,46 @@
+"""测试公共配置
+
+插件模块之间使用相对导入，且插件目录没有 __init__.py，这里把插件目录
+注册为 meme_manager 包，测试中通过 meme_manager.<模块> 导入。
+"""
+
+import sys
+import importlib.util
+import importlib.machinery
+from pathlib import Path
+
+import pytest
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+PACKAGE = "meme_manager"
+
+if PACKAGE not in sys.modules:
+    spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+    spec.submodule_search_locations = [str(PLUGIN_DIR)]
+    sys.modules[PACKAGE] = importlib.util.module_from_spec(spec)
+
+
+@pytest.fixture
+def webui_client(tmp_path, monkeypatch):
+    """登录状态的 WebUI 测试客户端，表情包目录与目录数据库位于临时目录"""
+    from meme_manager import meme_catalog, webui
+    from meme_manager.backend import api, models
+    from meme_manager.thumbnails import ThumbnailCache
+
+    memes = tmp_path / "memes"
+    memes.mkdir()
+    for module in (webui, api, models):
+        monkeypatch.setattr(module, "MEMES_DIR", str(memes))
+    monkeypatch.setattr(
+        meme_catalog, "_default_catalog",
+        meme_catalog.MemeCatalog(str(tmp_path / "data" / "catalog.db"), str(memes)),
+    )
+    monkeypatch.setattr(webui, "THUMBNAILS", ThumbnailCache(str(memes), str(tmp_path / "thumbs")))
+    monkeypatch.setattr(webui.app, "secret_key", "test")
+    monkeypatch.setitem(webui.app.config, "PLUGIN_CONFIG", {})
+
+    client = webui.app.test_client()
+    with client.session_transaction() as session:
+        session["authenticated"] = True
+    client.memes_dir = memes
+    return client
@@ -0,0 +1,77 @@
+import os
+
+from PIL import Image
+
+
+def _add(client, category, *names):
+    directory = client.memes_dir / category
+    directory.mkdir(exist_ok=True)
+    for i, name in enumerate(names):
+        Image.new("RGB", (4, 4), (i, len(name), 0)).save(directory / name)
+
+
+def test_emoji_overview_is_paginated(webui_client):
+    _add(webui_client, "happy", "a.png", "b.png", "c.png")
+    _add(webui_client, "sad", "x.gif")
+    (webui_client.memes_dir / "empty").mkdir()
+
+    data = webui_client.get("/api/emoji?limit=2").get_json()
+    happy = data["categories"]["happy"]
+    assert happy["count"] == 3
+    assert happy["items"] == ["a.png", "b.png"]
+    assert happy["next_cursor"] == "b.png"
+    assert all(len(v) == 12 for v in happy["versions"].values())
+    assert data["categories"]["sad"]["next_cursor"] is None
+    assert data["categories"]["empty"] == {"count": 0, "items": [], "versions": {}, "next_cursor": None}
+
+    # limit=0 只返回各类别数量
+    counts = webui_client.get("/api/emoji?limit=0").get_json()["categories"]
+    assert {c: v["count"] for c, v in counts.items()} == {"happy": 3, "sad": 1, "empty": 0}
+    assert counts["happy"]["items"] == []
+
+
+def test_category_pages_follow_cursor(webui_client):
+    names = [f"{i:02d}.png" for i in range(7)]
+    _add(webui_client, "happy", *names)
+
+    seen, cursor = [], ""
+    while cursor is not None:
+        page = webui_client.get(f"/api/emoji/happy?limit=3&cursor={cursor}").get_json()
+        seen += page["items"]
+        cursor = page["next_cursor"]
+    assert seen == names
+
+    # 不带 limit 时保持旧格式
+    assert webui_client.get("/api/emoji/happy").get_json() == names
+
+
+def test_pagination_errors(webui_client):
+    _add(webui_client, "happy", "a.png")
+    assert webui_client.get("/api/emoji?limit=abc").status_code == 400
+    assert webui_client.get("/api/emoji/happy?limit=abc").status_code == 400
+    assert webui_client.get("/api/emoji/missing?limit=10").status_code == 404
+
+
+def test_library_etag_tracks_changes(webui_client):
+    _add(webui_client, "happy", "a.png")
+    first = webui_client.get("/api/emoji?limit=10")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    cached = webui_client.get("/api/emoji?limit=10", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and not cached.data
+
+    # 外部新增文件后对账，版本号变化
+    _add(webui_client, "happy", "a.png", "b.png")
+    st = os.stat(webui_client.memes_dir / "happy")
+    os.utime(webui_client.memes_dir / "happy", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    changed = webui_client.get("/api/emoji?limit=10", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["categories"]["happy"]["count"] == 2
+
+
+def test_requires_login(webui_client):
+    with webui_client.session_transaction() as session:
+        session.clear()
+    assert webui_client.get("/api/emoji?limit=10").status_code == 302
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import threading
+import time
+
+import pytest
+
+from meme_manager.async_io import BlockingIO, LoopBlockMonitor
+
+
+def test_blocking_io_runs_off_the_loop():
+    blocking_io = BlockingIO(max_workers=2)
+
+    def work(a, b=0):
+        return threading.current_thread().name, a + b
+
+    async def main():
+        return await blocking_io.run(work, 1, b=2)
+
+    try:
+        name, result = asyncio.run(main())
+    finally:
+        blocking_io.shutdown()
+    assert result == 3
+    assert name.startswith("meme-io")
+
+
+def test_blocking_io_propagates_errors():
+    blocking_io = BlockingIO(max_workers=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    try:
+        with pytest.raises(ValueError, match="boom"):
+            asyncio.run(blocking_io.run(fail))
+    finally:
+        blocking_io.shutdown()
+
+
+def test_blocking_io_is_bounded():
+    blocking_io = BlockingIO(max_workers=2)
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+
+    async def main():
+        await asyncio.gather(*(blocking_io.run(work) for _ in range(8)))
+
+    try:
+        asyncio.run(main())
+    finally:
+        blocking_io.shutdown()
+    assert state["peak"] == 2
+
+
+def _blocking_handler():
+    time.sleep(0.3)
+
+
+def test_loop_block_monitor_reports_the_blocking_stack(caplog):
+    monitor = LoopBlockMonitor(threshold_ms=50)
+    assert not monitor.start()  # 没有运行中的事件循环
+
+    async def main():
+        assert monitor.start()
+        assert monitor.running
+        await asyncio.sleep(0.05)
+        _blocking_handler()
+        await asyncio.sleep(0.05)
+        monitor.stop()
+        assert not monitor.running
+
+    with caplog.at_level(logging.WARNING, logger="meme_manager.async_io"):
+        asyncio.run(main())
+    warnings = [r.getMessage() for r in caplog.records]
+    # 同一次阻塞只报告一次
+    assert len(warnings) == 1
+    assert "_blocking_handler" in warnings[0]
+
+
+def test_loop_block_monitor_is_quiet_when_loop_is_idle(caplog):
+    monitor = LoopBlockMonitor(threshold_ms=50)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.3)
+        monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="meme_manager.async_io"):
+        asyncio.run(main())
+    assert not caplog.records
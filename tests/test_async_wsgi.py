@@ -0,0 +1,101 @@
+import socket
+import asyncio
+
+import aiohttp
+import pytest
+from flask import Flask, Response, request, send_file
+
+from meme_manager import webui
+from meme_manager.async_wsgi import AsyncWSGIServer
+
+BODY = bytes(range(256)) * 64  # 16 KiB
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    path = tmp_path / "blob.bin"
+    path.write_bytes(BODY)
+
+    @app.route("/text")
+    def text():
+        return "hello"
+
+    @app.route("/stream")
+    def stream():
+        return Response((f"part{i};" for i in range(5)), mimetype="text/plain")
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        return request.get_data()
+
+    @app.route("/file")
+    def file():
+        return send_file(path, conditional=True)
+
+    @app.route("/error")
+    def error():
+        raise RuntimeError("boom")
+
+    return app
+
+
+def _run(app, client):
+    """启动服务器，用 client(session, base_url) 发送请求后关闭"""
+
+    async def main():
+        server = AsyncWSGIServer(app, workers=2, request_timeout=5)
+        await server.start("127.0.0.1", 0)
+        try:
+            async with aiohttp.ClientSession() as session:
+                return await client(session, f"http://127.0.0.1:{server.port}")
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_basic_requests(app):
+    async def client(session, base):
+        async with session.get(f"{base}/text") as r:
+            assert (r.status, await r.read()) == (200, b"hello")
+        async with session.get(f"{base}/stream") as r:
+            assert await r.read() == b"".join(f"part{i};".encode() for i in range(5))
+        async with session.post(f"{base}/echo", data=b"x" * 100_000) as r:
+            assert await r.read() == b"x" * 100_000
+        async with session.get(f"{base}/error") as r:
+            assert r.status == 500
+
+    _run(app, client)
+
+
+def test_file_head_and_range(app):
+    async def client(session, base):
+        async with session.get(f"{base}/file") as r:
+            assert await r.read() == BODY
+        async with session.head(f"{base}/file") as r:
+            assert r.status == 200
+            assert int(r.headers["Content-Length"]) == len(BODY)
+            assert await r.read() == b""
+        async with session.get(f"{base}/file", headers={"Range": "bytes=100-4195"}) as r:
+            assert r.status == 206
+            assert r.headers["Content-Range"] == f"bytes 100-4195/{len(BODY)}"
+            assert await r.read() == BODY[100:4196]
+
+    _run(app, client)
+
+
+def test_inprocess_server_does_not_kill_port_owner(monkeypatch):
+    monkeypatch.setattr(webui, "SERVER_LOGIN_KEY", None)
+    monkeypatch.setitem(webui.app.config, "PLUGIN_CONFIG", {})
+    with socket.socket() as owner:
+        owner.bind(("0.0.0.0", 0))
+        owner.listen()
+        port = owner.getsockname()[1]
+
+        with pytest.raises(RuntimeError, match=str(port)):
+            asyncio.run(webui.start_inprocess_server({"webui_port": port}))
+        # 占用端口的套接字不受影响
+        assert owner.fileno() != -1
+        with socket.create_connection(("127.0.0.1", port), timeout=2):
+            pass
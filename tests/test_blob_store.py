@@ -0,0 +1,92 @@
+import os
+
+from meme_manager.blob_store import BlobStore
+
+
+def _ingest(store, tmp_path, data, target):
+    temp = tmp_path / f"upload-{os.urandom(4).hex()}.tmp"
+    temp.write_bytes(data)
+    return store.ingest(str(temp), store.hash_file(str(temp)), target)
+
+
+def _store(tmp_path):
+    memes = tmp_path / "memes"
+    (memes / "happy").mkdir(parents=True)
+    (memes / "sad").mkdir()
+    return BlobStore(str(tmp_path / "blobs"), str(memes), save_delay=60), memes
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store, memes = _store(tmp_path)
+    first = _ingest(store, tmp_path, b"image-a", str(memes / "happy" / "1.png"))
+    assert not first.duplicate
+    assert os.path.samefile(first.path, store.blob_path(first.sha256))
+
+    # 同类别重复上传返回已有文件，不新增文件
+    again = _ingest(store, tmp_path, b"image-a", str(memes / "happy" / "2.png"))
+    assert again.duplicate and again.path == first.path
+    assert not (memes / "happy" / "2.png").exists()
+
+    # 其他类别共享同一份 blob
+    other = _ingest(store, tmp_path, b"image-a", str(memes / "sad" / "1.png"))
+    assert not other.duplicate
+    assert os.path.samefile(other.path, first.path)
+    assert not list(tmp_path.glob("upload-*"))
+
+
+def test_overwriting_a_hardlink_leaves_the_blob_intact(tmp_path):
+    store, memes = _store(tmp_path)
+    a = _ingest(store, tmp_path, b"image-a", str(memes / "happy" / "1.png"))
+    _ingest(store, tmp_path, b"image-b", str(memes / "happy" / "1.png"))
+    assert (memes / "happy" / "1.png").read_bytes() == b"image-b"
+    with open(store.blob_path(a.sha256), "rb") as f:
+        assert f.read() == b"image-a"
+    assert not [p for p in os.listdir(memes / "happy") if p.endswith(".tmp")]
+
+
+def test_forget_and_collect_garbage(tmp_path):
+    store, memes = _store(tmp_path)
+    a = _ingest(store, tmp_path, b"image-a", str(memes / "happy" / "1.png"))
+    _ingest(store, tmp_path, b"image-a", str(memes / "sad" / "1.png"))
+    b = _ingest(store, tmp_path, b"image-b", str(memes / "sad" / "2.png"))
+
+    os.remove(memes / "happy" / "1.png")
+    store.forget("happy", "1.png")
+    # 仍被 sad/1.png 引用，不会被清理
+    assert store.collect_garbage() == 0
+
+    # 整个类别被删除
+    for name in os.listdir(memes / "sad"):
+        os.remove(memes / "sad" / name)
+    store.forget("sad")
+    assert store.collect_garbage() == 2
+    assert not os.path.exists(store.blob_path(a.sha256))
+    assert not os.path.exists(store.blob_path(b.sha256))
+
+
+def test_garbage_collection_drops_files_deleted_externally(tmp_path):
+    store, memes = _store(tmp_path)
+    a = _ingest(store, tmp_path, b"image-a", str(memes / "happy" / "1.png"))
+    os.remove(a.path)
+    assert store.collect_garbage() == 1
+
+
+def test_rename_category_keeps_refs(tmp_path):
+    store, memes = _store(tmp_path)
+    a = _ingest(store, tmp_path, b"image-a", str(memes / "happy" / "1.png"))
+    os.rename(memes / "happy", memes / "joy")
+    store.rename_category("happy", "joy")
+    assert store.find_in_dir(a.sha256, str(memes / "joy")) == str(memes / "joy" / "1.png")
+    assert store.find_in_dir(a.sha256, str(memes / "happy")) is None
+    assert store.collect_garbage() == 0
+
+
+def test_refs_survive_reload(tmp_path):
+    store, memes = _store(tmp_path)
+    a = _ingest(store, tmp_path, b"image-a", str(memes / "happy" / "1.png"))
+    assert store.flush()
+
+    reloaded = BlobStore(store.blobs_dir, store.memes_dir, save_delay=60)
+    assert reloaded.find_in_dir(a.sha256, str(memes / "happy")) == a.path
+    again = _ingest(reloaded, tmp_path, b"image-a", str(memes / "happy" / "2.png"))
+    assert again.duplicate
@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from meme_manager import category_manager
+from meme_manager.category_manager import CategoryManager
+
+
+@pytest.fixture
+def memes_dir(tmp_path, monkeypatch):
+    memes = tmp_path / "memes"
+    monkeypatch.setattr(category_manager, "MEMES_DIR", str(memes))
+    monkeypatch.setattr(category_manager, "MEMES_DATA_PATH", str(tmp_path / "memes_data.json"))
+    monkeypatch.setattr(category_manager, "DEFAULT_CATEGORY_DESCRIPTIONS", {"happy": "开心"})
+    return memes
+
+
+def _saved(memes_dir):
+    with open(memes_dir.parent / "memes_data.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_defaults_and_sync_with_filesystem(memes_dir):
+    manager = CategoryManager(save_delay=60)
+    assert dict(manager.get_descriptions()) == {"happy": "开心"}
+    (memes_dir / "happy").mkdir()
+    (memes_dir / "sad").mkdir()
+    assert sorted(manager.get_sync_status()[0]) == ["sad"]
+
+    assert manager.sync_with_filesystem()
+    assert manager.get_descriptions()["sad"] == "请添加描述"
+    assert manager.get_sync_status() == ([], [])
+
+
+def test_changes_survive_restart_without_flush(memes_dir):
+    manager = CategoryManager(save_delay=60)
+    (memes_dir / "happy").mkdir()
+    manager.update_descriptions({"sad": "难过", "angry": "生气"})
+    assert manager.rename_category("happy", "joy")
+    assert (memes_dir / "joy").is_dir()
+    assert manager.delete_category("angry")
+    # 修改在合并窗口内只记录在变更日志中
+    assert _saved(memes_dir) == {"happy": "开心"}
+
+    restarted = CategoryManager(save_delay=60)
+    expected = {"joy": "开心", "sad": "难过"}
+    assert dict(restarted.get_descriptions()) == expected
+    assert _saved(memes_dir) == expected
+
+
+def test_flush_writes_pending_changes(memes_dir):
+    manager = CategoryManager(save_delay=60)
+    manager.update_description("happy", "很开心")
+    assert manager.flush()
+    assert _saved(memes_dir) == {"happy": "很开心"}
+    assert not os.path.exists(manager._store.journal_path)
+
+
+def test_rename_and_delete_error_paths(memes_dir):
+    manager = CategoryManager(save_delay=60)
+    assert not manager.rename_category("missing", "other")
+    (memes_dir / "happy").mkdir()
+    (memes_dir / "joy").mkdir()
+    (memes_dir / "joy" / "a.png").write_bytes(b"x")
+    # 目标目录已存在且非空，重命名失败时配置保持不变
+    assert not manager.rename_category("happy", "joy")
+    assert dict(manager.get_descriptions()) == {"happy": "开心"}
+
+
+def test_snapshots_are_immutable_and_versioned(memes_dir):
+    manager = CategoryManager(save_delay=60)
+    before = manager.snapshot
+    assert before.version == 0 and "happy" in before and len(before) == 1
+    with pytest.raises(TypeError):
+        before.descriptions["sad"] = "难过"
+
+    manager.update_descriptions({"sad": "难过", "down": "难过"})
+    after = manager.snapshot
+    assert after is not before
+    assert manager.version == after.version == 1
+    # 旧快照保持不变，持有它的读取方不受影响
+    assert dict(before.descriptions) == {"happy": "开心"}
+    assert sorted(after.by_description["难过"]) == ["down", "sad"]
+    assert after.tags == {"happy", "sad", "down"}
+    assert manager.get_descriptions() is after.descriptions
+
+    assert after.etag != before.etag
+    assert manager.snapshot.etag == after.etag
+
+
+def test_etag_differs_across_restarts(memes_dir):
+    first = CategoryManager(save_delay=60).snapshot
+    second = CategoryManager(save_delay=60).snapshot
+    assert first.version == second.version
+    assert first.etag != second.etag
@@ -0,0 +1,37 @@
+import pytest
+
+from meme_manager.emotion_extractor import EmotionTagExtractor
+
+
+@pytest.fixture
+def extractor():
+    return EmotionTagExtractor(["happy", "angry", "开心"], version=1)
+
+
+def test_all_bracket_styles_are_stripped(extractor):
+    text, emotions = extractor.extract("好的[happy]，别(angry)了（开心）")
+    assert text == "好的，别了"
+    assert emotions == ["happy", "angry"]  # 超出 limit 的标记也会被剔除
+
+
+def test_unknown_tags_are_kept_and_duplicates_merged(extractor):
+    text, emotions = extractor.extract("[happy] [unknown] (note) [happy]", limit=5)
+    assert text == " [unknown] (note) "
+    assert emotions == ["happy"]
+
+
+def test_nested_markers_match_the_inner_tag(extractor):
+    text, emotions = extractor.extract("([happy])")
+    assert (text, emotions) == ("()", ["happy"])
+
+
+def test_no_tags_or_empty_tag_set():
+    assert EmotionTagExtractor().extract("[happy]") == ("[happy]", [])
+    extractor = EmotionTagExtractor(["happy"])
+    assert extractor.extract("纯文本") == ("纯文本", [])
+
+
+def test_update_replaces_tags(extractor):
+    extractor.update(["sad"], version=2)
+    assert extractor.version == 2
+    assert extractor.extract("[happy][sad]") == ("[happy]", ["sad"])
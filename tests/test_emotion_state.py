@@ -0,0 +1,53 @@
+import time
+
+from meme_manager.emotion_state import EmotionStateStore
+
+
+class _Event:
+    pass
+
+
+def test_events_are_isolated():
+    store = EmotionStateStore()
+    a, b = _Event(), _Event()
+    store.set(a, ["happy"])
+    store.set(b, ["angry", "sad"])
+    assert store.get(a) == ["happy"]
+    assert store.pop(b) == ["angry", "sad"]
+    assert store.get(b) == []
+    assert len(store) == 1
+
+
+def test_empty_list_clears_event():
+    store = EmotionStateStore()
+    event = _Event()
+    store.set(event, ["happy"])
+    store.set(event, [])
+    assert store.get(event) == [] and len(store) == 0
+
+
+def test_capacity_and_ttl(monkeypatch):
+    store = EmotionStateStore(max_size=2, ttl=10)
+    events = [_Event() for _ in range(3)]
+    for event in events:
+        store.set(event, ["happy"])
+    assert store.get(events[0]) == []  # 超出容量时淘汰最早的条目
+    assert store.get(events[2]) == ["happy"]
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert store.get(events[2]) == []
+    assert store.pop(events[1]) == []
+    store.set(_Event(), ["sad"])  # 写入时顺带清理过期条目
+    assert len(store) == 1
+
+
+def test_reused_id_does_not_leak_between_events():
+    store = EmotionStateStore()
+    event = _Event()
+    store.set(event, ["happy"])
+    other = _Event()
+    # 模拟另一个对象得到相同 id 的情况：条目保存了事件引用，按身份比较
+    store._entries[id(other)] = store._entries.pop(id(event))
+    assert store.get(other) == []
+    assert store.pop(other) == []
@@ -0,0 +1,160 @@
+import asyncio
+import contextlib
+
+import pytest
+from aiohttp import web
+
+from meme_manager.async_io import BlockingIO
+from meme_manager.blob_store import BlobStore
+from meme_manager.image_downloader import ImageDownloadError, ImageDownloader
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 992
+
+
+def _png(tag: int) -> bytes:
+    return PNG[:-1] + bytes([tag])
+
+
+@contextlib.asynccontextmanager
+async def _serve(routes):
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+
+@contextlib.asynccontextmanager
+async def _downloader(tmp_path, **kwargs):
+    memes = tmp_path / "memes"
+    (memes / "happy").mkdir(parents=True, exist_ok=True)
+    blocking_io = BlockingIO(2)
+    downloader = ImageDownloader(
+        blocking_io, BlobStore(str(tmp_path / "blobs"), str(memes), save_delay=60), **kwargs
+    )
+    try:
+        yield downloader, str(memes / "happy")
+    finally:
+        await downloader.close()
+        blocking_io.shutdown()
+
+
+def test_parallel_downloads_are_bounded_and_ordered(tmp_path):
+    state = {"active": 0, "peak": 0, "peers": set()}
+
+    async def image(request):
+        state["peers"].add(request.transport.get_extra_info("peername"))
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.05)
+        state["active"] -= 1
+        return web.Response(body=_png(int(request.match_info["n"])))
+
+    async def missing(request):
+        raise web.HTTPNotFound()
+
+    async def main():
+        async with _serve({"/img/{n}": image, "/missing": missing}) as base, \
+                _downloader(tmp_path, concurrency=2) as (downloader, save_dir):
+            urls = [f"{base}/img/{n}" for n in range(6)] + [f"{base}/missing"]
+            stems = [f"m{n}" for n in range(7)]
+            results = await downloader.download_all(urls, save_dir, stems)
+            # 连接池在下一条消息中复用
+            session = downloader._https_session
+            await downloader.download(f"{base}/img/9", save_dir, "again")
+            assert downloader._https_session is session
+            return results
+
+    results = asyncio.run(main())
+    assert [r.path.rsplit("/", 1)[1] for r in results[:6]] == [f"m{n}.png" for n in range(6)]
+    # 失败的下载不影响其他图片
+    assert isinstance(results[6], Exception)
+    assert state["peak"] == 2
+    # keep-alive 连接被复用，连接数不超过并发数
+    assert len(state["peers"]) <= 2
+
+
+def _streamed(data: bytes, chunk: int = 256):
+    async def handler(request):
+        # 分块传输，不带 Content-Length
+        resp = web.StreamResponse()
+        resp.enable_chunked_encoding()
+        await resp.prepare(request)
+        for i in range(0, len(data), chunk):
+            await resp.write(data[i:i + chunk])
+        await resp.write_eof()
+        return resp
+    return handler
+
+
+def _download_one(tmp_path, handler, **kwargs):
+    async def main():
+        async with _serve({"/x": handler}) as base, \
+                _downloader(tmp_path, chunk_size=256, **kwargs) as (downloader, save_dir):
+            try:
+                return await downloader.download(f"{base}/x", save_dir, "m")
+            finally:
+                leftovers = [p for p in (tmp_path / "memes" / "happy").iterdir() if p.name.startswith(".")]
+                assert not leftovers
+
+    return asyncio.run(main())
+
+
+def test_format_is_sniffed_from_content(tmp_path):
+    gif = b"GIF89a" + b"\x00" * 500
+
+    async def handler(request):
+        return web.Response(body=gif, content_type="image/png")
+
+    stored = _download_one(tmp_path, handler)
+    assert stored.path.endswith("m.gif")
+    with open(stored.path, "rb") as f:
+        assert f.read() == gif
+
+
+def test_non_image_is_rejected(tmp_path):
+    async def handler(request):
+        return web.Response(text="<html>not found</html>" * 10, content_type="image/png")
+
+    with pytest.raises(ImageDownloadError):
+        _download_one(tmp_path, handler)
+    assert not list((tmp_path / "memes" / "happy").iterdir())
+
+
+def test_size_limit_with_content_length(tmp_path):
+    async def handler(request):
+        return web.Response(body=PNG)
+
+    with pytest.raises(ImageDownloadError, match="过大"):
+        _download_one(tmp_path, handler, max_bytes=500)
+
+
+def test_size_limit_while_streaming(tmp_path):
+    with pytest.raises(ImageDownloadError, match="上限"):
+        _download_one(tmp_path, _streamed(PNG * 4), max_bytes=2000)
+    assert _download_one(tmp_path, _streamed(PNG), max_bytes=2000).path.endswith("m.png")
+
+
+def test_duplicates_do_not_consume_the_shared_budget(tmp_path):
+    async def handler(request):
+        return web.Response(body=_png(int(request.match_info["n"])))
+
+    async def main():
+        async with _serve({"/img/{n}": handler}) as base, \
+                _downloader(tmp_path, concurrency=1) as (downloader, save_dir):
+            urls = [f"{base}/img/{n}" for n in (1, 1, 1, 2, 3)]
+            return await downloader.download_all(urls, save_dir, [f"m{i}" for i in range(5)], total_bytes=2500)
+
+    results = asyncio.run(main())
+    assert not results[0].duplicate
+    assert results[1].duplicate and results[2].duplicate
+    assert not results[3].duplicate
+    # 前两份不同内容用掉 2000 字节，第三份超出额度
+    assert isinstance(results[4], ImageDownloadError)
@@ -0,0 +1,112 @@
+import os
+import json
+import threading
+
+from meme_manager import json_store, utils
+from meme_manager.json_store import DebouncedJsonStore
+from meme_manager.utils import save_json
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_updates_are_merged_into_one_write(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.json")
+    writes = []
+    monkeypatch.setattr(json_store, "save_json", lambda data, p: writes.append(dict(data)) or save_json(data, p))
+    store = DebouncedJsonStore(path, delay=60)
+    store.load()
+    for i in range(10):
+        store.update({f"k{i}": i})
+    store.update(delete=["k0"])
+    assert writes == []
+    assert os.path.exists(store.journal_path)
+
+    assert store.flush()
+    assert len(writes) == 1
+    assert _read(path) == {f"k{i}": i for i in range(1, 10)}
+    assert not os.path.exists(store.journal_path)
+    assert store.flush()  # 没有新修改时不再写入
+    assert len(writes) == 1
+
+
+def test_journal_fsync_is_grouped(tmp_path, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fd) or real_fsync(fd))
+    store = DebouncedJsonStore(str(tmp_path / "data.json"), delay=60)
+    store.load()
+    for i in range(50):
+        store.update({f"k{i}": i})
+    assert synced == []  # 变更日志只写入操作系统缓冲
+    store.flush()
+    assert 1 <= len(synced) <= 2  # 数据文件与所在目录
+
+
+def test_journal_is_replayed_after_crash(tmp_path):
+    path = str(tmp_path / "data.json")
+    store = DebouncedJsonStore(path, delay=60)
+    store.load({"keep": 1, "gone": 2})
+    store.flush()
+    store.update({"new": 3}, delete=["gone"])
+    store.update({"keep": 10})
+    # 模拟进程在窗口内被终止：不调用 flush，最后一行只写了一半
+    store._journal.write('{"set": {"partial"')
+    store._journal.flush()
+
+    recovered = DebouncedJsonStore(path, delay=60)
+    assert recovered.load() == {"keep": 10, "new": 3}
+    # 重放后立即完整写入并清空变更日志
+    assert _read(path) == {"keep": 10, "new": 3}
+    assert not os.path.exists(recovered.journal_path)
+
+
+def test_failed_write_keeps_synced_journal(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.json")
+    store = DebouncedJsonStore(path, delay=60)
+    store.load()
+    store.update({"a": 1})
+    monkeypatch.setattr(json_store, "save_json", lambda data, p: False)
+    assert not store.flush()
+    assert os.path.exists(store.journal_path)
+
+    monkeypatch.undo()
+    assert DebouncedJsonStore(path).load() == {"a": 1}
+
+
+def test_timer_flushes_after_delay(tmp_path):
+    path = str(tmp_path / "data.json")
+    store = DebouncedJsonStore(path, delay=0.05)
+    store.load()
+    store.update({"a": 1})
+    store._timer.join(2)
+    assert _read(path) == {"a": 1}
+
+
+def test_save_json_concurrent_writers(tmp_path):
+    path = str(tmp_path / "data.json")
+    errors = []
+
+    def writer(n):
+        for i in range(20):
+            if not save_json({"writer": n, "i": i, "pad": "x" * 10000}, path):
+                errors.append(n)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert _read(path)["i"] == 19
+    assert os.listdir(tmp_path) == ["data.json"]  # 没有残留的临时文件
+
+
+def test_save_json_keeps_permissions(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("{}")
+    os.chmod(path, 0o640)
+    assert utils.save_json({"a": 1}, str(path))
+    assert os.stat(path).st_mode & 0o777 == 0o640
@@ -0,0 +1,64 @@
+import os
+
+from meme_manager.meme_cache import MemeCache
+
+
+def _write(path, size, fill=b"x"):
+    path.write_bytes(fill * size)
+    return str(path)
+
+
+def test_hits_and_replacement(tmp_path):
+    cache = MemeCache(max_bytes=1 << 20)
+    path = _write(tmp_path / "a.png", 1000)
+    assert cache.get(path).data == b"x" * 1000
+    assert cache.get(path).base64
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # 替换文件后旧版本被移除，只保留新版本
+    tmp = tmp_path / "a.tmp"
+    _write(tmp, 2000, b"y")
+    os.replace(tmp, path)
+    assert cache.get(path).data == b"y" * 2000
+    assert cache.stats()["entries"] == 1
+
+
+def test_eviction_prunes_path_map(tmp_path):
+    item = 1000 * 7 // 3
+    cache = MemeCache(max_bytes=item * 3, max_item_bytes=10_000)
+    paths = [_write(tmp_path / f"{i}.png", 1000, bytes([65 + i])) for i in range(20)]
+    for path in paths:
+        cache.get(path)
+    assert cache.stats()["entries"] == 3
+    assert set(cache._paths) == set(paths[-3:])
+    assert len(cache._key_paths) == 3
+
+
+def test_hardlinks_share_an_entry(tmp_path):
+    cache = MemeCache(max_bytes=1 << 20)
+    a = _write(tmp_path / "a.png", 1000)
+    b = str(tmp_path / "b.png")
+    os.link(a, b)
+    first = cache.get(a)
+    assert cache.get(b) is first
+    assert cache.stats()["entries"] == 1
+
+    # 其中一个路径换成新内容时，另一个路径仍然命中共享条目
+    tmp = tmp_path / "a.tmp"
+    _write(tmp, 500, b"z")
+    os.replace(tmp, a)
+    cache.get(a)
+    assert cache.get(b) is first
+
+    cache.invalidate(b)
+    assert b not in cache._paths
+    assert cache.stats()["entries"] == 1
+    cache.invalidate()
+    assert cache.stats()["bytes"] == 0 and not cache._paths and not cache._key_paths
+
+
+def test_large_files_are_not_cached(tmp_path):
+    cache = MemeCache(max_bytes=10_000)
+    path = _write(tmp_path / "big.png", 5000)
+    assert len(cache.get(path).data) == 5000
+    assert cache.stats()["entries"] == 0 and not cache._paths
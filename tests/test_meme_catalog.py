@@ -0,0 +1,128 @@
+import hashlib
+import os
+
+from PIL import Image
+
+from meme_manager.meme_catalog import MemeCatalog
+
+
+def _image(path, size=(4, 3), color="red"):
+    Image.new("RGB", size, color).save(path)
+    return str(path)
+
+
+def _bump_mtime(path):
+    # 文件系统时间戳精度有限，显式推进目录 mtime 模拟外部修改
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def _catalog(tmp_path):
+    memes = tmp_path / "memes"
+    (memes / "happy").mkdir(parents=True)
+    return MemeCatalog(str(tmp_path / "data" / "catalog.db"), str(memes)), memes
+
+
+def test_reconcile_indexes_new_files_and_metadata(tmp_path):
+    catalog, memes = _catalog(tmp_path)
+    path = _image(memes / "happy" / "a.png", (5, 7))
+    (memes / "happy" / "notes.txt").write_text("ignored")
+
+    assert catalog.reconcile() == 1
+    assert catalog.list_categories() == ["happy"]
+    (record,) = catalog.list_files()
+    assert record["path"] == "happy/a.png"
+    assert (record["format"], record["width"], record["height"]) == ("png", 5, 7)
+    with open(path, "rb") as f:
+        assert record["sha256"] == hashlib.sha256(f.read()).hexdigest()
+
+    # 目录未变化时不重新扫描
+    version = catalog.version
+    assert catalog.reconcile() == 0
+    assert catalog.version == version
+
+
+def test_reconcile_picks_up_external_changes(tmp_path):
+    catalog, memes = _catalog(tmp_path)
+    _image(memes / "happy" / "a.png")
+    _image(memes / "happy" / "b.png")
+    catalog.reconcile()
+
+    os.remove(memes / "happy" / "a.png")
+    _image(memes / "happy" / "c.gif")
+    _bump_mtime(memes / "happy")
+    assert catalog.reconcile() == 2
+    assert catalog.list_category("happy") == ["b.png", "c.gif"]
+
+    # 类别目录被外部删除
+    for name in os.listdir(memes / "happy"):
+        os.remove(memes / "happy" / name)
+    os.rmdir(memes / "happy")
+    catalog.reconcile()
+    assert catalog.list_categories() == []
+    assert catalog.list_files() == []
+
+
+def test_is_reconciled_tracks_directory_mtime(tmp_path):
+    catalog, memes = _catalog(tmp_path)
+    assert not catalog.is_reconciled("happy", os.stat(memes / "happy").st_mtime_ns)
+    catalog.reconcile()
+    assert catalog.is_reconciled("happy", os.stat(memes / "happy").st_mtime_ns)
+    _bump_mtime(memes / "happy")
+    assert not catalog.is_reconciled("happy", os.stat(memes / "happy").st_mtime_ns)
+
+
+def test_write_paths_update_catalog(tmp_path):
+    catalog, memes = _catalog(tmp_path)
+    catalog.reconcile()
+    version = catalog.version
+
+    path = _image(memes / "happy" / "a.png")
+    catalog.upsert_file(path)
+    assert catalog.list_category("happy") == ["a.png"]
+    assert catalog.version > version
+
+    catalog.increment_send_count(path)
+    assert catalog.list_files()[0]["send_count"] == 1
+
+    os.rename(memes / "happy", memes / "joy")
+    catalog.rename_category("happy", "joy")
+    assert catalog.list_all() == {"joy": ["a.png"]}
+    assert catalog.list_files()[0]["path"] == "joy/a.png"
+
+    catalog.remove_file("joy", "a.png")
+    assert catalog.count_by_category() == {"joy": 0}
+    catalog.remove_category("joy")
+    assert catalog.list_categories() == []
+
+
+def test_pagination_and_extension_filter(tmp_path):
+    catalog, memes = _catalog(tmp_path)
+    for i in range(5):
+        _image(memes / "happy" / f"{i}.png", color=(i, 0, 0))
+    _image(memes / "happy" / "5.webp")
+    catalog.reconcile()
+
+    first = catalog.list_category_page("happy", limit=2)
+    assert [name for name, _ in first] == ["0.png", "1.png"]
+    assert all(digest for _, digest in first)
+    rest = catalog.list_category_page("happy", after=first[-1][0], limit=10)
+    assert [name for name, _ in rest] == ["2.png", "3.png", "4.png", "5.webp"]
+
+    no_webp = (".jpg", ".jpeg", ".png", ".gif")
+    assert catalog.count_by_category(no_webp) == {"happy": 5}
+    assert catalog.count_by_category() == {"happy": 6}
+    assert "5.webp" not in catalog.list_category("happy", no_webp)
+
+
+def test_content_hash_falls_back_for_stale_records(tmp_path):
+    catalog, memes = _catalog(tmp_path)
+    path = _image(memes / "happy" / "a.png")
+    catalog.reconcile()
+    assert catalog.content_hash("happy", "a.png", os.stat(path)) == catalog.list_files()[0]["sha256"]
+
+    # 对账前被外部替换，记录已过期，现场计算
+    _image(path, (9, 9), "blue")
+    with open(path, "rb") as f:
+        expected = hashlib.sha256(f.read()).hexdigest()
+    assert catalog.content_hash("happy", "a.png", os.stat(path)) == expected
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from meme_manager.meme_dispatcher import MemeDispatcher
+
+
+class _Sender:
+    def __init__(self, fail=(), delay=0.0):
+        self.fail = set(fail)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, origin, components):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail & set(components):
+                raise RuntimeError("send failed")
+            self.calls.append((origin, list(components)))
+        finally:
+            self.active -= 1
+
+
+def test_merge_sends_one_message():
+    sender = _Sender()
+    dispatcher = MemeDispatcher(sender, mode="merge")
+    assert asyncio.run(dispatcher.dispatch("o", ["a", "b", "c"])) == 3
+    assert sender.calls == [("o", ["a", "b", "c"])]
+
+
+@pytest.mark.parametrize("mode", ["concurrent", "sequential"])
+def test_failures_do_not_stop_other_memes(mode):
+    sender = _Sender(fail={"b"})
+    dispatcher = MemeDispatcher(sender, mode=mode)
+    assert asyncio.run(dispatcher.dispatch("o", ["a", "b", "c"])) == 2
+    assert sorted(c[1][0] for c in sender.calls) == ["a", "c"]
+
+
+def test_sequential_preserves_order():
+    sender = _Sender()
+    dispatcher = MemeDispatcher(sender, mode="sequential")
+    asyncio.run(dispatcher.dispatch("o", ["a", "b", "c"]))
+    assert [c[1][0] for c in sender.calls] == ["a", "b", "c"]
+    assert sender.peak == 1
+
+
+def test_concurrency_is_limited_per_origin():
+    sender = _Sender(delay=0.01)
+    dispatcher = MemeDispatcher(sender, mode="concurrent", per_origin_limit=2)
+
+    async def main():
+        await asyncio.gather(
+            dispatcher.dispatch("o", list("abcdef")),
+            dispatcher.dispatch("p", list("gh")),
+        )
+
+    asyncio.run(main())
+    assert len(sender.calls) == 8
+    assert sender.peak == 4  # 两个会话各 2 个
+
+
+def test_empty_unknown_mode_and_origin_eviction():
+    sender = _Sender()
+    dispatcher = MemeDispatcher(sender, mode="bogus", max_origins=2)
+    assert dispatcher.mode == "concurrent"
+
+    async def main():
+        assert await dispatcher.dispatch("o", []) == 0
+        for origin in ("o1", "o2", "o3"):
+            await dispatcher.dispatch(origin, ["a"])
+
+    asyncio.run(main())
+    assert list(dispatcher._semaphores) == ["o2", "o3"]
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from meme_manager.meme_catalog import MemeCatalog
+from meme_manager.meme_index import MemeIndex
+
+
+@pytest.fixture
+def memes_dir(tmp_path):
+    root = tmp_path / "memes"
+    for category, files in {"cats": ["a.png", "b.gif", "notes.txt"], "dogs": ["c.jpg"]}.items():
+        (root / category).mkdir(parents=True)
+        for name in files:
+            (root / category / name).write_bytes(b"x")
+    return root
+
+
+def _touch_dir(path):
+    """确保目录 mtime 变化（部分文件系统的时间精度较低）"""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_build_lists_memes(memes_dir):
+    index = MemeIndex(str(memes_dir))
+    index.build()
+    assert sorted(index.get_memes("cats")) == ["a.png", "b.gif"]
+    assert index.get_memes("dogs") == ("c.jpg",)
+    assert index.get_memes("missing") == ()
+
+
+def test_hooks_update_without_rescan(memes_dir):
+    index = MemeIndex(str(memes_dir), check_interval=3600)
+    index.build(["cats"])
+    index.add("cats", "new.jpeg")
+    index.add("cats", "new.jpeg")
+    index.add("cats", "readme.md")
+    index.remove("cats", "a.png")
+    assert sorted(index.get_memes("cats")) == ["b.gif", "new.jpeg"]
+    # 未构建的类别在 add 时从磁盘加载
+    index.add("dogs", "c.jpg")
+    assert index.get_memes("dogs") == ("c.jpg",)
+
+
+def test_external_changes_detected_after_interval(memes_dir):
+    index = MemeIndex(str(memes_dir), check_interval=3600)
+    index.build()
+    (memes_dir / "cats" / "d.png").write_bytes(b"x")
+    _touch_dir(memes_dir / "cats")
+    # 校验间隔内直接使用内存中的列表
+    assert "d.png" not in index.get_memes("cats")
+
+    index.check_interval = 0
+    assert "d.png" in index.get_memes("cats")
+
+
+def test_invalidate_and_deleted_category(memes_dir):
+    index = MemeIndex(str(memes_dir), check_interval=3600)
+    index.build()
+    (memes_dir / "dogs" / "e.png").write_bytes(b"x")
+    index.invalidate("dogs")
+    assert sorted(index.get_memes("dogs")) == ["c.jpg", "e.png"]
+
+    for name in os.listdir(memes_dir / "dogs"):
+        os.remove(memes_dir / "dogs" / name)
+    os.rmdir(memes_dir / "dogs")
+    index.check_interval = 0
+    assert index.get_memes("dogs") == ()
+
+    index.invalidate()
+    assert sorted(index.get_memes("cats")) == ["a.png", "b.gif"]
+
+
+def test_catalog_reconciles_in_background(memes_dir, tmp_path):
+    catalog = MemeCatalog(str(tmp_path / "catalog.db"), str(memes_dir))
+    index = MemeIndex(str(memes_dir), catalog=catalog)
+    index.build()
+    # 未对账时直接列举文件夹，对账在后台线程中进行
+    assert sorted(index.get_memes("cats")) == ["a.png", "b.gif"]
+    thread = index._reconcile_thread
+    if thread is not None:
+        thread.join(10)
+    mtime_ns = os.stat(memes_dir / "cats").st_mtime_ns
+    assert catalog.is_reconciled("cats", mtime_ns)
+
+    # 对账后从目录读取
+    index.invalidate("cats")
+    assert sorted(index.get_memes("cats")) == ["a.png", "b.gif"]
+    assert index._reconcile_thread is None
@@ -0,0 +1,83 @@
+import os
+import random
+from collections import Counter
+
+import pytest
+
+from meme_manager.meme_selector import AliasTable, MemeSelector
+
+
+class _Index:
+    def __init__(self, memes_dir, memes):
+        self.memes_dir = memes_dir
+        self.memes = memes
+
+    def get_memes(self, category):
+        return self.memes.get(category, ())
+
+
+def test_alias_table_matches_weights():
+    weights = [1.0, 2.0, 3.0, 0.5, 3.5]
+    table = AliasTable(weights)
+    rng = random.Random(0)
+    draws = 200_000
+    counts = Counter(table.sample(rng) for _ in range(draws))
+    total = sum(weights)
+    for i, w in enumerate(weights):
+        assert counts[i] / draws == pytest.approx(w / total, abs=0.01)
+
+
+def test_alias_table_single_and_tiny_weights():
+    assert AliasTable([5.0]).sample(random.Random(0)) == 0
+    table = AliasTable([1e-9, 1.0])
+    rng = random.Random(1)
+    assert sum(table.sample(rng) for _ in range(10_000)) > 9_990
+
+
+@pytest.fixture
+def selector(tmp_path):
+    files = tuple(f"{i}.png" for i in range(6))
+    index = _Index(str(tmp_path), {"cats": files})
+    return MemeSelector(index, history_size=5, rng=random.Random(42)), index
+
+
+def test_pick_avoids_recent_in_chat(selector):
+    selector, _ = selector
+    picks = [os.path.basename(selector.pick("cats", "chat")) for _ in range(300)]
+    for i in range(5, len(picks)):
+        assert picks[i] not in picks[i - 5:i]
+
+
+def test_pick_falls_back_when_blocked_files_dominate(selector):
+    selector, _ = selector
+    # 一个文件占了几乎全部权重，重试仍会抽中它，需要走均匀抽取
+    selector.weights = {"cats": {"0.png": 1e9}}
+    picks = [os.path.basename(selector.pick("cats", "chat")) for _ in range(60)]
+    for a, b in zip(picks, picks[1:]):
+        assert a != b
+    assert picks.count("0.png") >= 8
+
+
+def test_pick_without_chat_and_single_file(selector):
+    selector, index = selector
+    assert selector.pick("cats") is not None
+    index.memes["solo"] = ("only.png",)
+    assert os.path.basename(selector.pick("solo", "chat")) == "only.png"
+    assert os.path.basename(selector.pick("solo", "chat")) == "only.png"
+
+
+def test_empty_category_drops_table(selector):
+    selector, index = selector
+    selector.pick("cats", "chat")
+    assert "cats" in selector._tables
+    index.memes["cats"] = ()
+    assert selector.pick("cats", "chat") is None
+    assert "cats" not in selector._tables
+
+
+def test_chat_history_is_bounded(selector):
+    selector, _ = selector
+    selector.max_chats = 3
+    for i in range(10):
+        selector.pick("cats", f"chat{i}")
+    assert list(selector._history) == ["chat7", "chat8", "chat9"]
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+from PIL import Image
+
+from meme_manager.meme_variants import MemeVariants
+from meme_manager.thumbnails import ThumbnailCache
+
+
+def _write_image(path, color, size=1200):
+    Image.new("RGB", (size, size), color).save(path, "PNG")
+
+
+@pytest.fixture
+def library(tmp_path):
+    memes_dir = tmp_path / "memes"
+    (memes_dir / "cats").mkdir(parents=True)
+    blob = tmp_path / "blob.png"
+    _write_image(blob, "blue")
+    # 内容存储中的文件比派生文件更早
+    os.utime(blob, ns=(1_000_000_000, 1_000_000_000))
+    return memes_dir, blob
+
+
+def _replace_with_link(blob, path):
+    tmp = f"{path}.tmp"
+    os.link(blob, tmp)
+    os.replace(tmp, path)
+
+
+def test_variant_is_smaller_and_chosen(library, tmp_path):
+    memes_dir, _ = library
+    src = memes_dir / "cats" / "a.png"
+    _write_image(src, "red")
+    variants = MemeVariants(str(memes_dir), str(tmp_path / "variants"), max_side=64)
+
+    dst = variants.generate(str(src))
+    assert dst is not None and os.path.getsize(dst) < os.path.getsize(src)
+    assert variants.best_path(str(src)) == dst
+    # 已有最新版本时不重新生成
+    assert variants.generate(str(src)) == dst
+
+
+def test_hardlinked_replacement_invalidates_variant(library, tmp_path):
+    memes_dir, blob = library
+    src = memes_dir / "cats" / "a.png"
+    _write_image(src, "red")
+    variants = MemeVariants(str(memes_dir), str(tmp_path / "variants"), max_side=64)
+    old = variants.generate(str(src))
+    assert variants.best_path(str(src)) == old
+
+    # 替换为 mtime 更早的硬链接内容，旧版本不能再被使用
+    _replace_with_link(blob, src)
+    assert variants.best_path(str(src)) == str(src)
+
+    new = variants.generate(str(src))
+    assert new is not None and new != old
+    assert not os.path.exists(old)
+    with Image.open(new) as img:
+        assert img.getpixel((0, 0))[:3] == (0, 0, 255)
+    assert variants.best_path(str(src)) == new
+
+
+def test_discard_removes_all_versions(library, tmp_path):
+    memes_dir, _ = library
+    src = memes_dir / "cats" / "a.png"
+    _write_image(src, "red")
+    variants_dir = tmp_path / "variants"
+    variants = MemeVariants(str(memes_dir), str(variants_dir), max_side=64)
+    variants.generate(str(src))
+    legacy = variants_dir / "cats" / "a.png.png"  # 旧命名方式
+    legacy.write_bytes(b"x")
+    other = variants_dir / "cats" / "ab.png.png"
+    other.write_bytes(b"x")
+
+    variants.discard(str(src))
+    assert sorted(os.listdir(variants_dir / "cats")) == ["ab.png.png"]
+    assert variants.best_path(str(src)) == str(src)
+
+
+def test_thumbnail_follows_hardlinked_replacement(library, tmp_path):
+    memes_dir, blob = library
+    src = memes_dir / "cats" / "a.png"
+    _write_image(src, "red")
+    thumbs = ThumbnailCache(str(memes_dir), str(tmp_path / "thumbs"), size=32)
+    old = thumbs.get("cats", "a.png")
+
+    _replace_with_link(blob, src)
+    new = thumbs.get("cats", "a.png")
+    assert new != old
+    assert not os.path.exists(old)
+    with Image.open(new) as img:
+        assert img.getpixel((0, 0))[2] > 200
+
+
+def test_backfill_generates_missing_variants(library, tmp_path):
+    memes_dir, _ = library
+    for name, color in (("a.png", "red"), ("b.png", "green")):
+        _write_image(memes_dir / "cats" / name, color)
+    (memes_dir / "cats" / "notes.txt").write_text("x")
+    (memes_dir / "dogs").mkdir()
+    _write_image(memes_dir / "dogs" / "c.png", "white", size=16)  # 已经足够小，不生成版本
+    variants = MemeVariants(str(memes_dir), str(tmp_path / "variants"), max_side=64)
+
+    assert variants.backfill() == 3
+    assert variants.best_path(str(memes_dir / "cats" / "a.png")) != str(memes_dir / "cats" / "a.png")
+    assert variants.best_path(str(memes_dir / "dogs" / "c.png")) == str(memes_dir / "dogs" / "c.png")
+
+
+def test_disabled_variants_use_originals(library, tmp_path):
+    memes_dir, _ = library
+    src = memes_dir / "cats" / "a.png"
+    _write_image(src, "red")
+    variants = MemeVariants(str(memes_dir), str(tmp_path / "variants"), enabled=False)
+    assert variants.generate(str(src)) is None
+    assert variants.best_path(str(src)) == str(src)
+    variants.start_backfill()
+    assert variants._backfill_thread is None
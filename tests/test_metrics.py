@@ -0,0 +1,116 @@
+import multiprocessing
+
+import pytest
+
+from meme_manager.metrics import REGISTRY, STARDOTS_REQUESTS, Registry, merge_snapshots, render
+from meme_manager.image_host import img_sync
+
+
+def _values(registry):
+    return {
+        (name, suffix, tuple(sorted(labels.items()))): value
+        for name, _, _, samples in registry.snapshot()
+        for suffix, labels, value in samples
+    }
+
+
+def test_render_counter_and_histogram():
+    registry = Registry()
+    registry.counter("requests_total", "请求次数", ("status",)).labels("200").inc(3)
+    hist = registry.histogram("latency_seconds", "耗时", buckets=(0.1, 1.0))
+    hist.observe(0.05)
+    hist.observe(0.5)
+
+    text = render(merge_snapshots({"bot": registry.snapshot()}))
+    assert 'requests_total{process="bot",status="200"} 3' in text
+    assert 'latency_seconds_bucket{process="bot",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{process="bot",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{process="bot"} 2' in text
+
+
+def test_dump_merge_accumulates():
+    child, parent = Registry(), Registry()
+    for registry in (child, parent):
+        registry.counter("requests_total", "请求次数", ("status",))
+        registry.histogram("latency_seconds", "耗时", buckets=(0.1, 1.0))
+    parent.counter("only_parent", "")  # 另一方没有的指标不受影响
+
+    child._metrics["requests_total"].labels("200").inc(2)
+    child._metrics["latency_seconds"].observe(0.5)
+    parent._metrics["requests_total"].labels("200").inc(1)
+    parent._metrics["latency_seconds"].observe(2.0)
+
+    parent.merge(child.dump())
+    parent.merge({"unknown_metric": [((), 1.0)]})
+    values = _values(parent)
+    assert values[("requests_total", "", (("status", "200"),))] == 3
+    assert values[("latency_seconds", "_count", ())] == 2
+    assert values[("latency_seconds", "_sum", ())] == pytest.approx(2.5)
+    assert values[("latency_seconds", "_bucket", (("le", "1"),))] == 1
+
+
+def test_merge_rejects_mismatched_buckets():
+    a, b = Registry(), Registry()
+    a.histogram("latency_seconds", "", buckets=(0.1,)).observe(0.05)
+    b.histogram("latency_seconds", "", buckets=(0.1, 1.0))
+    b.merge(a.dump())  # 记录警告，不抛出
+    assert _values(b).get(("latency_seconds", "_count", ()), 0) == 0
+
+
+def test_reset_clears_values_but_keeps_metrics():
+    registry = Registry()
+    counter = registry.counter("requests_total", "")
+    counter.inc(5)
+    registry.reset()
+    assert registry.dump() == {"requests_total": []}
+    counter.inc()
+    assert registry.dump() == {"requests_total": [((), 1.0)]}
+
+
+class _FakeSyncManager:
+    def sync_to_remote(self):
+        STARDOTS_REQUESTS.labels("upload", "200").inc()
+        return True
+
+
+class _FakeImageSync:
+    def __init__(self, config, local_dir, catalog=None):
+        self.sync_manager = _FakeSyncManager()
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork", reason="依赖 fork 继承测试中替换的 ImageSync"
+)
+def test_sync_process_metrics_are_merged_into_parent(monkeypatch, tmp_path):
+    monkeypatch.setattr(img_sync, "ImageSync", _FakeImageSync)
+    child = STARDOTS_REQUESTS.labels("upload", "200")
+    before = child.value
+    child.inc(10)  # 子进程继承的数值不应再被加回来
+
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=img_sync.run_sync_process, args=({}, str(tmp_path), "upload", None, sender)
+    )
+    process.start()
+    sender.close()
+    img_sync._wait_sync_process(process, receiver)
+
+    assert process.exitcode == 0
+    assert STARDOTS_REQUESTS.labels("upload", "200").value == before + 10 + 1
+
+
+def test_wait_returns_when_child_dies_without_metrics():
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_exit_hard)
+    process.start()
+    sender.close()
+    before = REGISTRY.dump()
+    img_sync._wait_sync_process(process, receiver)
+    assert process.exitcode == 3
+    assert REGISTRY.dump() == before
+
+
+def _exit_hard():
+    import os
+
+    os._exit(3)
@@ -0,0 +1,78 @@
+import json
+import random
+
+from meme_manager.near_duplicates import MultiIndexHash, NearDuplicateIndex, hamming
+
+
+def _random_hashes(count, seed):
+    rng = random.Random(seed)
+    values = {f"c/{i}.png": rng.getrandbits(64) for i in range(count)}
+    # 每 20 张加入一张翻转 1~6 位的近似图片
+    for i in range(0, count, 20):
+        value = values[f"c/{i}.png"]
+        for bit in rng.sample(range(64), rng.randint(1, 6)):
+            value ^= 1 << bit
+        values[f"c/{i}_dup.png"] = value
+    return values
+
+
+def test_query_matches_brute_force():
+    values = _random_hashes(3000, seed=1)
+    index = MultiIndexHash.build(values)
+    rng = random.Random(2)
+    for item in rng.sample(sorted(values), 200):
+        for radius in (0, 3, 6, 10):
+            expected = {
+                (hamming(values[item], value), other)
+                for other, value in values.items()
+                if hamming(values[item], value) <= radius
+            }
+            assert set(index.query(values[item], radius)) == expected
+
+
+def test_add_replace_and_remove():
+    index = MultiIndexHash(radius=6)
+    index.add(0b1011, "a")
+    index.add(0b1010, "b")
+    assert sorted(index.query(0b1011, 1)) == [(0, "a"), (1, "b")]
+
+    index.add(0xFFFF << 40, "b")  # 同一条目再次加入时替换旧值
+    assert index.query(0b1011, 1) == [(0, "a")]
+    assert len(index) == 2
+
+    index.remove("a")
+    index.remove("missing")
+    assert index.query(0b1011, 6) == []
+    assert len(index) == 1
+
+
+def test_query_cost_is_sublinear():
+    """库大小扩大 4 倍时，单次查询枚举的子串与比较的候选总数应基本不变"""
+
+    def cost_per_query(count):
+        values = _random_hashes(count, seed=count)
+        index = MultiIndexHash.build(values)
+        index.probes = index.comparisons = 0
+        for value in values.values():
+            index.query(value, 6)
+        return (index.probes + index.comparisons) / len(values)
+
+    small, large = cost_per_query(4000), cost_per_query(16000)
+    assert large < small * 1.5
+
+
+def test_report_groups_near_duplicates(tmp_path):
+    values = _random_hashes(2000, seed=3)
+    index_path = tmp_path / "phash.json"
+    index_path.write_text(
+        json.dumps({p: [0, 0, format(v, "016x")] for p, v in values.items()}), encoding="utf-8"
+    )
+    duplicates = NearDuplicateIndex(str(tmp_path), str(index_path), distance=6)
+
+    report = duplicates.find_duplicates()
+    groups = {frozenset(entry["path"] for entry in group) for group in report}
+    for i in range(0, 2000, 20):
+        assert frozenset({f"c/{i}.png", f"c/{i}_dup.png"}) in groups
+    assert all(len(group) >= 2 for group in groups)
+    # 索引未变化时直接复用上次的结果
+    assert duplicates.find_duplicates() is report
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import pstats
+import time
+
+import pytest
+
+from meme_manager.profiling import ProfileRecorder, profiled
+
+
+def _files(directory, suffix):
+    return sorted(p for p in os.listdir(directory) if p.endswith(suffix))
+
+
+def _functions(directory, path):
+    return {func for _, _, func in pstats.Stats(os.path.join(directory, path)).stats}
+
+
+def test_off_mode_writes_nothing(tmp_path):
+    recorder = ProfileRecorder(str(tmp_path / "profiles"))
+
+    @profiled(recorder=recorder)
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3
+    assert not (tmp_path / "profiles").exists()
+    with pytest.raises(ValueError):
+        recorder.set_mode("perf")
+
+
+def test_cprofile_sync_and_nested_calls(tmp_path):
+    recorder = ProfileRecorder(str(tmp_path), mode="cprofile")
+
+    @profiled("inner", recorder=recorder)
+    def inner():
+        return sum(range(100))
+
+    @profiled("outer", recorder=recorder)
+    def outer():
+        return inner()
+
+    assert outer() == 4950
+    # 嵌套调用计入外层调用，不单独输出
+    (stats,) = _files(tmp_path, ".pstats")
+    assert stats.endswith("_outer.pstats")
+    assert "inner" in _functions(tmp_path, stats)
+    (report,) = _files(tmp_path, ".txt")
+    assert (tmp_path / report).read_text(encoding="utf-8").startswith("# outer")
+
+
+def test_concurrent_coroutines_are_profiled_separately(tmp_path):
+    recorder = ProfileRecorder(str(tmp_path), mode="cprofile")
+
+    def only_in_a():
+        return 1
+
+    def only_in_b():
+        return 2
+
+    @profiled("task_a", recorder=recorder)
+    async def task_a():
+        for _ in range(3):
+            only_in_a()
+            await asyncio.sleep(0.01)
+
+    @profiled("task_b", recorder=recorder)
+    async def task_b():
+        for _ in range(3):
+            only_in_b()
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(task_a(), task_b())
+
+    asyncio.run(main())
+    a, b = _files(tmp_path, ".pstats")
+    if "task_b" in a:
+        a, b = b, a
+    assert "only_in_a" in _functions(tmp_path, a) and "only_in_b" not in _functions(tmp_path, a)
+    assert "only_in_b" in _functions(tmp_path, b) and "only_in_a" not in _functions(tmp_path, b)
+
+
+def test_coroutine_errors_propagate(tmp_path):
+    recorder = ProfileRecorder(str(tmp_path), mode="cprofile")
+
+    @profiled(recorder=recorder)
+    async def fail():
+        await asyncio.sleep(0)
+        raise KeyError("missing")
+
+    with pytest.raises(KeyError):
+        asyncio.run(fail())
+    assert len(_files(tmp_path, ".txt")) == 1
+
+
+def test_async_generator(tmp_path):
+    recorder = ProfileRecorder(str(tmp_path), mode="cprofile")
+
+    @profiled("gen", recorder=recorder)
+    async def gen():
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield i
+
+    async def main():
+        return [item async for item in gen()]
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert len(_files(tmp_path, ".pstats")) == 1
+
+
+def test_sampling_mode_writes_collapsed_stacks(tmp_path):
+    recorder = ProfileRecorder(str(tmp_path), mode="sampling", interval=0.001)
+
+    def busy_loop():
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            pass
+
+    @profiled("sampled", recorder=recorder)
+    def run():
+        busy_loop()
+
+    run()
+    (collapsed,) = _files(tmp_path, ".collapsed")
+    lines = (tmp_path / collapsed).read_text(encoding="utf-8").splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy_loop" in line for line in lines)
+
+
+def test_rotation_keeps_recent_calls(tmp_path):
+    recorder = ProfileRecorder(str(tmp_path), mode="cprofile", max_files=3)
+    for i in range(5):
+        profiled(f"call{i}", recorder=recorder)(lambda: None)()
+    reports = _files(tmp_path, ".txt")
+    assert len(reports) == 3
+    assert len(_files(tmp_path, ".pstats")) == 3
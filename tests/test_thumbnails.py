@@ -0,0 +1,90 @@
+import os
+import threading
+
+from PIL import Image
+
+from meme_manager.thumbnails import ThumbnailCache
+
+
+def _cache(tmp_path):
+    memes = tmp_path / "memes"
+    (memes / "happy").mkdir(parents=True)
+    return ThumbnailCache(str(memes), str(tmp_path / "thumbs"), size=32), memes
+
+
+def test_generates_bounded_webp_once(tmp_path):
+    cache, memes = _cache(tmp_path)
+    Image.new("RGB", (200, 100), "red").save(memes / "happy" / "a.jpg")
+
+    path = cache.get("happy", "a.jpg")
+    with Image.open(path) as thumb:
+        assert thumb.format == "WEBP"
+        assert thumb.size == (32, 16)
+    mtime = os.stat(path).st_mtime_ns
+    assert cache.get("happy", "a.jpg") == path
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_gif_uses_first_frame(tmp_path):
+    cache, memes = _cache(tmp_path)
+    frames = [Image.new("RGB", (40, 40), color) for color in ("blue", "green")]
+    frames[0].save(memes / "happy" / "a.gif", save_all=True, append_images=frames[1:])
+    with Image.open(cache.get("happy", "a.gif")) as thumb:
+        r, g, b = thumb.convert("RGB").getpixel((16, 16))
+        assert b > 200 and g < 50
+
+
+def test_replaced_source_gets_new_thumbnail(tmp_path):
+    cache, memes = _cache(tmp_path)
+    src = memes / "happy" / "a.png"
+    Image.new("RGB", (64, 64), "red").save(src)
+    old = cache.get("happy", "a.png")
+
+    tmp = memes / "happy" / "a.tmp"
+    Image.new("RGB", (64, 32), "blue").save(tmp, "PNG")
+    os.replace(tmp, src)
+    new = cache.get("happy", "a.png")
+    assert new != old
+    assert not os.path.exists(old)
+    # 前缀相同的其他表情包不受清理影响
+    Image.new("RGB", (8, 8)).save(memes / "happy" / "a.png.png")
+    other = cache.get("happy", "a.png.png")
+    cache.get("happy", "a.png")
+    assert os.path.exists(other)
+
+
+def test_missing_or_undecodable_sources(tmp_path):
+    cache, memes = _cache(tmp_path)
+    assert cache.get("happy", "missing.png") is None
+    assert cache.get("happy", "notes.txt") is None
+    (memes / "happy" / "broken.png").write_bytes(b"not an image")
+    assert cache.get("happy", "broken.png") is None
+    assert not [p for p in os.listdir(tmp_path / "thumbs" / "happy") if p.endswith(".tmp")]
+
+
+def test_concurrent_requests_generate_once(tmp_path, monkeypatch):
+    cache, memes = _cache(tmp_path)
+    Image.new("RGB", (64, 64)).save(memes / "happy" / "a.png")
+    calls = []
+    generate = cache._generate
+    monkeypatch.setattr(cache, "_generate", lambda *a: calls.append(a) or generate(*a))
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("happy", "a.png"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(results)) == 1 and results[0]
+    assert len(calls) == 1
+
+
+def test_discard(tmp_path):
+    cache, memes = _cache(tmp_path)
+    Image.new("RGB", (8, 8)).save(memes / "happy" / "a.png")
+    Image.new("RGB", (8, 8)).save(memes / "happy" / "b.png")
+    a, b = cache.get("happy", "a.png"), cache.get("happy", "b.png")
+    cache.discard("happy", "a.png")
+    assert not os.path.exists(a) and os.path.exists(b)
+    cache.discard("happy")
+    assert not os.path.exists(os.path.dirname(b))
@@ -0,0 +1,78 @@
+from meme_manager import upload_sessions
+from meme_manager.image_downloader import ByteBudget
+from meme_manager.upload_sessions import UploadSessionManager
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _manager(monkeypatch, **kwargs):
+    clock = _Clock()
+    monkeypatch.setattr(upload_sessions.time, "monotonic", clock)
+    return UploadSessionManager(**kwargs), clock
+
+
+def test_sessions_expire_lazily(monkeypatch):
+    manager, clock = _manager(monkeypatch, ttl=30)
+    assert not manager
+    session = manager.start("u1", "happy")
+    manager.start("u2", "sad")
+    assert manager and len(manager) == 2
+    assert manager.get("u1") is session
+
+    clock.now += 31
+    # 过期会话在访问时被清理，无需后台任务
+    assert not manager
+    assert manager.get("u1") is None
+    assert manager.counters["expired"] == 2
+
+
+def test_restarted_session_is_not_expired_by_stale_heap_entry(monkeypatch):
+    manager, clock = _manager(monkeypatch, ttl=30)
+    manager.start("u1", "happy")
+    clock.now += 20
+    second = manager.start("u1", "sad")
+    clock.now += 15
+    # 第一个会话的堆记录已过期，但不能清理覆盖它的新会话
+    assert manager.get("u1") is second
+    assert manager.counters["expired"] == 0
+    clock.now += 20
+    assert manager.get("u1") is None
+    assert manager.counters["expired"] == 1
+
+
+def test_end_counts_completion_once(monkeypatch):
+    manager, clock = _manager(monkeypatch)
+    manager.start("u1", "happy")
+    manager.end("u1")
+    manager.end("u1")
+    assert manager.counters["completed"] == 1
+    clock.now += 60
+    assert manager.sweep() == 0
+    assert manager.counters["expired"] == 0
+
+
+def test_limits(monkeypatch):
+    manager, _ = _manager(monkeypatch, max_images=3, max_bytes=1000)
+    session = manager.start("u1", "happy")
+    assert manager.record(session, 2, 100)
+    assert manager.remaining_images(session) == 1
+    assert manager.remaining_bytes(session) == 900
+    assert not manager.record(session, 0, 950)
+    assert manager.remaining_bytes(session) == 0
+    assert manager.counters["limited"] == 1
+
+
+def test_byte_budget():
+    budget = ByteBudget(100)
+    assert budget.reserve(60)
+    assert not budget.reserve(50)
+    assert budget.remaining == 40
+    budget.release(60)
+    assert budget.reserve(100)
+    assert budget.remaining == 0
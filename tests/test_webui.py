@@ -0,0 +1,122 @@
+import hashlib
+
+import pytest
+from PIL import Image
+
+from meme_manager import webui
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def flush(self):
+        self.calls.append("flush")
+        return True
+
+    def drain_in_background(self, timeout):
+        self.calls.append("drain")
+
+
+@pytest.fixture
+def shutdown_env(monkeypatch):
+    recorder = _Recorder()
+    monkeypatch.setattr(webui, "SHUTDOWN_TOKEN", "secret-token")
+    monkeypatch.setattr(webui, "HTTP_SERVER", recorder)
+    monkeypatch.setitem(webui.app.config, "PLUGIN_CONFIG", {"category_manager": recorder})
+    monkeypatch.setattr(webui.app, "secret_key", "test")
+    return recorder
+
+
+@pytest.mark.parametrize("headers", [{}, {webui.SHUTDOWN_TOKEN_HEADER: "wrong"}])
+def test_shutdown_api_rejects_missing_or_wrong_token(shutdown_env, headers):
+    response = webui.app.test_client().post("/shutdown_api", headers=headers)
+    assert response.status_code == 403
+    assert shutdown_env.calls == []
+
+
+def test_shutdown_api_flushes_and_drains_with_token(shutdown_env):
+    response = webui.app.test_client().post(
+        "/shutdown_api", headers={webui.SHUTDOWN_TOKEN_HEADER: "secret-token"}
+    )
+    assert response.status_code == 200
+    assert shutdown_env.calls == ["flush", "drain"]
+
+
+def test_shutdown_api_disabled_without_token(shutdown_env, monkeypatch):
+    monkeypatch.setattr(webui, "SHUTDOWN_TOKEN", None)
+    response = webui.app.test_client().post(
+        "/shutdown_api", headers={webui.SHUTDOWN_TOKEN_HEADER: ""}
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("public, status", [(False, 302), (True, 200)])
+def test_metrics_requires_login_unless_public(monkeypatch, public, status):
+    monkeypatch.setattr(webui.app, "secret_key", "test")
+    monkeypatch.setitem(
+        webui.app.config, "PLUGIN_CONFIG", {"in_process": True, "metrics_public": public}
+    )
+    response = webui.app.test_client().get("/metrics")
+    assert response.status_code == status
+
+
+def _meme(client, name="a.png", color="red"):
+    directory = client.memes_dir / "happy"
+    directory.mkdir(exist_ok=True)
+    Image.new("RGB", (16, 16), color).save(directory / name)
+    return hashlib.sha256((directory / name).read_bytes()).hexdigest()
+
+
+def test_meme_etag_and_conditional_requests(webui_client):
+    digest = _meme(webui_client)
+    response = webui_client.get("/memes/happy/a.png")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{digest}"'
+    assert "Last-Modified" in response.headers
+    assert response.cache_control.no_cache
+
+    cached = webui_client.get("/memes/happy/a.png", headers={"If-None-Match": f'"{digest}"'})
+    assert cached.status_code == 304 and not cached.data
+
+
+def test_meme_range_requests(webui_client):
+    _meme(webui_client)
+    data = (webui_client.memes_dir / "happy" / "a.png").read_bytes()
+    response = webui_client.get("/memes/happy/a.png", headers={"Range": "bytes=0-7"})
+    assert response.status_code == 206
+    assert response.data == data[:8] == b"\x89PNG\r\n\x1a\n"
+    assert response.headers["Content-Range"] == f"bytes 0-7/{len(data)}"
+
+
+def test_versioned_urls_are_immutable_only_when_current(webui_client):
+    digest = _meme(webui_client)
+    current = webui_client.get(f"/memes/happy/a.png?v={digest[:12]}")
+    assert current.cache_control.immutable and current.cache_control.private
+    assert current.cache_control.max_age == webui.IMMUTABLE_MAX_AGE
+
+    # 过短的前缀与过期的版本号都需要重新验证
+    for version in (digest[:4], "0" * 12):
+        stale = webui_client.get(f"/memes/happy/a.png?v={version}")
+        assert not stale.cache_control.immutable
+        assert stale.cache_control.no_cache
+
+    thumb = webui_client.get(f"/thumb/happy/a.png?v={digest[:12]}")
+    assert thumb.mimetype == "image/webp"
+    assert thumb.cache_control.immutable
+
+
+def test_replaced_meme_gets_new_etag(webui_client):
+    old = _meme(webui_client)
+    new = _meme(webui_client, color="blue")
+    assert old != new
+    response = webui_client.get("/memes/happy/a.png", headers={"If-None-Match": f'"{old}"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{new}"'
+
+
+def test_missing_memes(webui_client):
+    assert webui_client.get("/memes/happy/missing.png").status_code == 404
+    assert webui_client.get("/thumb/happy/missing.png").status_code == 404
+    (webui_client.memes_dir / "happy").mkdir()
+    assert webui_client.get("/memes/happy/..").status_code in (400, 404)
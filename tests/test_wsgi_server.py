@@ -0,0 +1,178 @@
+import socket
+import threading
+import http.client
+
+import pytest
+from flask import Flask, Response, request, send_file
+
+from meme_manager.wsgi_server import make_server
+
+BODY = bytes(range(256)) * 64  # 16 KiB
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    path = tmp_path / "blob.bin"
+    path.write_bytes(BODY)
+
+    @app.route("/text")
+    def text():
+        return "hello"
+
+    @app.route("/stream")
+    def stream():
+        return Response((f"part{i};" for i in range(5)), mimetype="text/plain")
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        return request.get_data()
+
+    @app.route("/file")
+    def file():
+        return send_file(path, conditional=True)
+
+    return app
+
+
+@pytest.fixture
+def serve(app):
+    servers = []
+
+    def start(**kwargs):
+        server = make_server("127.0.0.1", 0, app, workers=2, **kwargs)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append((server, thread))
+        return server
+
+    yield start
+    for server, thread in servers:
+        if not server.draining:
+            server.drain(timeout=2)
+        thread.join(timeout=5)
+        server.server_close()
+
+
+def _connect(server) -> http.client.HTTPConnection:
+    return http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+
+
+def _closed_by_peer(sock: socket.socket, timeout: float) -> bool:
+    sock.settimeout(timeout)
+    try:
+        return sock.recv(1) == b""
+    except socket.timeout:
+        return False
+    except ConnectionError:
+        return True
+
+
+def test_keep_alive_reuses_connection(serve):
+    conn = _connect(serve())
+    conn.request("GET", "/text")
+    first = conn.getresponse()
+    assert first.read() == b"hello"
+    sock = conn.sock
+
+    conn.request("POST", "/echo", body=b"abc")
+    second = conn.getresponse()
+    assert second.read() == b"abc"
+    assert conn.sock is sock  # 服务器没有关闭连接，http.client 复用了同一套接字
+    conn.close()
+
+
+def test_streamed_response_is_chunked(serve):
+    conn = _connect(serve())
+    conn.request("GET", "/stream")
+    response = conn.getresponse()
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert response.read() == b"".join(f"part{i};".encode() for i in range(5))
+    conn.close()
+
+
+def test_chunked_request_body(serve):
+    conn = _connect(serve())
+    conn.request("POST", "/echo", body=iter([b"ab", b"cd", b"ef"]), encode_chunked=True,
+                 headers={"Transfer-Encoding": "chunked"})
+    response = conn.getresponse()
+    assert response.read() == b"abcdef"
+    # 分块请求体处理后不复用连接
+    assert response.getheader("Connection") == "close"
+    conn.close()
+
+
+def test_head_has_headers_but_no_body(serve):
+    conn = _connect(serve())
+    conn.request("HEAD", "/file")
+    response = conn.getresponse()
+    assert response.status == 200
+    assert int(response.getheader("Content-Length")) == len(BODY)
+    assert response.read() == b""
+
+    # 连接仍然可用，没有残留的响应体
+    conn.request("GET", "/text")
+    assert conn.getresponse().read() == b"hello"
+    conn.close()
+
+
+def test_file_and_range_requests(serve):
+    conn = _connect(serve())
+    conn.request("GET", "/file")
+    response = conn.getresponse()
+    assert response.status == 200
+    assert response.read() == BODY
+
+    conn.request("GET", "/file", headers={"Range": "bytes=100-4195"})
+    response = conn.getresponse()
+    assert response.status == 206
+    assert response.getheader("Content-Range") == f"bytes 100-4195/{len(BODY)}"
+    assert response.read() == BODY[100:4196]
+    conn.close()
+
+
+def test_stalled_request_times_out(serve):
+    server = serve(request_timeout=0.3)
+    with socket.create_connection(("127.0.0.1", server.port)) as sock:
+        sock.sendall(b"GET /text HT")  # 请求行未发送完
+        assert _closed_by_peer(sock, timeout=3)
+
+
+def test_idle_keep_alive_connection_is_closed(serve):
+    server = serve(keep_alive_timeout=0.3)
+    conn = _connect(server)
+    conn.request("GET", "/text")
+    assert conn.getresponse().read() == b"hello"
+    assert _closed_by_peer(conn.sock, timeout=3)
+    conn.close()
+
+
+def test_drain_waits_for_in_flight_request(app, serve):
+    started, release = threading.Event(), threading.Event()
+
+    @app.route("/slow")
+    def slow():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    server = serve()
+    results = []
+
+    def fetch():
+        conn = _connect(server)
+        conn.request("GET", "/slow")
+        results.append(conn.getresponse().read())
+        conn.close()
+
+    client = threading.Thread(target=fetch)
+    client.start()
+    assert started.wait(5)
+    drained = []
+    drainer = threading.Thread(target=lambda: drained.append(server.drain(timeout=5)))
+    drainer.start()
+    release.set()
+    drainer.join(5)
+    client.join(5)
+    assert results == [b"done"]
+    assert drained == [True]
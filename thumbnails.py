@@ -0,0 +1,118 @@
+import os
+import re
+import shutil
+import logging
+import threading
+from typing import Dict, Optional
+from .config import MEMES_DIR, THUMBS_DIR, MEME_EXTENSIONS
+from .utils import file_version
+
+logger = logging.getLogger(__name__)
+
+# 缩略图文件名中原图文件名之后的部分：.<大小>-<inode>-<mtime>.webp（旧版本没有 inode）
+_KEY_SUFFIX = re.compile(r"\.[0-9a-f]+(?:-[0-9a-f]+){1,2}\.webp$")
+
+
+class ThumbnailCache:
+    """WebUI 图库使用的缩略图缓存
+
+    按需为表情包生成静态 WebP 缩略图（GIF 取第一帧），缓存在 thumbs_dir 下，
+    文件名包含原图的版本标识（大小、inode 和 mtime，见 file_version），原图被
+    替换后自动生成新的缩略图并清理旧文件。
+    """
+
+    def __init__(self, memes_dir: str = MEMES_DIR, thumbs_dir: str = THUMBS_DIR,
+                 size: int = 160, quality: int = 75):
+        """
+        Args:
+            memes_dir: 表情包根目录
+            thumbs_dir: 缩略图缓存目录
+            size: 缩略图最长边（像素）
+            quality: WebP 编码质量
+        """
+        self.memes_dir = memes_dir
+        self.thumbs_dir = thumbs_dir
+        self.size = size
+        self.quality = quality
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def thumb_path(self, category: str, filename: str, src_stat: os.stat_result) -> str:
+        """原图当前版本对应的缩略图路径"""
+        return os.path.join(self.thumbs_dir, category, f"{filename}.{file_version(src_stat)}.webp")
+
+    def _lock_for(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def get(self, category: str, filename: str) -> Optional[str]:
+        """
+        获取缩略图路径，不存在时生成
+
+        Returns:
+            缩略图路径；原图不存在或无法解码时返回 None
+        """
+        if not filename.lower().endswith(MEME_EXTENSIONS):
+            return None
+        src_path = os.path.join(self.memes_dir, category, filename)
+        try:
+            src_stat = os.stat(src_path)
+        except OSError:
+            return None
+
+        dst_path = self.thumb_path(category, filename, src_stat)
+        if os.path.exists(dst_path):
+            return dst_path
+
+        # 同一张图的并发请求只生成一次
+        with self._lock_for(dst_path):
+            if os.path.exists(dst_path):
+                return dst_path
+            try:
+                self._generate(src_path, dst_path)
+            except Exception as e:
+                logger.error(f"生成缩略图失败 {src_path}: {e}")
+                return None
+        with self._locks_guard:
+            self._locks.pop(dst_path, None)
+        self._remove_stale(category, filename, keep=dst_path)
+        return dst_path
+
+    def _generate(self, src_path: str, dst_path: str) -> None:
+        from PIL import Image
+
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        tmp_path = dst_path + ".tmp"
+        try:
+            with Image.open(src_path) as img:
+                # JPEG 在解码阶段直接降采样；GIF 只读取第一帧
+                img.draft("RGB", (self.size * 2, self.size * 2))
+                frame = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+                frame.thumbnail((self.size, self.size), Image.LANCZOS)
+                frame.save(tmp_path, "WEBP", quality=self.quality, method=4)
+            os.replace(tmp_path, dst_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _remove_stale(self, category: str, filename: str, keep: Optional[str] = None) -> None:
+        """清理同一原图（旧版本）的缩略图"""
+        try:
+            for entry in os.scandir(os.path.join(self.thumbs_dir, category)):
+                if (
+                    entry.path != keep
+                    and entry.name.startswith(filename)
+                    and _KEY_SUFFIX.fullmatch(entry.name[len(filename):])
+                ):
+                    os.remove(entry.path)
+        except OSError:
+            pass
+
+    def discard(self, category: Optional[str] = None, filename: Optional[str] = None) -> None:
+        """原图或类别被删除后清理缩略图"""
+        if category is None:
+            shutil.rmtree(self.thumbs_dir, ignore_errors=True)
+        elif filename is None:
+            shutil.rmtree(os.path.join(self.thumbs_dir, category), ignore_errors=True)
+        else:
+            self._remove_stale(category, filename)
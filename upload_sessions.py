@@ -0,0 +1,99 @@
+import time
+import heapq
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+
+class UploadSession:
+    """一次 /上传表情包 会话"""
+
+    __slots__ = ("id", "category", "expire_at", "images", "bytes")
+
+    def __init__(self, session_id: int, category: str, expire_at: float):
+        self.id = session_id
+        self.category = category
+        self.expire_at = expire_at
+        self.images = 0
+        self.bytes = 0
+
+
+class UploadSessionManager:
+    """上传会话管理器
+
+    会话按过期时间放入最小堆，每次访问时只需检查堆顶即可清理过期会话，
+    无人再发言的会话也会被回收。没有任何活跃会话时 bool(manager) 为
+    False，消息处理函数可以在构造会话键之前直接返回。
+    """
+
+    def __init__(self, ttl: float = 30.0, max_images: int = 20, max_bytes: int = 50 * 1024 * 1024):
+        """
+        Args:
+            ttl: 会话有效期（秒）
+            max_images: 单个会话最多接收的图片数量
+            max_bytes: 单个会话最多接收的总字节数
+        """
+        self.ttl = ttl
+        self.max_images = max_images
+        self.max_bytes = max_bytes
+        self._sessions: Dict[str, UploadSession] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._ids = itertools.count()
+        self.counters = {"started": 0, "completed": 0, "expired": 0, "limited": 0}
+
+    def __bool__(self) -> bool:
+        if not self._sessions:
+            return False
+        if self._heap[0][0] <= time.monotonic():
+            self.sweep()
+        return bool(self._sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """清理所有已过期的会话，返回清理数量"""
+        now = time.monotonic() if now is None else now
+        expired = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, session_id, key = heapq.heappop(self._heap)
+            session = self._sessions.get(key)
+            # 堆中可能残留已结束或被覆盖的会话，按 id 判断
+            if session is not None and session.id == session_id:
+                del self._sessions[key]
+                expired += 1
+        self.counters["expired"] += expired
+        return expired
+
+    def start(self, key: str, category: str) -> UploadSession:
+        """为用户开启（或覆盖）一个上传会话"""
+        session = UploadSession(next(self._ids), category, time.monotonic() + self.ttl)
+        self._sessions[key] = session
+        heapq.heappush(self._heap, (session.expire_at, session.id, key))
+        self.counters["started"] += 1
+        return session
+
+    def get(self, key: str) -> Optional[UploadSession]:
+        """获取用户当前有效的上传会话"""
+        if self._heap and self._heap[0][0] <= time.monotonic():
+            self.sweep()
+        return self._sessions.get(key)
+
+    def remaining_images(self, session: UploadSession) -> int:
+        return max(0, self.max_images - session.images)
+
+    def remaining_bytes(self, session: UploadSession) -> int:
+        return max(0, self.max_bytes - session.bytes)
+
+    def record(self, session: UploadSession, images: int, nbytes: int) -> bool:
+        """记录会话已接收的图片，达到上限时返回 False"""
+        session.images += images
+        session.bytes += nbytes
+        if session.images >= self.max_images or session.bytes >= self.max_bytes:
+            self.counters["limited"] += 1
+            return False
+        return True
+
+    def end(self, key: str) -> None:
+        """结束用户的上传会话，堆中的记录在过期时惰性清理"""
+        if self._sessions.pop(key, None) is not None:
+            self.counters["completed"] += 1
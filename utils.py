@@ -1,6 +1,7 @@
 import os
 import json
 import logging
+import tempfile
 import aiohttp
 import random
 import string
@@ -14,15 +15,61 @@ def ensure_dir_exists(path: str) -> None:
     if not os.path.exists(path):
         os.makedirs(path)
 
+def fsync_dir(path: str) -> None:
+    """把目录项的变更（新建、重命名）刷到磁盘，不支持的平台上忽略"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def file_version(st: os.stat_result) -> str:
+    """
+    文件当前版本的标识：大小、inode 和 mtime 的十六进制组合
+
+    表情包由内容存储硬链接而来时 mtime 是已有内容文件的时间，可能早于
+    由它派生的缓存文件，因此不能只比较 mtime；替换文件会换用新的 inode。
+    """
+    return f"{st.st_size:x}-{st.st_ino:x}-{st.st_mtime_ns:x}"
+
 def save_json(data: Dict[str, Any], filepath: str) -> bool:
-    """保存 JSON 数据到文件"""
+    """保存 JSON 数据到文件
+
+    先写入同目录下的临时文件并 fsync，再原子替换目标文件，
+    写入过程中崩溃时目标文件保持旧内容而不会被截断。临时文件名唯一，
+    多个线程或进程同时保存同一文件时不会互相覆盖半写的内容。
+    """
+    temp_path = None
     try:
-        ensure_dir_exists(os.path.dirname(filepath))
-        with open(filepath, 'w', encoding='utf-8') as f:
+        directory = os.path.dirname(filepath)
+        ensure_dir_exists(directory)
+        fd, temp_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(filepath)}.", suffix=".tmp", dir=directory or "."
+        )
+        # mkstemp 创建的文件权限为 0600，替换后保持目标文件原有的权限
+        try:
+            os.chmod(temp_path, os.stat(filepath).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o644)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, filepath)
+        fsync_dir(directory)
         return True
     except Exception as e:
         logger.error(f"保存 JSON 文件失败 {filepath}: {e}")
+        if temp_path is not None:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
         return False
 
 def load_json(filepath: str, default: Dict = None) -> Dict:
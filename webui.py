@@ -1,18 +1,27 @@
 import os
+import hmac
+import stat
+import secrets
 import multiprocessing
 import requests
 from flask import (
     Flask,
     render_template,
-    send_from_directory,
+    send_file,
     request,
     redirect,
     url_for,
     session,
+    abort,
 )
 from .backend.api import api
 from .utils import generate_secret_key
 from .config import MEMES_DIR
+from .meme_catalog import get_catalog
+from .metrics import REGISTRY, merge_snapshots, render
+from .thumbnails import ThumbnailCache
+from .wsgi_server import make_server
+from werkzeug.security import safe_join
 import psutil
 import logging
 
@@ -25,6 +34,17 @@ app.register_blueprint(api, url_prefix="/api")
 
 SERVER_LOGIN_KEY = None
 SERVER_PROCESS = None
+HTTP_SERVER = None
+# 独立进程模式下主进程请求子进程关闭时使用的令牌，每次启动重新生成
+SHUTDOWN_TOKEN = None
+SHUTDOWN_TOKEN_HEADER = "X-Shutdown-Token"
+
+# 关闭时等待进行中请求完成的最长时间（秒）
+DRAIN_TIMEOUT = 10
+THUMBNAILS = ThumbnailCache()
+
+# 带版本号（?v=内容哈希）的原图 URL 内容不会变化，按不可变资源缓存一年
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
 
 def is_webui_running(port=5000):
     """检查 WebUI 是否已经在运行"""
@@ -41,6 +61,9 @@ def kill_existing_webui(port=5000):
     try:
         for proc in psutil.process_iter(['pid', 'name', 'connections']):
             try:
+                if proc.pid == os.getpid():
+                    # 进程内模式下端口可能由机器人进程自身占用
+                    continue
                 for conn in proc.connections():
                     if conn.laddr.port == port and conn.status == 'LISTEN':
                         proc.terminate()
@@ -54,7 +77,11 @@ def kill_existing_webui(port=5000):
 
 @app.before_request
 def require_login():
-    allowed_endpoints = ["login", "static"]
+    # shutdown_api 由主进程调用，不带会话，在处理函数中校验关闭令牌
+    allowed_endpoints = ["login", "static", "shutdown_api"]
+    if app.config.get("PLUGIN_CONFIG", {}).get("metrics_public"):
+        # 配置允许时 Prometheus 可以不登录抓取 /metrics
+        allowed_endpoints.append("metrics")
     if request.endpoint not in allowed_endpoints and not session.get("authenticated"):
         return redirect(url_for("login"))
 
@@ -80,27 +107,180 @@ def index():
 
 @app.route("/memes/<category>/<filename>")
 def serve_emoji(category, filename):
-    category_path = os.path.join(MEMES_DIR, category)
-    if os.path.exists(os.path.join(category_path, filename)):
-        return send_from_directory(category_path, filename)
+    """
+    表情包原图
+
+    ETag 为内容哈希并附带 Last-Modified，支持 304 条件请求和 Range 分段请求。
+    URL 中的 ?v= 与内容哈希（或其至少 8 位前缀）一致时按不可变资源长期缓存，
+    否则浏览器每次使用前重新验证。文件体交给 WSGI 服务器的 file_wrapper
+    发送，服务器支持时为零拷贝 sendfile。
+    """
+    file_path = safe_join(MEMES_DIR, category, filename)
+    if file_path is None:
+        return "Invalid path", 400
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
+        return "File not found: " + os.path.join(category, filename), 404
+
+    digest = get_catalog().content_hash(category, filename, st)
+    immutable = _is_current_version(digest)
+    response = send_file(
+        file_path,
+        conditional=True,
+        etag=digest,
+        last_modified=st.st_mtime,
+        max_age=IMMUTABLE_MAX_AGE if immutable else 0,
+    )
+    return _set_cache_policy(response, immutable)
+
+def _is_current_version(digest):
+    """请求 URL 中的 ?v= 是否为当前内容哈希（至少 8 位前缀）"""
+    version = request.args.get("v", "")
+    return len(version) >= 8 and digest.startswith(version)
+
+def _set_cache_policy(response, immutable):
+    if immutable:
+        # WebUI 需要登录，只允许浏览器缓存，不允许共享缓存
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.immutable = True
     else:
-        return "File not found: " + os.path.join(category_path, filename), 404
+        response.cache_control.no_cache = True
+    return response
+
+@app.route("/thumb/<category>/<filename>")
+def serve_thumbnail(category, filename):
+    """
+    图库使用的 WebP 缩略图，首次请求时生成并缓存到磁盘
+
+    与原图相同，?v= 与原图内容哈希一致时按不可变资源长期缓存。
+    """
+    file_path = safe_join(MEMES_DIR, category, filename)
+    if file_path is None:
+        return "Invalid path", 400
+    thumb_path = THUMBNAILS.get(category, filename)
+    if thumb_path is None:
+        return "File not found: " + os.path.join(category, filename), 404
+    immutable = False
+    if request.args.get("v"):
+        try:
+            st = os.stat(file_path)
+            immutable = _is_current_version(get_catalog().content_hash(category, filename, st))
+        except OSError:
+            pass
+    response = send_file(
+        thumb_path, mimetype="image/webp", max_age=IMMUTABLE_MAX_AGE if immutable else 0
+    )
+    return _set_cache_policy(response, immutable)
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus 文本格式的指标，合并机器人进程与 WebUI 进程的数据"""
+    plugin_config = app.config.get("PLUGIN_CONFIG", {})
+    if plugin_config.get("in_process"):
+        # 与机器人在同一进程中，注册表就是机器人的注册表
+        return render(merge_snapshots({"bot": REGISTRY.snapshot()})), 200, {
+            "Content-Type": "text/plain; version=0.0.4; charset=utf-8"
+        }
+    snapshots = {"webui": REGISTRY.snapshot()}
+    bridge = plugin_config.get("metrics_bridge")
+    if bridge is not None:
+        bot_snapshot = bridge.request()
+        if bot_snapshot is not None:
+            snapshots["bot"] = bot_snapshot
+    return render(merge_snapshots(snapshots)), 200, {
+        "Content-Type": "text/plain; version=0.0.4; charset=utf-8"
+    }
 
 @app.route("/shutdown_api", methods=["POST"])
 def shutdown_api():
-    func = request.environ.get("werkzeug.server.shutdown")
-    if func is None:
-        raise RuntimeError("无法关闭服务器：不是在 Werkzeug 环境中运行？")
-    func()
+    token = request.headers.get(SHUTDOWN_TOKEN_HEADER, "")
+    if not SHUTDOWN_TOKEN or not hmac.compare_digest(token, SHUTDOWN_TOKEN):
+        abort(403)
+    # 进程随后会被终止，先写入合并窗口内尚未落盘的修改
+    plugin_config = app.config.get("PLUGIN_CONFIG", {})
+    category_manager = plugin_config.get("category_manager")
+    if category_manager:
+        category_manager.flush()
+    blob_store = plugin_config.get("blob_store")
+    if blob_store:
+        blob_store.flush()
+    near_duplicates = plugin_config.get("near_duplicates")
+    if near_duplicates:
+        near_duplicates.flush()
+    if HTTP_SERVER is None:
+        raise RuntimeError("无法关闭服务器：服务器不是由 run_server 启动的？")
+    # 停止接受新连接，进行中的请求处理完后 run_server 返回
+    HTTP_SERVER.drain_in_background(DRAIN_TIMEOUT)
     return "Server shutting down..."
 
-def run_server(port=5000):
-    """运行服务器"""
-    app.run(host="0.0.0.0", port=port)
+def run_server(port=5000, workers=8, request_timeout=30, shutdown_token=None):
+    """运行服务器（线程池 WSGI 服务器，支持保持连接）"""
+    global HTTP_SERVER, SHUTDOWN_TOKEN
+    SHUTDOWN_TOKEN = shutdown_token
+    HTTP_SERVER = make_server(
+        "0.0.0.0", port, app, workers=workers, request_timeout=request_timeout
+    )
+    HTTP_SERVER.log_startup()
+    HTTP_SERVER.serve_forever()
+
+def _plugin_config(config, port):
+    """从启动配置中取出 API 使用的插件对象"""
+    return {
+        "img_sync": config.get("img_sync"),
+        "category_manager": config.get("category_manager"),
+        "meme_index": config.get("meme_index"),
+        "meme_variants": config.get("meme_variants"),
+        "blob_store": config.get("blob_store"),
+        "near_duplicates": config.get("near_duplicates"),
+        "metrics_bridge": config.get("metrics_bridge"),
+        "metrics_public": config.get("metrics_public", False),
+        "thumbnails": THUMBNAILS,
+        "webui_port": port
+    }
+
+async def start_inprocess_server(config):
+    """
+    在当前进程的事件循环中启动服务器
+
+    API 直接使用机器人的类别管理器、索引和缓存对象，修改立即对机器人生效，
+    启动时也不需要创建进程、重新导入模块。端口被占用时直接报错，不会结束
+    占用端口的进程（它可能是机器人自身或其他无关的服务）。
+
+    Returns:
+        (登录秘钥, AsyncWSGIServer)
+
+    Raises:
+        RuntimeError: 端口已被占用
+    """
+    global SERVER_LOGIN_KEY
+    from .async_wsgi import AsyncWSGIServer
+
+    port = config.get("webui_port", 5000)
+    SERVER_LOGIN_KEY = generate_secret_key(8)
+    app.secret_key = os.urandom(16)
+    app.config["PLUGIN_CONFIG"] = {**_plugin_config(config, port), "in_process": True}
+
+    server = AsyncWSGIServer(
+        app,
+        workers=config.get("webui_workers", 8),
+        request_timeout=config.get("webui_request_timeout", 30),
+        shutdown_timeout=DRAIN_TIMEOUT,
+    )
+    try:
+        await server.start("0.0.0.0", port)
+    except OSError as e:
+        raise RuntimeError(
+            f"端口 {port} 已被占用或无法监听（{e}），请关闭占用该端口的程序或修改 webui_port 配置"
+        ) from e
+    return SERVER_LOGIN_KEY, server
 
 def start_server(config=None):
-    """启动服务器"""
-    global SERVER_LOGIN_KEY, SERVER_PROCESS
+    """启动服务器（独立进程）"""
+    global SERVER_LOGIN_KEY, SERVER_PROCESS, SHUTDOWN_TOKEN
     
     logger.debug("Starting server with config: %s", config)
 
@@ -116,15 +296,16 @@ def start_server(config=None):
     app.secret_key = os.urandom(16)
 
     if config is not None and hasattr(config, 'get'):
-        app.config["PLUGIN_CONFIG"] = {
-            "img_sync": config.get("img_sync"),
-            "category_manager": config.get("category_manager"),
-            "webui_port": port
-        }
+        app.config["PLUGIN_CONFIG"] = _plugin_config(config, port)
         logger.debug("Plugin config set: %s", app.config["PLUGIN_CONFIG"])
 
     # 启动新进程
-    SERVER_PROCESS = multiprocessing.Process(target=run_server, args=(port,))
+    workers = config.get("webui_workers", 8) if config else 8
+    request_timeout = config.get("webui_request_timeout", 30) if config else 30
+    SHUTDOWN_TOKEN = secrets.token_urlsafe(32)
+    SERVER_PROCESS = multiprocessing.Process(
+        target=run_server, args=(port, workers, request_timeout, SHUTDOWN_TOKEN)
+    )
     SERVER_PROCESS.start()
     logger.info("Server started on port %d", port)
     return SERVER_LOGIN_KEY, SERVER_PROCESS
@@ -136,11 +317,21 @@ def shutdown_server(server_process):
             plugin_config = app.config.get("PLUGIN_CONFIG", {})
             port = plugin_config.get("webui_port", 5000)
             try:
-                requests.post(f"http://127.0.0.1:{port}/shutdown_api")
-            except:
-                pass
-            server_process.terminate()
-            server_process.join(timeout=5)
+                response = requests.post(
+                    f"http://127.0.0.1:{port}/shutdown_api",
+                    headers={SHUTDOWN_TOKEN_HEADER: SHUTDOWN_TOKEN or ""},
+                    timeout=5,
+                    allow_redirects=False,
+                )
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+                # 等待进行中的请求处理完毕、进程自行退出
+                server_process.join(timeout=DRAIN_TIMEOUT + 2)
+            except Exception as e:
+                logger.warning(f"请求 WebUI 进程正常关闭失败，将直接终止: {e}")
+            if server_process.is_alive():
+                server_process.terminate()
+                server_process.join(timeout=5)
             if server_process.is_alive():
                 server_process.kill()
     except Exception as e:
@@ -150,11 +341,7 @@ def create_app(config=None):
     app = Flask(__name__)
     
     if config is not None and hasattr(config, 'get'):
-        app.config["PLUGIN_CONFIG"] = {
-            "img_sync": config.get("img_sync"),
-            "category_manager": config.get("category_manager"),
-            "webui_port": config.get("webui_port", 5000)
-        }
+        app.config["PLUGIN_CONFIG"] = _plugin_config(config, config.get("webui_port", 5000))
     else:
         print("警告: 配置格式不正确")
 
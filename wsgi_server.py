@@ -0,0 +1,314 @@
+import time
+import socket
+import logging
+import selectors
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import LimitedStream
+from werkzeug.exceptions import InternalServerError
+
+logger = logging.getLogger(__name__)
+
+# 请求行的最大长度，与 http.server 一致
+_MAX_REQUEST_LINE = 65536
+
+
+class FileWrapper:
+    """wsgi.file_wrapper 实现，send_file 返回的文件体可以用 sendfile 零拷贝发送"""
+
+    def __init__(self, file, buffer_size: int = 8192):
+        self.file = file
+        self.buffer_size = buffer_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        data = self.file.read(self.buffer_size)
+        if data:
+            return data
+        raise StopIteration()
+
+    def close(self) -> None:
+        if hasattr(self.file, "close"):
+            self.file.close()
+
+
+class _RequestHandler(WSGIRequestHandler):
+    """支持 HTTP/1.1 保持连接的请求处理器
+
+    Werkzeug 自带的处理器每个响应后都关闭连接。这里在请求体被完整读取
+    （或丢弃）后保留连接，空闲超过 keep_alive_timeout、服务器繁忙或
+    正在关闭时再断开，避免空闲连接长期占用工作线程。
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: "PooledWSGIServer"
+
+    def setup(self) -> None:
+        super().setup()
+        self.requests_handled = 0
+
+    def handle_one_request(self) -> None:
+        if self.requests_handled and not self._wait_for_next_request():
+            self.close_connection = True
+            return
+        self.connection.settimeout(self.server.request_timeout)
+        try:
+            self.raw_requestline = self.rfile.readline(_MAX_REQUEST_LINE + 1)
+        except socket.timeout:
+            self.close_connection = True
+            return
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+        if len(self.raw_requestline) > _MAX_REQUEST_LINE:
+            self.requestline = ""
+            self.request_version = ""
+            self.command = ""
+            self.send_error(HTTPStatus.REQUEST_URI_TOO_LONG)
+            return
+        if not self.parse_request():
+            return
+        self.requests_handled += 1
+        if self.server.saturated or self.server.draining:
+            # 有连接在排队或正在关闭，本次响应后释放工作线程
+            self.close_connection = True
+        self.run_wsgi()
+        self.wfile.flush()
+
+    def _wait_for_next_request(self) -> bool:
+        """
+        保持连接时等待下一个请求
+
+        只观察套接字是否可读，客户端在同一连接上流水线发送的请求（浏览器
+        不会这样做）可能已被读入缓冲区，此时等到超时后断开，客户端会重试。
+        """
+        deadline = time.monotonic() + self.server.keep_alive_timeout
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.connection, selectors.EVENT_READ)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.server.saturated or self.server.draining:
+                    return False
+                if selector.select(min(remaining, 0.25)):
+                    return True
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ["wsgi.file_wrapper"] = FileWrapper
+        if environ.get("wsgi.input_terminated"):
+            # 分块上传的请求体结束位置依赖应用读取，处理后不复用连接
+            self.close_connection = True
+        else:
+            try:
+                length = max(0, int(environ.get("CONTENT_LENGTH") or 0))
+            except ValueError:
+                length = 0
+                self.close_connection = True
+            environ["wsgi.input"] = LimitedStream(self.rfile, length)
+        return environ
+
+    def run_wsgi(self) -> None:
+        if self.headers.get("Expect", "").lower().strip(" \t") == "100-continue":
+            self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+        self.environ = environ = self.make_environ()
+        state = {"status": None, "headers": None, "sent": False, "chunked": False, "length": None}
+
+        def send_headers() -> None:
+            code_str, _, msg = state["status"].partition(" ")
+            code = int(code_str)
+            self.send_response(code, msg)
+            header_keys = set()
+            for key, value in state["headers"]:
+                self.send_header(key, value)
+                header_keys.add(key.lower())
+                if key.lower() == "content-length":
+                    state["length"] = int(value)
+            bodyless = environ["REQUEST_METHOD"] == "HEAD" or 100 <= code < 200 or code in (204, 304)
+            if "content-length" not in header_keys and not bodyless:
+                if self.request_version == "HTTP/1.1":
+                    state["chunked"] = True
+                    self.send_header("Transfer-Encoding", "chunked")
+                else:
+                    # HTTP/1.0 客户端只能以关闭连接标记响应结束
+                    self.close_connection = True
+            if self.close_connection:
+                self.send_header("Connection", "close")
+            self.end_headers()
+            state["sent"] = True
+
+        def write(data: bytes) -> None:
+            assert state["status"] is not None, "write() before start_response"
+            if not state["sent"]:
+                send_headers()
+            if data:
+                if state["chunked"]:
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                else:
+                    self.wfile.write(data)
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info:
+                try:
+                    if state["sent"]:
+                        raise exc_info[1].with_traceback(exc_info[2])
+                finally:
+                    exc_info = None
+            elif state["status"] is not None:
+                raise AssertionError("Headers already set")
+            state["status"] = status
+            state["headers"] = headers
+            return write
+
+        def execute(app) -> None:
+            application_iter = app(environ, start_response)
+            try:
+                if (
+                    isinstance(application_iter, FileWrapper)
+                    and self.server.ssl_context is None
+                    and environ["REQUEST_METHOD"] != "HEAD"
+                ):
+                    send_headers()
+                    if state["length"] is not None and not state["chunked"]:
+                        # 文件体直接由内核发送，不经过用户态缓冲
+                        file = application_iter.file
+                        self.connection.sendfile(file, file.tell(), state["length"])
+                        return
+                    for data in application_iter:
+                        write(data)
+                else:
+                    for data in application_iter:
+                        write(data)
+                if not state["sent"]:
+                    write(b"")
+                if state["chunked"]:
+                    self.wfile.write(b"0\r\n\r\n")
+            finally:
+                if hasattr(application_iter, "close"):
+                    application_iter.close()
+
+        try:
+            execute(self.server.app)
+            # 丢弃应用未读取的请求体，连接才能继续用于下一个请求
+            body = environ["wsgi.input"]
+            if isinstance(body, LimitedStream) and not self.close_connection:
+                body.exhaust()
+        except (ConnectionError, socket.timeout) as e:
+            self.close_connection = True
+            self.connection_dropped(e, environ)
+        except Exception as e:
+            self.close_connection = True
+            if not state["sent"]:
+                state["status"] = None
+                state["headers"] = None
+                try:
+                    execute(InternalServerError())
+                except Exception:
+                    pass
+            logger.error(f"处理请求 {self.command} {self.path} 时出错: {e}", exc_info=True)
+
+    def log_request(self, code="-", size="-") -> None:
+        logger.debug(f'{self.address_string()} "{self.requestline}" {code}')
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """固定大小线程池的 WSGI 服务器
+
+    每个连接由线程池中的一个工作线程处理，工作线程全部占用时暂停接受新
+    连接（新连接在监听队列中等待），并让已保持的连接在当前响应后断开。
+    request_timeout 限制读取请求和发送响应时单次套接字操作的等待时间，
+    keep_alive_timeout 限制保持连接的空闲时间。drain() 停止接受新连接并
+    等待进行中的请求完成。
+    """
+
+    multithread = True
+
+    def __init__(self, host: str, port: int, app, workers: int = 8,
+                 request_timeout: float = 30.0, keep_alive_timeout: float = 5.0):
+        self.workers = workers
+        self.request_timeout = request_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.draining = False
+        self._waiting = 0
+        self._slots = threading.Semaphore(workers)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webui-worker")
+        self._drain_thread = None
+        super().__init__(host, port, app, handler=_RequestHandler)
+
+    @property
+    def saturated(self) -> bool:
+        """是否有已接受的连接在等待空闲的工作线程"""
+        return self._waiting > 0
+
+    def process_request(self, request, client_address) -> None:
+        self._waiting += 1
+        try:
+            while not self._slots.acquire(timeout=0.25):
+                if self.draining:
+                    self.shutdown_request(request)
+                    return
+        finally:
+            self._waiting -= 1
+        self._pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def serve_forever(self, poll_interval: float = 0.5) -> None:
+        super().serve_forever(poll_interval)
+        if self._drain_thread is not None:
+            self._drain_thread.join()
+
+    def drain_in_background(self, timeout: float = 10.0) -> None:
+        """在后台线程中 drain()，可以在请求处理线程中调用；serve_forever 返回前会等待其完成"""
+        if self._drain_thread is None:
+            self._drain_thread = threading.Thread(target=self.drain, args=(timeout,), name="webui-drain")
+            self._drain_thread.start()
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """
+        停止接受新连接并等待进行中的请求完成，需要在 serve_forever 之外的线程调用
+
+        Returns:
+            是否在超时前完成
+        """
+        self.draining = True
+        self.shutdown()
+        deadline = time.monotonic() + timeout
+        acquired = 0
+        for _ in range(self.workers):
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                break
+            acquired += 1
+        self._pool.shutdown(wait=False)
+        drained = acquired == self.workers
+        if not drained:
+            logger.warning(f"WebUI 关闭超时，仍有 {self.workers - acquired} 个连接未处理完")
+        return drained
+
+    def log_startup(self) -> None:
+        logger.info(
+            f"WebUI 服务器已启动: http://{self.host}:{self.port} "
+            f"（{self.workers} 个工作线程）"
+        )
+
+
+def make_server(host: str, port: int, app, workers: int = 8,
+                request_timeout: float = 30.0, keep_alive_timeout: float = 5.0) -> PooledWSGIServer:
+    """创建 WebUI 使用的 WSGI 服务器"""
+    return PooledWSGIServer(
+        host, port, app,
+        workers=workers,
+        request_timeout=request_timeout,
+        keep_alive_timeout=keep_alive_timeout,
+    )